@@ -17,14 +17,23 @@ import os
 import subprocess
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+import orjson
 import requests
 
-from tools import ToolExecutor, TOOLS_SCHEMA
+from tools import ToolExecutor, TOOLS_SCHEMA, TOOLS_SCHEMA_JSON
 from reflection import reflect_on_result
 from memory import PeanutMemory
 
+# Usuario del proceso: se lee del entorno una vez (no en cada turno)
+_USER = os.environ.get("USER") or os.environ.get("USERNAME") or "unknown"
+
+
+def _json_text(obj: Any) -> str:
+    """JSON (orjson, en C) de un resultado de herramienta para el historial."""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
 
 @dataclass
 class PeanutState:
@@ -90,28 +99,88 @@ class OllamaAgent:
         # Historial de conversación (se conserva en chat())
         self.messages: List[Dict[str, Any]] = []
 
-    def _call_ollama(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    def _chat_body(
+        self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]], stream: bool
+    ) -> bytes:
         payload: Dict[str, Any] = {
             "model": self.model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "options": {"temperature": self.temperature},
         }
+        body = orjson.dumps(payload, default=str)
         if tools:
-            payload["tools"] = tools
+            # El esquema por defecto ya está codificado: se inserta sin volver a serializarlo
+            tools_json = (
+                TOOLS_SCHEMA_JSON
+                if tools is TOOLS_SCHEMA
+                else orjson.dumps(tools)
+            )
+            body = body[:-1] + b',"tools":' + tools_json + b"}"
+        return body
 
+    def _call_ollama(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        body = self._chat_body(messages, tools, stream=False)
         try:
-            response = requests.post(f"{self.ollama_url}/api/chat", json=payload, timeout=120)
+            response = requests.post(
+                f"{self.ollama_url}/api/chat",
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=120,
+            )
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             return {"error": f"Error llamando a Ollama: {str(e)}"}
 
+    def _call_ollama_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        on_delta: Callable[[str], None],
+    ) -> Dict[str, Any]:
+        """Como ``_call_ollama`` pero en streaming: cada trozo de texto se pasa a ``on_delta``
+        en cuanto llega. Devuelve la respuesta ya acumulada con la forma de la no-streaming.
+        """
+        body = self._chat_body(messages, tools, stream=True)
+        content: List[str] = []
+        tool_calls: List[Dict[str, Any]] = []
+        try:
+            with requests.post(
+                f"{self.ollama_url}/api/chat",
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=120,
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    if "error" in chunk:
+                        return {"error": f"Error llamando a Ollama: {chunk['error']}"}
+                    message = chunk.get("message") or {}
+                    delta = message.get("content") or ""
+                    if delta:
+                        content.append(delta)
+                        on_delta(delta)
+                    tool_calls.extend(message.get("tool_calls") or [])
+                    if chunk.get("done"):
+                        break
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            return {"error": f"Error llamando a Ollama: {str(e)}"}
+
+        message = {"role": "assistant", "content": "".join(content)}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        return {"message": message}
+
     def _get_enriched_context(self) -> str:
         """Contexto enriquecido defensivo."""
         parts = [
             f"📂 Directorio actual: {self.executor.work_dir}",
-            f"👤 Usuario: {os.getenv('USER', os.getenv('USERNAME', 'unknown'))}",
+            f"👤 Usuario: {_USER}",
         ]
 
         # Archivos visibles
@@ -269,8 +338,14 @@ class OllamaAgent:
 
         return current_result
 
-    def run(self, user_input: str, verbose: bool = True) -> str:
-        """Ejecuta una tarea (no resetea historial; usa reset() si quieres limpio)."""
+    def run(
+        self, user_input: str, verbose: bool = True, on_delta: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Ejecuta una tarea (no resetea historial; usa reset() si quieres limpio).
+
+        Con ``on_delta`` las respuestas del modelo llegan en streaming: cada trozo de
+        texto se entrega en cuanto Ollama lo genera (la UI no espera a la respuesta entera).
+        """
 
         memories: List[Dict[str, Any]] = []
         if self.enable_memory:
@@ -295,7 +370,10 @@ class OllamaAgent:
                 print(f"🔄 Iteración {iteration}/{self.max_iterations} | 🥜 Peanuts: {self.peanuts}")
                 print(f"{'=' * 72}")
 
-            response = self._call_ollama(self.messages, TOOLS_SCHEMA)
+            if on_delta is None:
+                response = self._call_ollama(self.messages, TOOLS_SCHEMA)
+            else:
+                response = self._call_ollama_stream(self.messages, TOOLS_SCHEMA, on_delta)
 
             if "error" in response:
                 return f"❌ Error: {response['error']}"
@@ -327,28 +405,28 @@ class OllamaAgent:
 
                 if not fn:
                     result = {"error": "Tool call sin nombre de función"}
-                    self.messages.append({"role": "tool", "content": json.dumps(result, ensure_ascii=False)})
+                    self.messages.append({"role": "tool", "content": _json_text(result)})
                     continue
 
                 try:
-                    args = json.loads(arg_str) if isinstance(arg_str, str) else (arg_str or {})
+                    args = orjson.loads(arg_str) if isinstance(arg_str, str) else (arg_str or {})
                     if not isinstance(args, dict):
                         raise ValueError("Arguments no es objeto JSON")
                 except Exception as e:
                     if verbose:
                         print(f"⚠️  JSON inválido en {fn}: {e}")
                     result = {"error": f"JSON inválido: {str(e)}. Devuelve SOLO JSON válido para arguments."}
-                    self.messages.append({"role": "tool", "content": json.dumps(result, ensure_ascii=False)})
+                    self.messages.append({"role": "tool", "content": _json_text(result)})
                     continue
 
                 if verbose:
                     print(f"\n▶️  Ejecutando: {fn}")
-                    print(f"   Args: {json.dumps(args, ensure_ascii=False)[:180]}")
+                    print(f"   Args: {_json_text(args)[:180]}")
 
                 result = self.executor.execute_tool(fn, args)
 
                 if verbose:
-                    preview = json.dumps(result, ensure_ascii=False)[:260]
+                    preview = _json_text(result)[:260]
                     print(f"   ✓ Resultado: {preview}")
 
                 final_result = self._reflect_and_maybe_retry(
@@ -359,13 +437,15 @@ class OllamaAgent:
                     verbose=verbose,
                 )
 
-                self.messages.append({"role": "tool", "content": json.dumps(final_result, ensure_ascii=False)})
+                self.messages.append({"role": "tool", "content": _json_text(final_result)})
 
         return f"⚠️ Se alcanzó el límite de {self.max_iterations} iteraciones sin respuesta final."
 
-    def chat(self, user_input: str, verbose: bool = False) -> str:
+    def chat(
+        self, user_input: str, verbose: bool = False, on_delta: Optional[Callable[[str], None]] = None
+    ) -> str:
         """Modo chat (mantiene historial)."""
-        return self.run(user_input, verbose=verbose)
+        return self.run(user_input, verbose=verbose, on_delta=on_delta)
 
     def reset(self) -> None:
         """Reinicia el historial (mantiene peanuts y memoria en disco)."""
@@ -0,0 +1,117 @@
+"""agentlow._http
+
+Clientes HTTP compartidos hacia Ollama (keep-alive).
+
+- ``get_pool()``: ``urllib3.PoolManager`` de proceso para el camino síncrono
+  (Ollama es un único host fijo: no hace falta la maquinaria de ``requests``).
+  ``post_json`` / ``post_json_lines`` envían un cuerpo ya serializado;
+  ``warm_pool`` abre la conexión por adelantado.
+- ``get_async_client(base_url)``: ``httpx.AsyncClient`` perezoso, uno por event loop
+  (un cliente httpx queda ligado al loop que lo creó; ``asyncio.run`` crea uno nuevo).
+
+Reutilizar conexiones evita un handshake TCP por cada turno del agente.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import httpx
+import orjson
+import urllib3
+
+MAX_KEEPALIVE_CONNECTIONS = 16
+CONNECT_TIMEOUT_S = 5.0
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_lock = threading.Lock()
+_pool: Optional[urllib3.PoolManager] = None
+_async_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+class OllamaHTTPError(urllib3.exceptions.HTTPError):
+    """Respuesta HTTP con código de error (>= 400)."""
+
+
+def get_pool() -> urllib3.PoolManager:
+    """Devuelve el pool síncrono compartido (creado en el primer uso)."""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = urllib3.PoolManager(
+                    num_pools=4,
+                    maxsize=MAX_KEEPALIVE_CONNECTIONS,
+                    block=False,
+                    retries=urllib3.Retry(total=0),
+                    headers=_JSON_HEADERS,
+                )
+    return _pool
+
+
+def _timeout(read_s: float) -> urllib3.Timeout:
+    return urllib3.Timeout(connect=min(CONNECT_TIMEOUT_S, read_s), read=read_s)
+
+
+def _raise_for_status(resp: Any, url: str) -> None:
+    if resp.status >= 400:
+        raise OllamaHTTPError(f"HTTP {resp.status} en {url}")
+
+
+def post_json(url: str, body: bytes, timeout: float) -> Dict[str, Any]:
+    """POST de un cuerpo JSON ya serializado; devuelve la respuesta decodificada.
+
+    Lanza ``urllib3.exceptions.HTTPError`` (red/HTTP) o ``ValueError`` (JSON inválido).
+    """
+    resp = get_pool().request("POST", url, body=body, timeout=_timeout(timeout))
+    _raise_for_status(resp, url)
+    return orjson.loads(resp.data)
+
+
+def post_json_lines(url: str, body: bytes, timeout: float) -> Iterator[bytes]:
+    """POST en streaming; itera las líneas NDJSON de la respuesta.
+
+    Si el consumidor deja de iterar antes del final, la conexión se cierra en vez
+    de devolverse al pool (quedaría con bytes pendientes).
+    """
+    resp = get_pool().request(
+        "POST", url, body=body, timeout=_timeout(timeout), preload_content=False
+    )
+    finished = False
+    try:
+        _raise_for_status(resp, url)
+        for line in resp:
+            yield line.rstrip(b"\r\n")
+        finished = True
+    finally:
+        if not finished:
+            resp.close()
+        resp.release_conn()
+
+
+def warm_pool(url: str, timeout: float) -> bool:
+    """GET ligero por el pool síncrono: deja abierta (keep-alive) la conexión que usará
+    ``post_json``. Devuelve si el servidor respondió sin error."""
+    try:
+        resp = get_pool().request("GET", url, timeout=_timeout(timeout))
+    except urllib3.exceptions.HTTPError:
+        return False
+    return resp.status < 400
+
+
+def get_async_client(base_url: str) -> httpx.AsyncClient:
+    """Devuelve el ``httpx.AsyncClient`` de ``base_url`` para el loop en curso."""
+    loop = asyncio.get_running_loop()
+    cached = _async_clients.get(base_url)
+    if cached is not None and cached[0] is loop and not cached[1].is_closed:
+        return cached[1]
+
+    client = httpx.AsyncClient(
+        base_url=base_url,
+        limits=httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+    )
+    _async_clients[base_url] = (loop, client)
+    return client
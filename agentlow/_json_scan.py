@@ -0,0 +1,128 @@
+"""agentlow._json_scan
+
+Localizador del primer objeto JSON ``{...}`` balanceado dentro de un buffer de bytes
+(respuestas del modelo con texto alrededor).
+
+- Sin dependencias: salta entre delimitadores con ``bytes.find`` (en C).
+- Con numba instalado, las entradas grandes usan una máquina de estados compilada
+  (``@njit(cache=True)`` sobre ``uint8[:]``). Para entradas cortas no compensa el
+  coste de la llamada, así que se sigue usando la versión en Python.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # numba es opcional
+    np = None  # type: ignore[assignment]
+    njit = None
+
+NUMBA_MIN_BYTES = 4096
+
+
+def _find_span_py(s: bytes) -> Optional[Tuple[int, int]]:
+    """Localiza ``(inicio, fin)`` (fin exclusivo) del primer objeto ``{...}`` balanceado.
+
+    Salta entre delimitadores con ``bytes.find`` (en C) en vez de recorrer
+    carácter a carácter. Es seguro sobre UTF-8: ``{ } " \\`` son ASCII y nunca
+    aparecen dentro de una secuencia multibyte.
+    """
+
+    n = len(s)
+    pos = 0
+    depth = 0
+    start = -1
+    # Próxima aparición conocida de cada delimitador (n = no hay más)
+    nq = no = nc = -1
+
+    while pos < n:
+        if nq < pos:
+            nq = s.find(b'"', pos)
+            nq = n if nq == -1 else nq
+        if no < pos:
+            no = s.find(b"{", pos)
+            no = n if no == -1 else no
+        if nc < pos:
+            nc = s.find(b"}", pos)
+            nc = n if nc == -1 else nc
+
+        i = min(nq, no, nc)
+        if i >= n:
+            return None
+
+        if i == nq:
+            # Salta el string completo; una comilla está escapada si la precede
+            # un número impar de barras invertidas.
+            end = i + 1
+            while True:
+                end = s.find(b'"', end)
+                if end == -1:
+                    return None
+                k = end
+                while k > i + 1 and s[k - 1] == 0x5C:
+                    k -= 1
+                if (end - k) % 2 == 0:
+                    break
+                end += 1
+            pos = end + 1
+        elif i == no:
+            if depth == 0:
+                start = i
+            depth += 1
+            pos = i + 1
+        else:
+            if depth > 0:
+                depth -= 1
+                if depth == 0:
+                    return start, i + 1
+            pos = i + 1
+
+    return None
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _find_span_nb(buf):
+        in_str = False
+        escape = False
+        depth = 0
+        start = -1
+        for i in range(buf.shape[0]):
+            c = buf[i]
+            if in_str:
+                if escape:
+                    escape = False
+                elif c == 92:  # barra invertida
+                    escape = True
+                elif c == 34:  # "
+                    in_str = False
+            elif c == 34:
+                in_str = True
+            elif c == 123:  # {
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif c == 125 and depth > 0:  # }
+                depth -= 1
+                if depth == 0:
+                    return start, i + 1
+        return -1, -1
+
+
+def find_first_json_span(s: bytes) -> Optional[Tuple[int, int]]:
+    """``(inicio, fin)`` (fin exclusivo) del primer objeto balanceado, o ``None``."""
+
+    if njit is not None and len(s) >= NUMBA_MIN_BYTES:
+        start, end = _find_span_nb(np.frombuffer(s, dtype=np.uint8))
+        return (int(start), int(end)) if start >= 0 else None
+    return _find_span_py(s)
+
+
+def warmup() -> None:
+    """Compila (o carga de la caché de numba) la versión nativa con una entrada mínima."""
+    if njit is not None:
+        _find_span_nb(np.frombuffer(b'{"a":1}', dtype=np.uint8))
@@ -10,14 +10,82 @@ API pública (usada por tests): ``OllamaAgent``.
 
 from __future__ import annotations
 
-import json
+import asyncio
 import os
 import subprocess
-from typing import Any, Dict, List, Optional
-
-import requests
-
-from .tools import TOOLS_SCHEMA, ToolExecutor
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+import urllib3
+
+from ._http import get_async_client, post_json, warm_pool
+from .cache import ExactCache, SemanticCache, is_cacheable_response, make_key_bytes
+from .persistent_cache import CacheStore
+from . import tools as _tools
+from .tools import ToolExecutor
+
+try:
+    import pygit2
+except ImportError:  # pygit2 es opcional: sin él se usa el binario git
+    pygit2 = None  # type: ignore[assignment]
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# El contexto (ls + git status) se reutiliza mientras el directorio y el índice
+# de git no cambien, como mucho este tiempo.
+CONTEXT_TTL_S = 2.0
+
+# Tras un calentamiento o un ``/api/chat`` síncrono correcto la conexión sigue en el pool
+# de urllib3 (``_http.get_pool``); no se vuelve a calentar antes de este tiempo.
+WARM_CONNECTION_TTL_S = 3.0
+
+# Usuario del proceso para el contexto: no cambia durante la ejecución, se lee una vez
+# (antes era una consulta a ``os.environ`` por turno).
+_USER = os.environ.get("USER", "unknown")
+
+
+def _preview(obj: Any, n: int) -> str:
+    """Primeros ``n`` bytes del JSON de ``obj`` (para logs en modo verbose)."""
+    data = orjson.dumps(obj, default=str)
+    if len(data) <= n:
+        return data.decode("utf-8")
+    # Un corte a mitad de un carácter multibyte se descarta
+    return data[:n].decode("utf-8", "ignore") + "..."
+
+
+if pygit2 is not None:
+    _GIT_INDEX_CODES = (
+        (pygit2.GIT_STATUS_INDEX_NEW, "A"),
+        (pygit2.GIT_STATUS_INDEX_MODIFIED, "M"),
+        (pygit2.GIT_STATUS_INDEX_DELETED, "D"),
+        (pygit2.GIT_STATUS_INDEX_RENAMED, "R"),
+        (pygit2.GIT_STATUS_INDEX_TYPECHANGE, "T"),
+    )
+    _GIT_WT_CODES = (
+        (pygit2.GIT_STATUS_WT_MODIFIED, "M"),
+        (pygit2.GIT_STATUS_WT_DELETED, "D"),
+        (pygit2.GIT_STATUS_WT_RENAMED, "R"),
+        (pygit2.GIT_STATUS_WT_TYPECHANGE, "T"),
+    )
+    _GIT_INDEX_MASK = sum(flag for flag, _ in _GIT_INDEX_CODES)
+
+
+def _git_short_code(flags: int) -> str:
+    """Código ``XY`` de ``git status -s`` a partir de los flags de libgit2."""
+    if flags & pygit2.GIT_STATUS_WT_NEW and not flags & _GIT_INDEX_MASK:
+        return "??"
+    index = worktree = " "
+    for flag, code in _GIT_INDEX_CODES:
+        if flags & flag:
+            index = code
+            break
+    for flag, code in _GIT_WT_CODES:
+        if flags & flag:
+            worktree = code
+            break
+    return index + worktree
 
 
 class OllamaAgent:
@@ -30,135 +98,490 @@ class OllamaAgent:
         work_dir: Optional[str] = None,
         temperature: float = 0.0,
         max_iterations: int = 10,
+        cache: bool = True,
+        cache_size: int = 10_000,
+        semantic_cache: bool = False,
+        semantic_threshold: float = 0.92,
+        embedding_model: str = "nomic-embed-text",
+        cache_dir: Optional[str] = None,
     ) -> None:
+        # Prefijo de /api/chat (model, options, tools) serializado una vez
+        self._payload_prefix: Optional[bytes] = None
         self.model = model
         self.ollama_url = ollama_url
         self.executor = ToolExecutor(work_dir)
         self.temperature = float(temperature)
         self.max_iterations = int(max_iterations)
-
-        # Historial de conversación
+        self.embedding_model = embedding_model
+        self.semantic_threshold = float(semantic_threshold)
+
+        # Caché de respuestas: exacta (nivel 1), semántica (nivel 2, opcional) y
+        # persistente en disco (nivel 3, con ``cache_dir``) para reutilizar entre procesos.
+        self._exact_cache: Optional[ExactCache] = ExactCache(cache_size) if cache else None
+        self._semantic_cache: Optional[SemanticCache] = (
+            SemanticCache(self._embed, threshold=semantic_threshold, max_entries=cache_size)
+            if cache and semantic_cache
+            else None
+        )
+        self._store: Optional[CacheStore] = (
+            CacheStore(cache_dir, max_entries=cache_size) if cache and cache_dir else None
+        )
+        # Los niveles 2 y 3 piden el mismo embedding: se memoriza por texto
+        self._embed_memo = ExactCache(256)
+
+        # Historial de conversación. ``_messages_buf`` guarda los mensajes ya
+        # serializados (separados por comas, sin corchetes): cada turno solo
+        # serializa el mensaje nuevo en vez de todo el historial.
         self.messages: List[Dict[str, Any]] = []
+        self._messages_buf = bytearray()
+        self._messages_src: List[Dict[str, Any]] = self.messages
+        self._messages_len = 0
+
+        # Caché de _get_enriched_context: (clave de mtimes, instante, texto)
+        self._ctx_cache: Optional[Tuple[Tuple[int, int], float, str]] = None
+        # Repositorio pygit2 (se abre una vez; ``False`` = no hay repo o no hay pygit2)
+        self._repo: Any = None
+        # Último calentamiento correcto de la conexión (``time.monotonic``)
+        self._warm_at: Optional[float] = None
+
+    def _sync_messages_buf(self) -> None:
+        """Re-serializa el buffer si ``self.messages`` se modificó por fuera de ``_append_message``."""
+        if self._messages_src is not self.messages or self._messages_len != len(self.messages):
+            self._messages_buf = bytearray(orjson.dumps(self.messages, default=str)[1:-1])
+            self._messages_src = self.messages
+            self._messages_len = len(self.messages)
+
+    def _append_message(self, message: Dict[str, Any]) -> None:
+        """Añade un mensaje al historial y a su forma serializada."""
+        self._sync_messages_buf()
+        if self._messages_buf:
+            self._messages_buf += b","
+        self._messages_buf += orjson.dumps(message, default=str)
+        self.messages.append(message)
+        self._messages_len += 1
+
+    def _messages_json(self, messages: List[Dict[str, Any]]) -> bytes:
+        if messages is self.messages:
+            self._sync_messages_buf()
+            return b"[" + self._messages_buf + b"]"
+        return orjson.dumps(messages, default=str)
+
+    # model/temperature son propiedades: al cambiarlas se invalida el prefijo cacheado
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @model.setter
+    def model(self, value: str) -> None:
+        self._model = value
+        self._payload_prefix = None
+
+    @property
+    def temperature(self) -> float:
+        return self._temperature
+
+    @temperature.setter
+    def temperature(self, value: float) -> None:
+        self._temperature = float(value)
+        self._payload_prefix = None
+
+    def _build_payload_prefix(self, tools: Optional[List[Dict[str, Any]]]) -> bytes:
+        parts = [
+            b'{"model":',
+            orjson.dumps(self._model),
+            b',"stream":false,"options":{"temperature":',
+            orjson.dumps(self._temperature),
+            b"}",
+        ]
+        if tools:
+            parts += [b',"tools":', _tools.TOOLS_SCHEMA_JSON if tools is _tools.TOOLS_SCHEMA else orjson.dumps(tools)]
+        parts.append(b',"messages":')
+        return b"".join(parts)
+
+    def _chat_payload(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]]) -> bytes:
+        """Cuerpo JSON de /api/chat: prefijo constante + historial ya serializado + ``}``."""
+        if tools is _tools.TOOLS_SCHEMA:
+            if self._payload_prefix is None:
+                self._payload_prefix = self._build_payload_prefix(tools)
+            prefix = self._payload_prefix
+        else:
+            prefix = self._build_payload_prefix(tools)
+
+        if messages is self.messages:
+            self._sync_messages_buf()
+            return b"".join((prefix, b"[", self._messages_buf, b"]}"))
+        return b"".join((prefix, orjson.dumps(messages, default=str), b"}"))
+
+    def _embed(self, text: str) -> List[float]:
+        """Embedding del texto vía Ollama (/api/embeddings), para la caché semántica."""
+        memo = self._embed_memo.get(text)
+        if memo is not None:
+            return memo
+        data = post_json(
+            f"{self.ollama_url}/api/embeddings",
+            orjson.dumps({"model": self.embedding_model, "prompt": text}),
+            timeout=60,
+        )
+        embedding = data.get("embedding") or []
+        self._embed_memo.put(text, embedding)
+        return embedding
+
+    @staticmethod
+    def _semantic_text(messages: List[Dict[str, Any]]) -> str:
+        return "\n".join(str(m.get("content", "")) for m in messages if m.get("role") in ("user", "tool"))
+
+    def _semantic_scope(self, messages: List[Dict[str, Any]]) -> str:
+        return f"{self.model}|{self.temperature}|{len(messages)}"
+
+    def _cache_lookup(
+        self, messages: List[Dict[str, Any]], payload: bytes
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Devuelve ``(key, respuesta_cacheada)``; ``key`` es ``None`` si la caché está desactivada."""
+        if self._exact_cache is None:
+            return None, None
+        key = make_key_bytes(payload)
+        hit = self._exact_cache.get(key)
+        if hit is None and self._store is not None:
+            hit = self._store.get(key)
+            if hit is not None:
+                self._exact_cache.put(key, hit)
+        if hit is None and self._semantic_cache is not None:
+            text = self._semantic_text(messages)
+            scope = self._semantic_scope(messages)
+            try:
+                hit = self._semantic_cache.get(text, scope)
+                if hit is None and self._store is not None:
+                    hit = self._store.get_similar(self._embed(text), scope=scope, threshold=self.semantic_threshold)
+            except (urllib3.exceptions.HTTPError, ValueError):
+                hit = None
+        return key, hit
+
+    def _cache_store(self, key: Optional[str], messages: List[Dict[str, Any]], response: Dict[str, Any]) -> None:
+        if key is None or self._exact_cache is None or not is_cacheable_response(response):
+            return
+        self._exact_cache.put(key, response)
+        embedding: Optional[List[float]] = None
+        scope = ""
+        if self._semantic_cache is not None:
+            text = self._semantic_text(messages)
+            scope = self._semantic_scope(messages)
+            try:
+                self._semantic_cache.put(text, response, scope)
+                embedding = self._embed(text)
+            except (urllib3.exceptions.HTTPError, ValueError):
+                embedding = None
+        if self._store is not None:
+            self._store.put(key, response, embedding=embedding, scope=scope)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de respuestas."""
+        return {
+            "exact": self._exact_cache.stats() if self._exact_cache is not None else None,
+            "semantic": self._semantic_cache.stats() if self._semantic_cache is not None else None,
+            "persistent": self._store.stats() if self._store is not None else None,
+        }
+
+    def close(self) -> None:
+        """Vuelca y cierra la caché persistente (si la hay)."""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
 
     def _call_ollama(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Llama a la API de Ollama (/api/chat)."""
-        payload: Dict[str, Any] = {
-            "model": self.model,
-            "messages": messages,
-            "stream": False,
-            "options": {"temperature": self.temperature},
-        }
-        if tools:
-            payload["tools"] = tools
+        payload = self._chat_payload(messages, tools)
+        key, hit = self._cache_lookup(messages, payload)
+        if hit is not None:
+            return hit
 
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/chat",
-                json=payload,
-                timeout=120,
-            )
+            data = post_json(f"{self.ollama_url}/api/chat", payload, timeout=120)
+        except (urllib3.exceptions.HTTPError, ValueError) as e:
+            return {"error": f"Error llamando a Ollama: {e}"}
+        self._warm_at = time.monotonic()  # la conexión del pool acaba de usarse
+
+        self._cache_store(key, messages, data)
+        return data
+
+    async def _acall_ollama(
+        self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Variante asíncrona de ``_call_ollama`` (httpx con keep-alive)."""
+        payload = self._chat_payload(messages, tools)
+        if self._semantic_cache is None:
+            key, hit = self._cache_lookup(messages, payload)
+        else:
+            key, hit = await asyncio.to_thread(self._cache_lookup, messages, payload)
+        if hit is not None:
+            return hit
+
+        client = get_async_client(self.ollama_url)
+        try:
+            response = await client.post("/api/chat", content=payload, headers=_JSON_HEADERS, timeout=120)
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
             return {"error": f"Error llamando a Ollama: {e}"}
 
+        if self._semantic_cache is None:
+            self._cache_store(key, messages, data)
+        else:
+            await asyncio.to_thread(self._cache_store, key, messages, data)
+        return data
+
+    def _context_key(self) -> Tuple[int, int]:
+        """mtimes del directorio de trabajo y de ``.git/index`` (0 si no existen)."""
+        work_dir = self.executor.work_dir
+        try:
+            dir_mtime = os.stat(work_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = 0
+        try:
+            index_mtime = os.stat(work_dir / ".git" / "index").st_mtime_ns
+        except OSError:
+            index_mtime = 0
+        return dir_mtime, index_mtime
+
     def _get_enriched_context(self) -> str:
-        """Genera contexto enriquecido del sistema (defensivo)."""
+        """Genera contexto enriquecido del sistema (defensivo, cacheado ``CONTEXT_TTL_S``)."""
+        key = self._context_key()
+        now = time.monotonic()
+        cached = self._ctx_cache
+        if cached is not None and cached[0] == key and now - cached[1] < CONTEXT_TTL_S:
+            return cached[2]
+
+        context = self._build_enriched_context()
+        self._ctx_cache = (key, now, context)
+        return context
+
+    def _build_enriched_context(self) -> str:
         context_parts = [
             f"📂 Directorio actual: {self.executor.work_dir}",
-            f"👤 Usuario: {os.getenv('USER', 'unknown')}",
+            f"👤 Usuario: {_USER}",
         ]
 
-        # Listar archivos en directorio actual
+        # Listar archivos en directorio actual (solo los 10 primeros)
         try:
-            files = list(self.executor.work_dir.iterdir())[:10]
-            if files:
-                file_list = ", ".join([f.name for f in files])
-                context_parts.append(f"📄 Archivos visibles: {file_list}")
+            names: List[str] = []
+            with os.scandir(self.executor.work_dir) as it:
+                for entry in it:
+                    names.append(entry.name)
+                    if len(names) >= 10:
+                        break
+            if names:
+                context_parts.append(f"📄 Archivos visibles: {', '.join(names)}")
         except OSError:
             pass
 
-        # Git status si existe
+        git_status = self._git_status_short()
+        if git_status:
+            context_parts.append(f"🔀 Git: {git_status[:100]}")
+
+        return "\n".join(context_parts)
+
+    def _git_repo(self) -> Any:
+        if self._repo is None:
+            self._repo = False
+            if pygit2 is not None:
+                try:
+                    path = pygit2.discover_repository(str(self.executor.work_dir))
+                    if path:
+                        self._repo = pygit2.Repository(path)
+                except (pygit2.GitError, KeyError, ValueError):
+                    pass
+        return self._repo or None
+
+    def _git_status_short(self) -> str:
+        """Equivalente a ``git status -s``: en proceso con pygit2 o, si no, con el binario."""
+        repo = self._git_repo()
+        if repo is not None:
+            try:
+                return "\n".join(
+                    f"{_git_short_code(flags)} {path}" for path, flags in sorted(repo.status().items())
+                    if not flags & pygit2.GIT_STATUS_IGNORED
+                )
+            except pygit2.GitError:
+                pass
+
+        # Sin shell y sin tomar el lock del índice
         try:
             result = subprocess.run(
-                "git status -s",
-                shell=True,
+                ["git", "--no-optional-locks", "status", "-s"],
                 cwd=self.executor.work_dir,
+                env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
                 capture_output=True,
                 text=True,
                 timeout=5,
             )
-            if result.returncode == 0 and result.stdout.strip():
-                context_parts.append(f"🔀 Git: {result.stdout.strip()[:100]}")
+            if result.returncode == 0:
+                return result.stdout.strip()
         except (OSError, subprocess.TimeoutExpired):
             pass
+        return ""
 
-        return "\n".join(context_parts)
+    async def _awarm_context(self) -> None:
+        """Precalcula el contexto enriquecido (queda en la caché de contexto)."""
+        await asyncio.to_thread(self._get_enriched_context)
+
+    async def _awarm_connection(self) -> None:
+        """``GET /api/tags`` para dejar abierta (keep-alive) la conexión con Ollama.
+
+        Por el pool síncrono de ``_http``: es el que usan ``chat``/``run`` (``post_json``).
+
+        Se omite si la conexión se usó con éxito (calentamiento o turno) hace menos de
+        ``WARM_CONNECTION_TTL_S`` (p.ej. justo tras una respuesta, o líneas vacías seguidas).
+        """
+        if self._warm_at is not None and time.monotonic() - self._warm_at < WARM_CONNECTION_TTL_S:
+            return
+        if await asyncio.to_thread(warm_pool, f"{self.ollama_url}/api/tags", 5.0):
+            self._warm_at = time.monotonic()
+
+    def _start_turn(self, user_input: str, context: str) -> None:
+        self._append_message({"role": "user", "content": f"{context}\n\n{user_input}"})
+
+    def _print_iteration(self, iteration: int, verbose: bool) -> None:
+        if verbose:
+            print("\n" + "=" * 60)
+            print(f"🔄 Iteración {iteration}/{self.max_iterations}")
+            print("=" * 60)
+
+    def _handle_response(self, response: Dict[str, Any], verbose: bool) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """Procesa una respuesta de Ollama.
+
+        Devuelve ``(final, tool_calls)``: ``final`` no es ``None`` cuando el turno terminó.
+        """
+        if "error" in response:
+            return f"❌ Error: {response['error']}", []
+
+        message = response.get("message", {})
+
+        # Respuesta final
+        if not message.get("tool_calls"):
+            final_content = str(message.get("content", ""))
+            self._append_message({"role": "assistant", "content": final_content})
+            if verbose:
+                print(f"\n✅ Respuesta final:\n{final_content}")
+            return final_content, []
+
+        tool_calls = message.get("tool_calls", [])
+        if verbose:
+            print(f"\n🔧 Herramientas solicitadas: {len(tool_calls)}")
+
+        self._append_message(
+            {
+                "role": "assistant",
+                "content": str(message.get("content", "")),
+                "tool_calls": tool_calls,
+            }
+        )
+        return None, tool_calls
+
+    @staticmethod
+    def _parse_tool_arguments(tool_calls: List[Dict[str, Any]]) -> List[Any]:
+        """Argumentos de cada tool call, en orden.
+
+        Ollama puede enviar ``arguments`` ya como objeto o como string JSON. Se
+        decodifican todos en una pasada; solo si alguno falla se repite uno a uno
+        para atribuir el error (esa posición queda con la excepción).
+        """
+        raw_list = [tc["function"].get("arguments", "{}") for tc in tool_calls]
+        try:
+            return [raw if isinstance(raw, dict) else orjson.loads(raw) for raw in raw_list]
+        except orjson.JSONDecodeError:
+            pass
+
+        parsed: List[Any] = []
+        for raw in raw_list:
+            try:
+                parsed.append(raw if isinstance(raw, dict) else orjson.loads(raw))
+            except orjson.JSONDecodeError as e:
+                parsed.append(e)
+        return parsed
+
+    def _exec_tool(self, tool_call: Dict[str, Any], arguments: Any, verbose: bool) -> Dict[str, Any]:
+        """Ejecuta un tool call con sus argumentos ya parseados."""
+        function_name = tool_call["function"]["name"]
+
+        if isinstance(arguments, orjson.JSONDecodeError):
+            if verbose:
+                print(f"⚠️  JSON inválido en {function_name}, reintentando...")
+            return {"error": f"JSON inválido: {arguments}. Corrige SOLO el JSON, no cambies la herramienta."}
+
+        if verbose:
+            print(f"\n▶️  Ejecutando: {function_name}")
+            print(f"   Args: {_preview(arguments, 100)}")
+        result = self.executor.execute_tool(function_name, arguments)
+        if verbose:
+            print(f"   ✓ Resultado: {_preview(result, 200)}")
+        return result
+
+    async def _aexec_tool(self, tool_call: Dict[str, Any], arguments: Any, verbose: bool) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._exec_tool, tool_call, arguments, verbose)
+
+    async def _aexec_tools(
+        self, tool_calls: List[Dict[str, Any]], arguments: List[Any], verbose: bool
+    ) -> List[Dict[str, Any]]:
+        """Ejecuta los tool calls en el orden pedido por el modelo.
+
+        Solo las rachas consecutivas de herramientas "informational" (lecturas sin
+        efectos) van en paralelo; un ``write_file`` seguido de ``read_file`` o un
+        ``git add`` seguido de ``git commit`` se ejecutan uno tras otro.
+        """
+        results: List[Dict[str, Any]] = []
+        batch: List[Any] = []
+        for tc, args in zip(tool_calls, arguments):
+            if _tools.TOOL_SEMANTICS.get(tc["function"]["name"]) == "informational":
+                batch.append(self._aexec_tool(tc, args, verbose))
+                continue
+            if batch:
+                results.extend(await asyncio.gather(*batch))
+                batch = []
+            results.append(await self._aexec_tool(tc, args, verbose))
+        if batch:
+            results.extend(await asyncio.gather(*batch))
+        return results
+
+    def _append_tool_result(self, result: Dict[str, Any]) -> None:
+        content = orjson.dumps(result, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        self._append_message({"role": "tool", "content": content})
 
     def run(self, user_input: str, verbose: bool = True) -> str:
         """Ejecuta el agente con el input del usuario."""
-        context = self._get_enriched_context()
-        enhanced_input = f"{context}\n\n{user_input}"
+        self._start_turn(user_input, self._get_enriched_context())
 
-        self.messages.append({"role": "user", "content": enhanced_input})
+        for iteration in range(1, self.max_iterations + 1):
+            self._print_iteration(iteration, verbose)
 
-        iteration = 0
-        while iteration < self.max_iterations:
-            iteration += 1
+            response = self._call_ollama(self.messages, _tools.TOOLS_SCHEMA)
+            final, tool_calls = self._handle_response(response, verbose)
+            if final is not None:
+                return final
 
-            if verbose:
-                print("\n" + "=" * 60)
-                print(f"🔄 Iteración {iteration}/{self.max_iterations}")
-                print("=" * 60)
+            for tool_call, arguments in zip(tool_calls, self._parse_tool_arguments(tool_calls)):
+                self._append_tool_result(self._exec_tool(tool_call, arguments, verbose))
 
-            response = self._call_ollama(self.messages, TOOLS_SCHEMA)
-            if "error" in response:
-                return f"❌ Error: {response['error']}"
+        return f"⚠️ Se alcanzó el límite de {self.max_iterations} iteraciones sin respuesta final."
 
-            message = response.get("message", {})
+    async def arun(self, user_input: str, verbose: bool = True) -> str:
+        """Variante asíncrona de ``run``.
 
-            # Respuesta final
-            if not message.get("tool_calls"):
-                final_content = str(message.get("content", ""))
-                self.messages.append({"role": "assistant", "content": final_content})
-                if verbose:
-                    print(f"\n✅ Respuesta final:\n{final_content}")
-                return final_content
+        Las tool calls de una iteración respetan el orden del modelo; solo las
+        lecturas consecutivas se ejecutan en paralelo (ver ``_aexec_tools``).
+        """
+        context = await asyncio.to_thread(self._get_enriched_context)
+        self._start_turn(user_input, context)
 
-            tool_calls = message.get("tool_calls", [])
-            if verbose:
-                print(f"\n🔧 Herramientas solicitadas: {len(tool_calls)}")
-
-            self.messages.append(
-                {
-                    "role": "assistant",
-                    "content": str(message.get("content", "")),
-                    "tool_calls": tool_calls,
-                }
-            )
+        for iteration in range(1, self.max_iterations + 1):
+            self._print_iteration(iteration, verbose)
 
-            for tool_call in tool_calls:
-                function_name = tool_call["function"]["name"]
+            response = await self._acall_ollama(self.messages, _tools.TOOLS_SCHEMA)
+            final, tool_calls = self._handle_response(response, verbose)
+            if final is not None:
+                return final
 
-                # Validar/parsear argumentos
-                raw_args = tool_call["function"].get("arguments", "{}")
-                try:
-                    arguments = json.loads(raw_args)
-                except json.JSONDecodeError as e:
-                    if verbose:
-                        print(f"⚠️  JSON inválido en {function_name}, reintentando...")
-                    result: Dict[str, Any] = {
-                        "error": f"JSON inválido: {e}. Corrige SOLO el JSON, no cambies la herramienta.",
-                    }
-                else:
-                    if verbose:
-                        print(f"\n▶️  Ejecutando: {function_name}")
-                        print(f"   Args: {json.dumps(arguments, ensure_ascii=False)[:100]}")
-                    result = self.executor.execute_tool(function_name, arguments)
-                    if verbose:
-                        print(f"   ✓ Resultado: {json.dumps(result, ensure_ascii=False)[:200]}")
-
-                self.messages.append({"role": "tool", "content": json.dumps(result, ensure_ascii=False)})
+            arguments = self._parse_tool_arguments(tool_calls)
+            for result in await self._aexec_tools(tool_calls, arguments, verbose):
+                self._append_tool_result(result)
 
         return f"⚠️ Se alcanzó el límite de {self.max_iterations} iteraciones sin respuesta final."
 
@@ -166,9 +589,16 @@ class OllamaAgent:
         """Modo chat interactivo (mantiene historial)."""
         return self.run(user_input, verbose)
 
+    async def achat(self, user_input: str, verbose: bool = True) -> str:
+        """Modo chat asíncrono (mantiene historial)."""
+        return await self.arun(user_input, verbose)
+
     def reset(self) -> None:
         """Reinicia el historial de conversación."""
         self.messages = []
+        self._messages_buf = bytearray()
+        self._messages_src = self.messages
+        self._messages_len = 0
 
     def get_history(self) -> List[Dict[str, Any]]:
         """Devuelve el historial de mensajes."""
@@ -0,0 +1,178 @@
+"""agentlow.cache
+
+Caché de respuestas del LLM en dos niveles:
+
+- ``ExactCache``: LRU en memoria indexada por el hash del prompt canónico
+  (modelo, temperatura, mensajes y esquema de tools).
+- ``SemanticCache``: similitud coseno sobre embeddings del contenido
+  (usuario + outputs de herramientas). Requiere numpy y una función de embedding.
+
+Admisión: solo entran respuestas "informativas". Un turno que pide herramientas
+de tipo comando (ver ``TOOL_SEMANTICS``) no se guarda.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import orjson
+
+from .tools import TOOL_SEMANTICS
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: solo lo usa la caché semántica
+    np = None  # type: ignore[assignment]
+
+
+def make_key(
+    model: str,
+    temperature: float,
+    messages: List[Dict[str, Any]],
+    tools: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Hash estable de una petición a /api/chat."""
+    return make_key_canonical([model, float(temperature), messages, tools or []])
+
+
+def make_key_canonical(obj: Any) -> str:
+    """Hash de ``obj`` en forma canónica: orjson con claves ordenadas (en C) + blake2b.
+
+    Compartido con ``CacheStore.make_key`` para que ambos niveles hasheen igual.
+    """
+    return make_key_bytes(orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS))
+
+
+def make_key_bytes(payload: bytes) -> str:
+    """Hash de una petición ya serializada (p.ej. el cuerpo exacto enviado a /api/chat)."""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def is_cacheable_response(response: Dict[str, Any]) -> bool:
+    """Una respuesta es cacheable si no es error y solo pide herramientas informativas."""
+    if "error" in response:
+        return False
+    tool_calls = (response.get("message") or {}).get("tool_calls") or []
+    return all(
+        TOOL_SEMANTICS.get(str((tc.get("function") or {}).get("name", ""))) == "informational"
+        for tc in tool_calls
+    )
+
+
+class ExactCache:
+    """LRU acotada ``key -> valor``."""
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self.max_entries = int(max_entries)
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SemanticCache:
+    """Caché por similitud coseno (``emb_q @ matrix.T``) con umbral.
+
+    Cada entrada pertenece a un ``scope`` (p.ej. modelo + posición en la conversación);
+    solo se comparan entradas del mismo scope. Al llenarse se expulsa la más antigua.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Sequence[float]],
+        *,
+        threshold: float = 0.92,
+        max_entries: int = 10_000,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("SemanticCache requiere numpy (pip install numpy)")
+        self.embed = embed
+        self.threshold = float(threshold)
+        self.max_entries = int(max_entries)
+        self._matrix: Optional["np.ndarray"] = None
+        self._scopes = np.zeros(self.max_entries, dtype=np.int32)
+        self._scope_ids: Dict[str, int] = {}
+        self._values: List[Any] = []
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _vector(self, text: str) -> "np.ndarray":
+        vec = np.asarray(self.embed(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        with self._lock:
+            sid = self._scope_ids.get(scope)
+            if self._matrix is None or sid is None:
+                self.misses += 1
+                return None
+        q = self._vector(text)
+        with self._lock:
+            n = len(self._values)
+            if q.shape[0] != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._matrix[:n] @ q
+            scores[self._scopes[:n] != sid] = -1.0
+            idx = int(scores.argmax())
+            if scores[idx] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._values[idx]
+
+    def put(self, text: str, value: Any, scope: str = "") -> None:
+        q = self._vector(text)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+            elif q.shape[0] != self._matrix.shape[1]:
+                return
+            sid = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            slot = self._next
+            if slot < len(self._values):
+                self._values[slot] = value
+            else:
+                self._values.append(value)
+            self._matrix[slot] = q
+            self._scopes[slot] = sid
+            self._next = (slot + 1) % self.max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = []
+            self._next = 0
+            self._scope_ids.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._values), "hits": self.hits, "misses": self.misses, "threshold": self.threshold}
@@ -3,48 +3,131 @@
 CLI mínima para ejecutar el agente en modo interactivo.
 
 Entry point (setup.py): ``agentlow=agentlow.cli:main``.
+
+Mientras el usuario escribe, en segundo plano se calientan (una vez por prompt)
+el contexto enriquecido y la conexión con Ollama, y una sola vez el decoder de
+reflexiones, de modo que el turno arranca sin esperas. Con ``prompt_toolkit`` instalado se usa su prompt asíncrono; si no,
+``input()`` en un hilo daemon.
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import threading
 
 from .agent import OllamaAgent
+from .reflection import _warmup as _warmup_reflection
 
+try:
+    from prompt_toolkit import PromptSession
+except ImportError:  # prompt_toolkit es opcional
+    PromptSession = None  # type: ignore[assignment,misc]
 
-def main() -> None:
-    parser = argparse.ArgumentParser(prog="agentlow", description="🥜 AgentLow/Peanut-Agent (CLI)")
+PROMPT = "\n👤 Tú: "
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="agentlow",
+        description="🥜 AgentLow/Peanut-Agent (CLI)",
+        epilog=(
+            "Variables de entorno: OLLAMA_NUM_PARALLEL (por defecto 1) limita cuántas "
+            "reflexiones se envían a la vez a Ollama; conviene igualarla a la del servidor."
+        ),
+    )
     parser.add_argument("--model", default="qwen2.5:7b", help="Modelo Ollama (ej: qwen2.5:7b)")
     parser.add_argument("--ollama-url", default="http://localhost:11434", help="URL de Ollama")
     parser.add_argument("--work-dir", default=None, help="Directorio de trabajo")
     parser.add_argument("--temperature", type=float, default=0.0, help="Temperatura")
     parser.add_argument("--max-iterations", type=int, default=10, help="Máx iteraciones")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directorio de caché persistente de respuestas (se reutiliza entre ejecuciones)",
+    )
+    return parser.parse_args()
+
+
+async def _warm_up(agent: OllamaAgent) -> None:
+    """Calienta conexión y contexto una vez (sin refrescos periódicos mientras el prompt espera)."""
+    await asyncio.gather(
+        agent._awarm_connection(),
+        agent._awarm_context(),
+        asyncio.to_thread(_warmup_reflection),  # no-op tras la primera vez
+    )
+
+
+async def _ainput(prompt: str) -> str:
+    """``input()`` en un hilo daemon: tras Ctrl-C, ``asyncio.run`` no espera a que vuelva."""
+    loop = asyncio.get_running_loop()
+    fut: asyncio.Future[str] = loop.create_future()
+
+    def _deliver(setter, value) -> None:
+        if not fut.done():
+            setter(value)
 
+    def _read() -> None:
+        try:
+            line = input(prompt)
+        except BaseException as e:  # EOFError (Ctrl-D) llega al bucle de la CLI
+            loop.call_soon_threadsafe(_deliver, fut.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(_deliver, fut.set_result, line)
+
+    threading.Thread(target=_read, name="agentlow-input", daemon=True).start()
+    return await fut
+
+
+async def _aprompt(session: object, agent: OllamaAgent) -> str:
+    warm = asyncio.create_task(_warm_up(agent))
+    try:
+        if session is not None:
+            return await session.prompt_async(PROMPT)  # type: ignore[attr-defined]
+        return await _ainput(PROMPT)
+    finally:
+        warm.cancel()
+
+
+async def amain(args: argparse.Namespace) -> None:
     agent = OllamaAgent(
         model=args.model,
         ollama_url=args.ollama_url,
         work_dir=args.work_dir,
         temperature=args.temperature,
         max_iterations=args.max_iterations,
+        cache_dir=args.cache_dir,
     )
+    session = PromptSession() if PromptSession is not None else None
 
     print("🥜 AgentLow CLI — modo interactivo")
     print("Escribe 'salir' para terminar")
 
-    while True:
-        try:
-            prompt = input("\n👤 Tú: ").strip()
+    try:
+        while True:
+            try:
+                prompt = (await _aprompt(session, agent)).strip()
+            except (KeyboardInterrupt, EOFError):
+                print("\n👋 ¡Hasta luego!")
+                return
             if not prompt:
                 continue
             if prompt.lower() in {"salir", "exit", "quit"}:
                 print("👋 ¡Hasta luego!")
                 return
-            reply = agent.chat(prompt, verbose=False)
+            # Camino síncrono de siempre (tool calls en serie) en un hilo: el loop sigue libre
+            reply = await asyncio.to_thread(agent.chat, prompt, verbose=False)
             print(f"\n🤖 Agente: {reply}")
-        except KeyboardInterrupt:
-            print("\n👋 ¡Hasta luego!")
-            return
+    finally:
+        agent.close()
+
+
+def main() -> None:
+    args = _parse_args()
+    try:
+        asyncio.run(amain(args))
+    except KeyboardInterrupt:
+        print("\n👋 ¡Hasta luego!")
 
 
 if __name__ == "__main__":
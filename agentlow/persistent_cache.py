@@ -0,0 +1,648 @@
+"""agentlow.persistent_cache
+
+Caché persistente (nivel 3) para reutilizar respuestas entre procesos de la CLI.
+
+- SQLite (WAL) con ``cache(key, value, ts, scope, emb)``: búsqueda exacta por hash;
+  ``value`` es JSON de orjson guardado como BLOB.
+- Embeddings: matriz float32 cruda (fila a fila, normalizadas) en ``embeddings.f32``.
+  SQLite es la fuente de verdad: ``cache.emb_row`` es la fila de cada clave y
+  ``emb_meta(dim, rows)`` describe el archivo; al arrancar se validan contra el
+  tamaño real y, si no cuadran, se reconstruye desde los BLOB ``emb``. El archivo
+  se abre con ``np.memmap`` (sin copiarlo a memoria) y el coseno es un único
+  ``matrix @ q``. Las filas nuevas se acumulan en RAM y ``flush()`` / ``close()``
+  las añaden al final bajo un lock de archivo (``embeddings.lock``) compartido
+  entre procesos. Las filas de claves expulsadas o reemplazadas quedan muertas y
+  se compactan (reescritura completa) cuando superan a las vivas.
+  numpy es opcional: sin él solo funciona el nivel exacto.
+- LRU en memoria (``memory_entries``) delante de SQLite: las claves repetidas no
+  pagan ni la consulta ni la decodificación JSON.
+- Tamaño acotado (``max_entries``): se expulsan las entradas con ``ts`` más antiguo.
+  El número de filas se lleva en memoria (sin ``COUNT(*)`` por escritura) y se
+  recuenta en cada checkpoint, porque otros procesos escriben en la misma base.
+- Una conexión SQLite por hilo (mismo archivo WAL): las lecturas no se serializan
+  entre hilos; las escrituras del proceso siguen pasando por un único lock.
+- Escrituras: ``synchronous=NORMAL`` (seguro con WAL, sin fsync por commit),
+  ``put_many`` en una sola transacción y borrado diferido de las caducadas en ``get``.
+  Cada ``CHECKPOINT_EVERY`` escrituras (y en ``close``) el WAL se vuelca y se trunca.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import orjson
+
+from .cache import make_key_canonical
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: solo lo usa la búsqueda semántica
+    np = None  # type: ignore[assignment]
+
+DB_NAME = "cache.db"
+EMB_NAME = "embeddings.f32"
+EMB_LOCK_NAME = "embeddings.lock"
+# Índice de claves de versiones anteriores (ahora vive en SQLite); se borra al abrir
+LEGACY_EMB_KEYS_NAME = "embeddings.keys.jsonl"
+# Filas muertas (expulsadas/reemplazadas) mínimas para compactar ``embeddings.f32``
+COMPACT_MIN_DEAD = 256
+# Claves caducadas acumuladas por ``get`` antes de borrarlas en un único DELETE
+LAZY_DELETE_BATCH = 64
+# Escrituras entre ``wal_checkpoint(TRUNCATE)``: acota el tamaño del WAL en sesiones largas
+CHECKPOINT_EVERY = 500
+
+
+@contextlib.contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Lock exclusivo entre procesos sobre ``path`` (flock / msvcrt.locking)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CacheStore:
+    """Caché en disco ``key -> valor JSON`` con búsqueda opcional por embedding."""
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        *,
+        ttl_seconds: Optional[float] = None,
+        max_entries: int = 10_000,
+        memory_entries: int = 1024,
+    ) -> None:
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = int(max_entries)
+        self.memory_entries = int(memory_entries)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._db_path = str(self.cache_dir / DB_NAME)
+        self._tls = threading.local()
+        self._all_conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()  # aparte de ``_lock``: se pide con él ya tomado
+        self._closed = False
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " ts REAL NOT NULL,"
+            " scope TEXT NOT NULL DEFAULT '',"
+            " emb BLOB)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache(ts)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb_meta ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " dim INTEGER NOT NULL,"
+            " rows INTEGER NOT NULL)"
+        )
+        if "emb_row" not in {row[1] for row in conn.execute("PRAGMA table_info(cache)")}:
+            try:
+                conn.execute("ALTER TABLE cache ADD COLUMN emb_row INTEGER")
+            except sqlite3.OperationalError:  # otro proceso la añadió a la vez
+                pass
+        conn.commit()
+        (self._rows,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        self._pending_deletes: Set[str] = set()
+        self._writes_since_checkpoint = 0
+        # key -> (ts, valor decodificado), en orden LRU
+        self._mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        # Índice de embeddings: filas de ``_emb_matrix`` (mmap) + ``_emb_pending`` (RAM).
+        # ``_emb_keys``/``_emb_scopes`` cubren ambas partes; ``None`` marca una fila muerta.
+        self._emb_keys: List[Optional[str]] = []
+        self._emb_scopes: List[Optional[str]] = []
+        self._emb_slot: Dict[str, int] = {}
+        self._emb_matrix: Optional["np.ndarray"] = None
+        self._emb_pending: List["np.ndarray"] = []
+        self._emb_dim: Optional[int] = None
+        self._dead_rows = 0
+        if np is not None:
+            self._load_embeddings()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Hash estable de (modelo, mensajes, tools) con ``agentlow.cache.make_key_canonical``."""
+        return make_key_canonical({"model": model, "messages": messages, "tools": tools or []})
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (se crea y configura en su primer uso)."""
+        # Antes que ``_tls``: la conexión que otro hilo guardó ya está cerrada
+        if self._closed:
+            raise sqlite3.ProgrammingError("CacheStore cerrado")
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            # check_same_thread=False solo para que ``close()`` pueda cerrarlas todas
+            conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(f"PRAGMA wal_autocheckpoint={CHECKPOINT_EVERY}")
+            self._tls.conn = conn
+            with self._conns_lock:
+                self._all_conns.append(conn)
+        return conn
+
+    # --- nivel exacto ---
+
+    def _expired(self, ts: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - ts > self.ttl_seconds
+
+    def _remember_locked(self, key: str, ts: float, value: Any) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._mem[key] = (ts, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            cached = self._mem.get(key)
+            if cached is not None:
+                if not self._expired(cached[0]):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                del self._mem[key]
+
+        # Lectura sin lock: cada hilo usa su conexión y WAL no bloquea a los lectores
+        row = self._conn().execute("SELECT value, ts FROM cache WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            if self._expired(row[1]):
+                # Borrado diferido: se agrupa con la siguiente escritura (o al llenar el lote)
+                self._pending_deletes.add(key)
+                if len(self._pending_deletes) >= LAZY_DELETE_BATCH:
+                    self._flush_deletes_locked()
+                    self._conn().commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+        # orjson lee tanto BLOB como el TEXT JSON de bases creadas antes del cambio
+        value = orjson.loads(row[0])
+        with self._lock:
+            self._remember_locked(key, row[1], value)
+        return value
+
+    def put(
+        self,
+        key: str,
+        value: Any,
+        *,
+        embedding: Optional[Sequence[float]] = None,
+        scope: str = "",
+    ) -> None:
+        vec = self._normalize(embedding) if embedding is not None and np is not None else None
+        if vec is not None and not self._dim_matches(vec):
+            vec = None
+
+        now = time.time()
+        with self._lock:
+            self._forget_embedding_locked(key)
+            if self._conn().execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is None:
+                self._rows += 1
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (key, value, ts, scope, emb) VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    orjson.dumps(value),
+                    now,
+                    scope,
+                    vec.tobytes() if vec is not None else None,
+                ),
+            )
+            self._remember_locked(key, now, value)
+            self._pending_deletes.discard(key)
+            self._flush_deletes_locked()
+            self._evict_locked()
+            self._conn().commit()
+            self._count_writes_locked(1)
+            if vec is not None:
+                self._emb_slot[key] = len(self._emb_keys)
+                self._emb_keys.append(key)
+                self._emb_scopes.append(scope)
+                self._emb_pending.append(vec)
+            self._maybe_compact_locked()
+
+    def put_many(self, items: Iterable[Tuple[str, Any]], *, scope: str = "") -> None:
+        """Inserta varios ``(key, valor)`` (sin embedding) en una sola transacción."""
+        now = time.time()
+        items = list(items)
+        rows = [(key, orjson.dumps(value), now, scope) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            for key, value in items:
+                self._remember_locked(key, now, value)
+                self._forget_embedding_locked(key)
+            self._pending_deletes.difference_update(key for key, *_ in rows)
+            self._flush_deletes_locked()
+            conn = self._conn()
+            self._rows += sum(
+                1
+                for key in {key for key, *_ in rows}
+                if conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is None
+            )
+            self._conn().executemany(
+                "INSERT OR REPLACE INTO cache (key, value, ts, scope, emb) VALUES (?, ?, ?, ?, NULL)", rows
+            )
+            self._evict_locked()
+            self._conn().commit()
+            self._count_writes_locked(len(rows))
+            self._maybe_compact_locked()
+
+    def _flush_deletes_locked(self) -> None:
+        if self._pending_deletes:
+            cur = self._conn().executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in self._pending_deletes])
+            self._rows -= max(cur.rowcount, 0)
+            for key in self._pending_deletes:
+                self._forget_embedding_locked(key)
+            self._pending_deletes.clear()
+
+    def _evict_locked(self) -> None:
+        excess = self._rows - self.max_entries
+        if excess > 0:
+            # Claves explícitas (sin ``RETURNING``, SQLite >= 3.35) para sacarlas también de memoria
+            victims = self._conn().execute("SELECT key FROM cache ORDER BY ts ASC LIMIT ?", (excess,)).fetchall()
+            self._conn().executemany("DELETE FROM cache WHERE key = ?", victims)
+            self._rows -= len(victims)
+            for (key,) in victims:
+                self._mem.pop(key, None)
+                self._forget_embedding_locked(key)
+
+    def prune_expired(self) -> int:
+        """Borra las entradas caducadas; devuelve cuántas."""
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            self._pending_deletes.clear()  # el DELETE por ts ya las incluye
+            victims = self._conn().execute(
+                "SELECT key FROM cache WHERE ts < ?", (time.time() - self.ttl_seconds,)
+            ).fetchall()
+            self._conn().executemany("DELETE FROM cache WHERE key = ?", victims)
+            self._conn().commit()
+            self._rows -= len(victims)
+            for (key,) in victims:
+                self._mem.pop(key, None)
+                self._forget_embedding_locked(key)
+            self._count_writes_locked(len(victims))
+            self._maybe_compact_locked()
+            return len(victims)
+
+    def _count_writes_locked(self, n: int) -> None:
+        self._writes_since_checkpoint += n
+        if self._writes_since_checkpoint >= CHECKPOINT_EVERY:
+            self._checkpoint_locked()
+
+    def _checkpoint_locked(self) -> None:
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._writes_since_checkpoint = 0
+        (self._rows,) = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()
+
+    def checkpoint(self) -> None:
+        """Vuelca el WAL a la base y lo trunca (p.ej. al salir de la CLI)."""
+        with self._lock:
+            self._flush_deletes_locked()
+            self._conn().commit()
+            self._checkpoint_locked()
+
+    # --- nivel semántico ---
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> "np.ndarray":
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def _dim(self) -> Optional[int]:
+        if self._emb_matrix is not None:
+            return int(self._emb_matrix.shape[1])
+        if self._emb_pending:
+            return int(self._emb_pending[0].shape[0])
+        return self._emb_dim
+
+    def _dim_matches(self, vec: "np.ndarray") -> bool:
+        dim = self._dim()
+        return dim is None or dim == vec.shape[0]
+
+    def _forget_embedding_locked(self, key: str) -> None:
+        """Marca como muerta la fila de ``key`` (expulsada, borrada o a punto de reemplazarse)."""
+        slot = self._emb_slot.pop(key, None)
+        if slot is None:
+            return
+        self._emb_keys[slot] = None
+        self._emb_scopes[slot] = None
+        if self._emb_matrix is not None and slot < self._emb_matrix.shape[0]:
+            self._dead_rows += 1
+
+    def get_similar(
+        self,
+        embedding: Sequence[float],
+        *,
+        scope: str = "",
+        threshold: float = 0.92,
+    ) -> Optional[Any]:
+        """Valor de la entrada más parecida (coseno >= ``threshold``) del mismo ``scope``."""
+        if np is None:
+            return None
+        q = self._normalize(embedding)
+        with self._lock:
+            if not self._emb_slot or not self._dim_matches(q):
+                return None
+            parts = []
+            if self._emb_matrix is not None:
+                parts.append(self._emb_matrix @ q)
+            if self._emb_pending:
+                parts.append(np.stack(self._emb_pending) @ q)
+            scores = np.concatenate(parts) if len(parts) > 1 else parts[0]
+            scores = np.where(np.asarray(self._emb_scopes, dtype=object) == scope, scores, -1.0)
+            idx = int(scores.argmax())
+            if scores[idx] < threshold:
+                return None
+            key = self._emb_keys[idx]
+        # La fila puede haber caducado o sido expulsada por otro proceso: ``get`` lo comprueba
+        return self.get(key)
+
+    def _emb_lock(self) -> "contextlib.AbstractContextManager[None]":
+        return _file_lock(self.cache_dir / EMB_LOCK_NAME)
+
+    def _read_meta(self) -> Optional[Tuple[int, int]]:
+        row = self._conn().execute("SELECT dim, rows FROM emb_meta WHERE id = 0").fetchone()
+        return (int(row[0]), int(row[1])) if row else None
+
+    def _emb_file_size(self) -> int:
+        try:
+            return (self.cache_dir / EMB_NAME).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _load_embeddings(self) -> None:
+        with self._lock, self._emb_lock():
+            try:
+                (self.cache_dir / LEGACY_EMB_KEYS_NAME).unlink()
+            except FileNotFoundError:
+                pass
+            # Sin snapshot válido (p.ej. caída entre escribir el archivo y SQLite): se reconstruye
+            if not self._sync_index_locked() and self._write_snapshot_locked():
+                self._sync_index_locked()
+
+    def _sync_index_locked(self) -> bool:
+        """Reconstruye el índice en memoria desde SQLite (requiere el lock de archivo).
+
+        Devuelve False si ``emb_meta`` / ``emb_row`` no cuadran con ``embeddings.f32``.
+        Las filas con embedding aún sin volcar (de este u otro proceso) quedan en RAM.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")  # una sola instantánea para meta + filas
+        try:
+            meta = self._read_meta()
+            placed = conn.execute("SELECT key, scope, emb_row FROM cache WHERE emb_row IS NOT NULL").fetchall()
+            unplaced = conn.execute(
+                "SELECT key, scope, emb FROM cache WHERE emb IS NOT NULL AND emb_row IS NULL ORDER BY ts"
+            ).fetchall()
+        finally:
+            conn.commit()
+
+        dim, rows = meta if meta is not None else (None, 0)
+        if meta is None:
+            if placed:
+                return False
+            self._remove_embedding_files()
+        elif (
+            self._emb_file_size() < rows * dim * 4
+            or len({r for _, _, r in placed}) != len(placed)
+            or any(not 0 <= r < rows for _, _, r in placed)
+        ):
+            return False
+
+        keys: List[Optional[str]] = [None] * rows
+        scopes: List[Optional[str]] = [None] * rows
+        slots: Dict[str, int] = {}
+        for key, scope, r in placed:
+            keys[r], scopes[r], slots[key] = key, scope, r
+        pending = []
+        for key, scope, blob in unplaced:
+            vec = np.frombuffer(blob, dtype=np.float32)
+            if dim is None:
+                dim = vec.shape[0]
+            if vec.shape[0] == dim:
+                slots[key] = len(keys)
+                keys.append(key)
+                scopes.append(scope)
+                pending.append(vec)
+
+        self._emb_matrix = None
+        if rows:
+            # El archivo puede ser más largo (otro proceso añadiendo): solo se mapean ``rows`` filas
+            self._emb_matrix = np.memmap(self.cache_dir / EMB_NAME, dtype=np.float32, mode="r", shape=(rows, dim))
+        self._emb_keys, self._emb_scopes, self._emb_slot = keys, scopes, slots
+        self._emb_pending = pending
+        self._emb_dim = dim
+        self._dead_rows = rows - len(placed)
+        return True
+
+    def _write_snapshot_locked(self) -> bool:
+        """Reescribe ``embeddings.f32`` solo con las filas vivas de SQLite (reconstrucción/compactación).
+
+        Se escribe a un temporal y se sustituye: los procesos que tengan mapeado el
+        archivo anterior siguen leyendo el suyo hasta su próxima sincronización.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            entries = conn.execute("SELECT key, emb FROM cache WHERE emb IS NOT NULL ORDER BY ts").fetchall()
+            meta = self._read_meta()
+            dim = meta[0] if meta is not None else (len(entries[0][1]) // 4 if entries else None)
+            conn.execute("UPDATE cache SET emb_row = NULL WHERE emb_row IS NOT NULL")
+            conn.execute("DELETE FROM emb_meta")
+            live = [(key, blob) for key, blob in entries if dim is not None and len(blob) == 4 * dim]
+            # Embeddings de otra dimensión nunca serían comparables: se descartan
+            conn.executemany(
+                "UPDATE cache SET emb = NULL WHERE key = ?",
+                [(key,) for key, blob in entries if dim is None or len(blob) != 4 * dim],
+            )
+            self._emb_matrix = None
+            if live:
+                tmp = self.cache_dir / (EMB_NAME + ".tmp")
+                with open(tmp, "wb") as f:
+                    f.write(b"".join(blob for _, blob in live))
+                os.replace(tmp, self.cache_dir / EMB_NAME)
+                conn.executemany("UPDATE cache SET emb_row = ? WHERE key = ?", [(i, key) for i, (key, _) in enumerate(live)])
+                conn.execute("INSERT INTO emb_meta (id, dim, rows) VALUES (0, ?, ?)", (dim, len(live)))
+            else:
+                self._remove_embedding_files()
+            conn.commit()
+            return True
+        except OSError:
+            # Windows no deja sustituir un archivo mapeado por otro proceso: se reintenta más
+            # tarde. El archivo anterior sigue en su sitio: se vuelve a mapear desde SQLite.
+            conn.rollback()
+            self._sync_index_locked()
+            return False
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _append_unplaced_locked(self) -> bool:
+        """Añade al final de ``embeddings.f32`` las filas de SQLite sin ``emb_row``.
+
+        Se decide qué escribir dentro de la transacción (no desde la RAM del proceso):
+        lo que otro proceso haya volcado ya tiene ``emb_row`` y no se duplica.
+        Devuelve False si el archivo no cuadra con ``emb_meta`` (hay que reconstruir).
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = self._read_meta()
+            unplaced = conn.execute(
+                "SELECT key, emb FROM cache WHERE emb IS NOT NULL AND emb_row IS NULL ORDER BY ts"
+            ).fetchall()
+            if meta is not None:
+                dim, rows = meta
+            elif unplaced:
+                dim, rows = len(unplaced[0][1]) // 4, 0
+            else:
+                conn.commit()
+                return True
+            end = rows * dim * 4
+            if self._emb_file_size() < end:
+                conn.rollback()
+                return False
+
+            new = [(key, blob) for key, blob in unplaced if len(blob) == 4 * dim]
+            # Soltar el mmap antes de ampliar el archivo (necesario en Windows)
+            self._emb_matrix = None
+            path = self.cache_dir / EMB_NAME
+            with open(path, "r+b" if path.exists() else "wb") as f:
+                f.truncate(end)  # cola de un volcado que se cayó antes de confirmar en SQLite
+                f.seek(end)
+                f.write(b"".join(blob for _, blob in new))
+            conn.executemany(
+                "UPDATE cache SET emb_row = ? WHERE key = ?", [(rows + i, key) for i, (key, _) in enumerate(new)]
+            )
+            conn.execute("INSERT OR REPLACE INTO emb_meta (id, dim, rows) VALUES (0, ?, ?)", (dim, rows + len(new)))
+            conn.commit()
+            return True
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _maybe_compact_locked(self, *, force_check: bool = False) -> None:
+        """Compacta ``embeddings.f32`` si las filas muertas superan a las vivas."""
+        if np is None or not (force_check or self._dead_rows >= COMPACT_MIN_DEAD):
+            return
+        with self._emb_lock():
+            meta = self._read_meta()
+            (live,) = self._conn().execute("SELECT COUNT(*) FROM cache WHERE emb_row IS NOT NULL").fetchone()
+            dead = (meta[1] if meta is not None else 0) - live
+            if dead >= COMPACT_MIN_DEAD and dead > live and self._write_snapshot_locked():
+                self._sync_index_locked()
+            else:
+                self._dead_rows = 0
+
+    def _remove_embedding_files(self) -> None:
+        for name in (EMB_NAME, LEGACY_EMB_KEYS_NAME):
+            try:
+                (self.cache_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:  # mapeado por otro proceso (Windows)
+                pass
+
+    def flush(self) -> None:
+        """Añade a disco las filas de embeddings pendientes (sin reescribir las existentes)."""
+        if np is None:
+            return
+        with self._lock:
+            if not self._emb_pending:
+                return
+            with self._emb_lock():
+                # Si la reconstrucción falla, ella misma vuelve a sincronizar el índice
+                if self._append_unplaced_locked() or self._write_snapshot_locked():
+                    self._sync_index_locked()
+            self._maybe_compact_locked(force_check=True)
+
+    # --- mantenimiento ---
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending_deletes.clear()
+            self._mem.clear()
+            self._emb_keys = []
+            self._emb_scopes = []
+            self._emb_slot = {}
+            self._emb_matrix = None
+            self._emb_pending = []
+            self._dead_rows = 0
+            self._rows = 0
+            with self._emb_lock():
+                self._conn().execute("DELETE FROM cache")
+                self._conn().execute("DELETE FROM emb_meta")
+                self._conn().commit()
+                self._remove_embedding_files()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._flush_deletes_locked()
+            self._conn().commit()
+            (count,) = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()
+        return {
+            "entries": count,
+            "memory": len(self._mem),
+            "embeddings": len(self._emb_slot),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        """Vuelca lo pendiente y cierra las conexiones de todos los hilos (idempotente)."""
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_deletes_locked()
+            self._conn().commit()
+            self._checkpoint_locked()
+            self._closed = True
+            with self._conns_lock:
+                for conn in self._all_conns:
+                    conn.close()
+                self._all_conns = []
+            # Suelta las referencias de los demás hilos a sus conexiones ya cerradas
+            self._tls = threading.local()
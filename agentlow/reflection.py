@@ -8,18 +8,38 @@ Importante (bugfix CI):
 
 Este módulo:
 - define el esquema ``PeanutReflection`` (Pydantic)
-- implementa ``reflect_on_result`` que consulta a Ollama y valida JSON
+- implementa ``reflect_on_result`` (y ``areflect_on_result``) que consulta a Ollama y valida JSON
 - incluye fallback heurístico cuando Ollama no está disponible
+- ``areflect_on_results`` audita N resultados en paralelo (acotado por ``OLLAMA_NUM_PARALLEL``)
+- cachea (LRU exacta) las auditorías de herramientas informativas
 """
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
+import os
+import re
+from contextlib import closing
 from dataclasses import dataclass
-from typing import Any, Dict, Literal, Optional
+from typing import Annotated, Any, Dict, Iterator, List, Literal, Optional, Tuple
 
-import requests
-from pydantic import BaseModel, Field, ValidationError
+import httpx
+import msgspec
+import orjson
+import urllib3
+from pydantic import BaseModel, Field
+
+from ._http import get_async_client, post_json, post_json_lines
+from ._json_scan import find_first_json_span
+from ._json_scan import warmup as _warmup_json_scan
+from .cache import ExactCache, make_key
+from .tools import TOOL_SEMANTICS
+
+# Respuestas de auditoría ya obtenidas de Ollama. Solo se cachean herramientas
+# informativas: auditar dos veces el mismo read_file da lo mismo, un shell no.
+_REFLECTION_CACHE = ExactCache(max_entries=2048)
 
 
 class PeanutReflection(BaseModel):
@@ -35,24 +55,167 @@ class PeanutReflection(BaseModel):
     )
 
 
-@dataclass(frozen=True)
+class _PR(msgspec.Struct):
+    """Espejo de ``PeanutReflection`` para decodificar+validar en una sola pasada (msgspec)."""
+
+    success: bool
+    analysis: Annotated[str, msgspec.Meta(min_length=1)]
+    peanuts_earned: Annotated[int, msgspec.Meta(ge=0, le=1)]
+    next_action: Literal["retry", "finalize"]
+    improved_input: Optional[str] = None
+
+
+# strict=False: coerciones laxas como las de Pydantic ("true" -> True, "1" -> 1)
+_DECODER = msgspec.json.Decoder(_PR, strict=False)
+
+
+@dataclass(frozen=True, slots=True)
 class OllamaClient:
     """Cliente mínimo para Ollama."""
 
     ollama_url: str = "http://localhost:11434"
     timeout_s: int = 60
 
-    def chat(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.0) -> Dict[str, Any]:
-        payload: Dict[str, Any] = {
+    @staticmethod
+    def _payload(model: str, messages: list[dict[str, Any]], temperature: float) -> Dict[str, Any]:
+        return {
             "model": model,
             "messages": messages,
             "stream": False,
             "options": {"temperature": float(temperature)},
         }
-        resp = requests.post(f"{self.ollama_url}/api/chat", json=payload, timeout=self.timeout_s)
+
+    def chat(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.0) -> Dict[str, Any]:
+        return post_json(
+            f"{self.ollama_url}/api/chat",
+            orjson.dumps(self._payload(model, messages, temperature)),
+            timeout=self.timeout_s,
+        )
+
+    async def achat(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.0) -> Dict[str, Any]:
+        client = get_async_client(self.ollama_url)
+        resp = await client.post("/api/chat", json=self._payload(model, messages, temperature), timeout=self.timeout_s)
         resp.raise_for_status()
         return resp.json()
 
+    # --- streaming con corte temprano (reflexión) ---
+    # La respuesta útil es un JSON corto; el modelo suele seguir generando texto
+    # después del "}". En streaming se corta la conexión en cuanto el objeto cierra.
+
+    @staticmethod
+    def _streamed_response(buf: bytearray) -> Dict[str, Any]:
+        return {"message": {"role": "assistant", "content": buf.decode("utf-8", "replace")}}
+
+    def chat_stream(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.0) -> Dict[str, Any]:
+        payload = {**self._payload(model, messages, temperature), "stream": True}
+        buf = bytearray()
+        lines = post_json_lines(f"{self.ollama_url}/api/chat", orjson.dumps(payload), timeout=self.timeout_s)
+        with closing(lines):
+            for line in lines:
+                if _feed_stream_line(buf, line):
+                    break
+        return self._streamed_response(buf)
+
+    async def achat_stream(self, model: str, messages: list[dict[str, Any]], temperature: float = 0.0) -> Dict[str, Any]:
+        client = get_async_client(self.ollama_url)
+        payload = {**self._payload(model, messages, temperature), "stream": True}
+        buf = bytearray()
+        async with client.stream("POST", "/api/chat", json=payload, timeout=self.timeout_s) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if _feed_stream_line(buf, line):
+                    break
+        return self._streamed_response(buf)
+
+
+@functools.lru_cache(maxsize=8)
+def _client(ollama_url: str, timeout_s: int) -> OllamaClient:
+    """Un ``OllamaClient`` (inmutable) por destino: no se reconstruye en cada auditoría."""
+    return OllamaClient(ollama_url=ollama_url, timeout_s=timeout_s)
+
+
+def _feed_stream_line(buf: bytearray, line: Any) -> bool:
+    """Acumula el delta de una línea NDJSON de Ollama; True si ya se puede cortar."""
+
+    if not line:
+        return False
+    chunk = orjson.loads(line)
+    if "error" in chunk:
+        raise ValueError(str(chunk["error"]))
+    delta = str((chunk.get("message") or {}).get("content") or "").encode("utf-8")
+    buf += delta
+    if chunk.get("done"):
+        return True
+    # Solo se re-escanea cuando llega una llave de cierre, y solo se corta con un
+    # objeto que ya valida como reflexión (un {...} suelto o a medias no basta)
+    return b"}" in delta and _decode_first_reflection(bytes(buf)) is not None
+
+
+def _strip_fences(s: bytes) -> bytes:
+    """Quita cercas típicas ```json ... ``` (primera y última línea)."""
+    s = s.strip()
+    if s.startswith(b"```"):
+        nl = s.find(b"\n")
+        s = s[nl + 1 :] if nl != -1 else b""
+        last = s.rfind(b"\n")
+        if s[last + 1 :].strip().startswith(b"```"):
+            s = s[: max(last, 0)]
+        s = s.strip()
+    return s
+
+
+def _extract_first_json_bytes(text: str) -> Optional[bytes]:
+    """Como ``_extract_first_json_object`` pero devuelve el slice en bytes (listo para orjson)."""
+
+    s = _strip_fences((text or "").encode("utf-8"))
+    if not s:
+        return None
+    if s.startswith(b"{") and s.endswith(b"}"):
+        return s
+
+    span = find_first_json_span(s)
+    if span is None:
+        return None
+    return s[span[0] : span[1]]
+
+
+def _iter_json_spans(s: bytes) -> Iterator[Tuple[int, int]]:
+    """``(inicio, fin)`` de cada objeto balanceado de ``s``, en orden."""
+    offset = 0
+    while True:
+        span = find_first_json_span(s[offset:])
+        if span is None:
+            return
+        yield offset + span[0], offset + span[1]
+        offset += span[1]
+
+
+def _decode_reflection(raw: bytes) -> Optional[_PR]:
+    try:
+        return _DECODER.decode(raw)
+    except msgspec.DecodeError:
+        pass
+    # Comillas tipográficas: la limpieza se aplica solo al slice extraído
+    cleaned = raw.decode("utf-8", "replace").replace("\u201c", '"').replace("\u201d", '"').replace("\u2019", "'")
+    try:
+        return _DECODER.decode(cleaned)
+    except msgspec.DecodeError:
+        return None
+
+
+def _decode_first_reflection(content: bytes) -> Optional[_PR]:
+    """Primer objeto {...} de ``content`` que valida como reflexión (``None`` si ninguno)."""
+    s = _strip_fences(content)
+    if s.startswith(b"{") and s.endswith(b"}"):
+        pr = _decode_reflection(s)
+        if pr is not None:
+            return pr
+    for start, end in _iter_json_spans(s):
+        pr = _decode_reflection(s[start:end])
+        if pr is not None:
+            return pr
+    return None
+
 
 def _extract_first_json_object(text: str) -> Optional[str]:
     """Extrae el primer objeto JSON del texto usando llaves balanceadas.
@@ -61,68 +224,84 @@ def _extract_first_json_object(text: str) -> Optional[str]:
     Evita regex recursivas (no soportadas por Python re).
     """
 
-    s = (text or "").strip()
-    if not s:
-        return None
+    raw = _extract_first_json_bytes(text)
+    return raw.decode("utf-8") if raw is not None else None
 
-    # Quita cercas típicas ```json ... ```
-    if s.startswith("```"):
-        # elimina primera línea ```xxx
-        parts = s.splitlines()
-        if parts:
-            parts = parts[1:]
-        # elimina última línea ```
-        if parts and parts[-1].strip().startswith("```"):
-            parts = parts[:-1]
-        s = "\n".join(parts).strip()
-
-    if s.startswith("{") and s.endswith("}"):
-        return s
 
-    in_str = False
-    escape = False
-    depth = 0
-    start = -1
-
-    for i, ch in enumerate(s):
-        if in_str:
-            if escape:
-                escape = False
-                continue
-            if ch == "\\":
-                escape = True
-                continue
-            if ch == '"':
-                in_str = False
-            continue
-
-        # fuera de string
-        if ch == '"':
-            in_str = True
-            continue
-        if ch == "{":
-            if depth == 0:
-                start = i
-            depth += 1
-            continue
-        if ch == "}" and depth > 0:
-            depth -= 1
-            if depth == 0 and start != -1:
-                return s[start : i + 1]
+_TRUNCATED = "…(truncado)"
 
-    return None
+# Sin \b a propósito: "IndexError" o "RuntimeException" también cuentan como error.
+_ERROR_RE = re.compile(r"error|exception|traceback", re.IGNORECASE)
+
+
+def _truncate_for_audit(obj: Any, budget: int) -> Any:
+    """Copia de ``obj`` recortada para que su JSON ocupe aprox. ``budget`` caracteres.
+
+    Recorre en profundidad con un presupuesto decreciente: los strings largos se
+    cortan y, agotado el presupuesto, el resto de cada colección se sustituye por
+    una marca. Así no se codifica entero un output que luego se va a descartar.
+    Los tipos no JSON se convierten con ``str`` (como el fallback de ``json.dumps``).
+    """
+
+    remaining = budget
+
+    def walk(o: Any) -> Any:
+        nonlocal remaining
+        if o is None or isinstance(o, (bool, int, float)):
+            remaining -= 8
+            return o
+        if isinstance(o, str):
+            if len(o) > remaining:
+                out = o[: max(remaining, 0)] + _TRUNCATED
+                remaining = 0
+                return out
+            remaining -= len(o) + 2
+            return o
+        if isinstance(o, dict):
+            out_d: Dict[str, Any] = {}
+            for k, v in o.items():
+                if remaining <= 0:
+                    out_d["…"] = _TRUNCATED
+                    break
+                key = k if isinstance(k, str) else str(k)
+                remaining -= len(key) + 4
+                out_d[key] = walk(v)
+            return out_d
+        if isinstance(o, (list, tuple)):
+            out_l: List[Any] = []
+            for v in o:
+                if remaining <= 0:
+                    out_l.append(_TRUNCATED)
+                    break
+                out_l.append(walk(v))
+                remaining -= 1
+            return out_l
+        return walk(str(o))
+
+    return walk(obj)
+
+
+def _audit_text(tool_output: Any, max_chars: int) -> str:
+    """Texto JSON del output para auditar, como mucho ``max_chars`` (+ marca)."""
+
+    text = json.dumps(_truncate_for_audit(tool_output, max_chars), ensure_ascii=False)
+    if len(text) > max_chars:
+        text = text[:max_chars] + _TRUNCATED
+    return text
 
 
 def _heuristic_reflection(tool_output: Any) -> PeanutReflection:
-    """Fallback robusto cuando el modelo no puede auditar."""
+    """Fallback robusto cuando el modelo no puede auditar.
+
+    Se busca sobre el output completo: las trazas y errores suelen ir al final,
+    justo lo que ``_audit_text`` recorta para el prompt.
+    """
 
     try:
         as_text = json.dumps(tool_output, ensure_ascii=False)
     except (TypeError, ValueError):
         as_text = str(tool_output)
-
-    lowered = as_text.lower()
-    looks_error = any(k in lowered for k in ["error", "exception", "traceback"])
+    looks_error = _ERROR_RE.search(as_text) is not None
 
     if isinstance(tool_output, dict):
         if tool_output.get("success") is False:
@@ -149,26 +328,10 @@ def _heuristic_reflection(tool_output: Any) -> PeanutReflection:
     )
 
 
-def reflect_on_result(
-    tool_name: str,
-    user_input: str,
-    tool_output: Any,
-    *,
-    model: str = "qwen2.5:7b",
-    ollama_url: str = "http://localhost:11434",
-    temperature: float = 0.0,
-    timeout_s: int = 60,
-    max_output_chars: int = 6000,
-) -> PeanutReflection:
-    """Audita un tool call y decide si reintentar."""
-
-    try:
-        tool_output_text = json.dumps(tool_output, ensure_ascii=False)
-    except (TypeError, ValueError):
-        tool_output_text = str(tool_output)
+def _build_messages(tool_name: str, user_input: str, tool_output: Any, max_output_chars: int) -> List[Dict[str, str]]:
+    """Construye el prompt de auditoría (system + user)."""
 
-    if len(tool_output_text) > max_output_chars:
-        tool_output_text = tool_output_text[:max_output_chars] + "…(truncado)"
+    tool_output_text = _audit_text(tool_output, max_output_chars)
 
     system_prompt = (
         "Eres un auditor de calidad extremadamente estricto.\n"
@@ -189,49 +352,193 @@ def reflect_on_result(
         "Evalúa si resolvió la tarea del usuario. Devuelve SOLO JSON."
     )
 
-    client = OllamaClient(ollama_url=ollama_url, timeout_s=timeout_s)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_msg},
+    ]
 
-    try:
-        resp = client.chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_msg},
-            ],
-            temperature=temperature,
-        )
 
-        content = (resp.get("message") or {}).get("content") or ""
-        raw_json = _extract_first_json_object(content)
-        if not raw_json:
-            return _heuristic_reflection(tool_output)
+def _reflection_from_response(resp: Dict[str, Any], tool_output: Any) -> PeanutReflection:
+    """Valida la respuesta del modelo y normaliza la reflexión."""
+
+    content = (resp.get("message") or {}).get("content") or ""
+    pr = _decode_first_reflection(content.encode("utf-8"))
+    if pr is None:
+        return _heuristic_reflection(tool_output)
+
+    # Ya validado por msgspec: se construye el modelo público sin revalidar
+    refl = PeanutReflection.model_construct(**msgspec.structs.asdict(pr))
+
+    # Normalizaciones defensivas
+    if refl.success:
+        refl.peanuts_earned = 1
+        refl.next_action = "finalize"
+        refl.improved_input = None
+    else:
+        refl.peanuts_earned = 0
+        refl.next_action = "retry"
+        if refl.improved_input is not None and not refl.improved_input.strip():
+            refl.improved_input = None
+
+    return refl
+
+
+def _reflection_cache_key(tool_name: str, model: str, temperature: float, messages: List[Dict[str, str]]) -> Optional[str]:
+    if TOOL_SEMANTICS.get(tool_name) != "informational":
+        return None
+    return make_key(model, temperature, messages)
+
 
+def reflect_on_result(
+    tool_name: str,
+    user_input: str,
+    tool_output: Any,
+    *,
+    model: str = "qwen2.5:7b",
+    ollama_url: str = "http://localhost:11434",
+    temperature: float = 0.0,
+    timeout_s: int = 60,
+    max_output_chars: int = 6000,
+) -> PeanutReflection:
+    """Audita un tool call y decide si reintentar."""
+
+    messages = _build_messages(tool_name, user_input, tool_output, max_output_chars)
+    key = _reflection_cache_key(tool_name, model, temperature, messages)
+    resp = _REFLECTION_CACHE.get(key) if key is not None else None
+
+    if resp is None:
+        client = _client(ollama_url, timeout_s)
         try:
-            data = json.loads(raw_json)
-        except json.JSONDecodeError:
-            cleaned = raw_json.strip().replace("\u201c", '"').replace("\u201d", '"').replace("\u2019", "'")
-            try:
-                data = json.loads(cleaned)
-            except json.JSONDecodeError:
-                return _heuristic_reflection(tool_output)
+            resp = client.chat_stream(model=model, messages=messages, temperature=temperature)
+        except (urllib3.exceptions.HTTPError, ValueError):
+            return _heuristic_reflection(tool_output)
+        if key is not None:
+            _REFLECTION_CACHE.put(key, resp)
+    return _reflection_from_response(resp, tool_output)
 
+
+async def areflect_on_result(
+    tool_name: str,
+    user_input: str,
+    tool_output: Any,
+    *,
+    model: str = "qwen2.5:7b",
+    ollama_url: str = "http://localhost:11434",
+    temperature: float = 0.0,
+    timeout_s: int = 60,
+    max_output_chars: int = 6000,
+) -> PeanutReflection:
+    """Variante asíncrona de ``reflect_on_result`` (varias pueden esperarse con ``asyncio.gather``)."""
+
+    messages = _build_messages(tool_name, user_input, tool_output, max_output_chars)
+    key = _reflection_cache_key(tool_name, model, temperature, messages)
+    resp = _REFLECTION_CACHE.get(key) if key is not None else None
+
+    if resp is None:
+        client = _client(ollama_url, timeout_s)
         try:
-            refl = PeanutReflection.model_validate(data)
-        except ValidationError:
+            resp = await client.achat_stream(model=model, messages=messages, temperature=temperature)
+        except (httpx.HTTPError, ValueError):
             return _heuristic_reflection(tool_output)
+        if key is not None:
+            _REFLECTION_CACHE.put(key, resp)
+    return _reflection_from_response(resp, tool_output)
 
-        # Normalizaciones defensivas
-        if refl.success:
-            refl.peanuts_earned = 1
-            refl.next_action = "finalize"
-            refl.improved_input = None
-        else:
-            refl.peanuts_earned = 0
-            refl.next_action = "retry"
-            if refl.improved_input is not None and not refl.improved_input.strip():
-                refl.improved_input = None
 
-        return refl
+# (tool_name, user_input, tool_output)
+ReflectionItem = Tuple[str, str, Any]
 
-    except (requests.RequestException, ValueError):
-        return _heuristic_reflection(tool_output)
+
+def _ollama_num_parallel() -> int:
+    """Slots paralelos de Ollama (``OLLAMA_NUM_PARALLEL``, 1 por defecto)."""
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+    except ValueError:
+        return 1
+
+
+async def areflect_on_results(
+    items: List[ReflectionItem],
+    *,
+    model: str = "qwen2.5:7b",
+    ollama_url: str = "http://localhost:11434",
+    temperature: float = 0.0,
+    timeout_s: int = 60,
+    max_output_chars: int = 6000,
+    concurrency: Optional[int] = None,
+) -> List[PeanutReflection]:
+    """Audita varios tool calls a la vez; devuelve las reflexiones en el mismo orden.
+
+    La concurrencia se limita a ``concurrency`` (por defecto ``OLLAMA_NUM_PARALLEL``):
+    más peticiones que slots solo harían cola dentro de Ollama.
+    """
+
+    sem = asyncio.Semaphore(concurrency or _ollama_num_parallel())
+
+    async def _one(item: ReflectionItem) -> PeanutReflection:
+        tool_name, user_input, tool_output = item
+        async with sem:
+            return await areflect_on_result(
+                tool_name,
+                user_input,
+                tool_output,
+                model=model,
+                ollama_url=ollama_url,
+                temperature=temperature,
+                timeout_s=timeout_s,
+                max_output_chars=max_output_chars,
+            )
+
+    return list(await asyncio.gather(*(_one(item) for item in items)))
+
+
+def reflect_on_results(
+    items: List[ReflectionItem],
+    *,
+    model: str = "qwen2.5:7b",
+    ollama_url: str = "http://localhost:11434",
+    temperature: float = 0.0,
+    timeout_s: int = 60,
+    max_output_chars: int = 6000,
+) -> List[PeanutReflection]:
+    """Variante síncrona de ``areflect_on_results``.
+
+    Sin event loop en curso lanza el lote concurrente con ``asyncio.run``; si ya
+    hay uno (p.ej. dentro de FastAPI) no puede bloquearlo y audita en secuencia.
+    """
+
+    kwargs: Dict[str, Any] = dict(
+        model=model,
+        ollama_url=ollama_url,
+        temperature=temperature,
+        timeout_s=timeout_s,
+        max_output_chars=max_output_chars,
+    )
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(areflect_on_results(items, **kwargs))
+    return [reflect_on_result(name, user_input, output, **kwargs) for name, user_input, output in items]
+
+
+_WARMUP_SAMPLE = b'{"success":true,"analysis":"x","peanuts_earned":1,"next_action":"finalize"}'
+
+
+_WARMED = False
+
+
+def _warmup() -> None:
+    """Primer uso de decoder, localizador y modelo Pydantic (una vez por proceso).
+
+    No se hace al importar (con numba supone compilar el localizador): la CLI la
+    lanza en segundo plano mientras el usuario escribe, fuera de la primera
+    auditoría. ``AGENTLOW_SKIP_WARMUP=1`` la omite.
+    """
+    global _WARMED
+    if _WARMED or os.environ.get("AGENTLOW_SKIP_WARMUP"):
+        return
+    _WARMED = True
+    _DECODER.decode(_WARMUP_SAMPLE)
+    _extract_first_json_object("ok " + _WARMUP_SAMPLE.decode())
+    PeanutReflection(success=True, analysis="x", peanuts_earned=1, next_action="finalize")
+    _warmup_json_scan()
@@ -11,124 +11,306 @@ Este módulo está diseñado para ejecutarse localmente.
 
 from __future__ import annotations
 
+import atexit
 import json
 import os
+import re
+import shlex
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+
+
+# Máximo de comandos por llamada a batch_shell y de comandos simultáneos
+MAX_BATCH_COMMANDS = 16
+BATCH_SHELL_WORKERS = 8
+
+# Tope de lectura de read_file (protege el contexto del agente de logs enormes)
+MAX_READ_BYTES = 2 * 1024 * 1024
+# Tope del cuerpo de respuesta de http_request (se lee en streaming)
+MAX_RESPONSE_BYTES = 2 * 1024 * 1024
+# Cabeceras que http_request devuelve por defecto (todas con ``return_headers``)
+_RESPONSE_HEADERS = ("content-type", "content-length", "etag", "location")
+
+# ALLOWLIST DE COMANDOS SHELL (seguridad)
+_ALLOWED_COMMANDS = frozenset(
+    {
+        # Lectura
+        "ls",
+        "cat",
+        "head",
+        "tail",
+        "grep",
+        "find",
+        "pwd",
+        "whoami",
+        "df",
+        "du",
+        "wc",
+        "file",
+        "stat",
+        "tree",
+        "less",
+        "more",
+        # Navegación
+        "cd",
+        # Python/Node
+        "python3",
+        "python",
+        "pip",
+        "node",
+        "npm",
+        "npx",
+        # Git (se valida aparte)
+        "git",
+        # Docker (se valida aparte)
+        "docker",
+        "docker-compose",
+        # Otros seguros
+        "curl",
+        "wget",
+        "ping",
+        "which",
+        "echo",
+        "env",
+        "printenv",
+    }
+)
+_ALLOWED_COMMANDS_STR = ", ".join(sorted(_ALLOWED_COMMANDS))
+
+# COMANDOS PROHIBIDOS (nunca permitir)
+# Nota: incluimos tokens típicos de redirección/escalado.
+_FORBIDDEN_TOKENS = frozenset(
+    {
+        "rm",
+        "rmdir",
+        "dd",
+        "mkfs",
+        "fdisk",
+        "format",
+        "kill",
+        "killall",
+        "shutdown",
+        "reboot",
+        "halt",
+        ">",
+        ">>",
+        "sudo",
+        "su",
+        "chmod",
+        "chown",
+    }
+)
+
+# Acciones permitidas de las herramientas git/docker (y su texto de ayuda)
+_GIT_ALLOWED = frozenset({"status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout"})
+_GIT_ALLOWED_STR = ", ".join(sorted(_GIT_ALLOWED))
+_DOCKER_ALLOWED = frozenset({"ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs"})
+_DOCKER_ALLOWED_STR = ", ".join(sorted(_DOCKER_ALLOWED))
+
+# Opciones de intérprete que ejecutan código pasado como argumento (``python -c``,
+# ``node -e``): el código va en un solo token y la comparación por token no lo ve.
+# Cortas (pueden ir agrupadas: ``-Bc``) y largas (``--eval=...``).
+_INLINE_CODE_SHORT = {"python": "c", "python3": "c", "node": "ep"}
+_INLINE_CODE_LONG = {"node": frozenset({"--eval", "--print"})}
+# Opciones tras las que el resto de argumentos son del módulo/script, no del intérprete
+_INLINE_CODE_STOP = {"python": "m", "python3": "m", "node": ""}
+
+
+def _inline_code_flag(tokens: List[str]) -> Optional[str]:
+    """Opción de código en línea de ``tokens`` (``-c``, ``--eval``...) o ``None``.
+
+    Se atraviesa ``env [VAR=valor] [-opciones]`` para llegar al comando real.
+    """
+    i = 0
+    if tokens and tokens[0] == "env":
+        i = 1
+        while i < len(tokens) and ("=" in tokens[i] or tokens[i].startswith("-")):
+            i += 1
+    if i >= len(tokens) or tokens[i] not in _INLINE_CODE_SHORT:
+        return None
+    interp = tokens[i]
+    short, stop = _INLINE_CODE_SHORT[interp], _INLINE_CODE_STOP[interp]
+    for tok in tokens[i + 1 :]:
+        if not tok.startswith("-") or tok == "-":
+            return None  # script: lo que sigue son sus argumentos
+        if tok.startswith("--"):
+            if tok.split("=", 1)[0] in _INLINE_CODE_LONG.get(interp, ()):
+                return tok
+            continue
+        if any(c in short for c in tok[1:]):
+            return tok
+        if any(c in stop for c in tok[1:]):
+            return None
+    return None
+
+
+# Caracteres que separan tokens aunque vayan pegados (``ls;rm``, ``a>b``, `` `rm` ``)
+_SHELL_PUNCTUATION = "();<>|&`"
+# Un solo escaneo en C: si no aparece ningún metacarácter no hace falta revisar los tokens
+_SHELL_META_RE = re.compile(f"[{re.escape(_SHELL_PUNCTUATION)}]")
+
+
+def _shell_tokens(cmd: str) -> List[str]:
+    """Tokeniza como el shell (comillas incluidas); operadores como tokens propios.
+
+    Lanza ``ValueError`` si las comillas no están balanceadas.
+    """
+    lexer = shlex.shlex(cmd, posix=True, punctuation_chars=_SHELL_PUNCTUATION)
+    lexer.whitespace_split = True
+    return list(lexer)
+
+
+# --- Camino rápido en proceso para comandos triviales (sin fork+exec) ---
+# Cada handler devuelve ``(stdout, stderr, returncode)`` o ``None`` si la invocación
+# no es simple (opciones, stdin...) y hay que lanzar el proceso real.
+_FastResult = Optional[Tuple[str, str, int]]
+
+
+def _fast_pwd(argv: List[str], cwd: str) -> _FastResult:
+    return (cwd + "\n", "", 0) if len(argv) == 1 else None
+
+
+def _fast_echo(argv: List[str], cwd: str) -> _FastResult:
+    if len(argv) > 1 and argv[1].startswith("-"):
+        return None
+    return (" ".join(argv[1:]) + "\n", "", 0)
+
+
+def _fast_cat(argv: List[str], cwd: str) -> _FastResult:
+    files = argv[1:]
+    if not files or any(f.startswith("-") for f in files):
+        return None
+    out: List[str] = []
+    err: List[str] = []
+    for name in files:
+        try:
+            with open(os.path.join(cwd, name), "rb") as f:
+                out.append(f.read().decode("utf-8", errors="replace"))
+        except FileNotFoundError:
+            err.append(f"cat: {name}: No such file or directory\n")
+        except IsADirectoryError:
+            err.append(f"cat: {name}: Is a directory\n")
+        except OSError as e:
+            err.append(f"cat: {name}: {e.strerror}\n")
+    return ("".join(out), "".join(err), 1 if err else 0)
+
+
+_SHELL_FASTPATH: Dict[str, Callable[[List[str], str], _FastResult]] = {
+    "pwd": _fast_pwd,
+    "echo": _fast_echo,
+    "cat": _fast_cat,
+}
+
+
+def _resolve_under(work_dir_str: str, rel_path: str) -> Optional[str]:
+    """Ruta resuelta de ``rel_path`` dentro de ``work_dir_str`` o ``None`` si escapa.
+
+    ``work_dir_str`` llega ya resuelto (se calcula una vez por executor); el destino
+    se resuelve en cada llamada a propósito: un resultado memoizado dejaría pasar un
+    symlink cambiado después de la primera comprobación.
+    """
+    full_str = os.path.realpath(os.path.join(work_dir_str, rel_path))
+    if full_str != work_dir_str and not full_str.startswith(os.path.join(work_dir_str, "")):
+        return None
+    return full_str
 
 
 class ToolExecutor:
     """Ejecuta herramientas con validación de seguridad."""
 
     def __init__(self, work_dir: Optional[str] = None) -> None:
-        self.work_dir = Path(work_dir or os.getcwd())
-
-        # ALLOWLIST DE COMANDOS SHELL (seguridad)
-        self.allowed_commands = {
-            # Lectura
-            "ls",
-            "cat",
-            "head",
-            "tail",
-            "grep",
-            "find",
-            "pwd",
-            "whoami",
-            "df",
-            "du",
-            "wc",
-            "file",
-            "stat",
-            "tree",
-            "less",
-            "more",
-            # Navegación
-            "cd",
-            # Python/Node
-            "python3",
-            "python",
-            "pip",
-            "node",
-            "npm",
-            "npx",
-            # Git (se valida aparte)
-            "git",
-            # Docker (se valida aparte)
-            "docker",
-            "docker-compose",
-            # Otros seguros
-            "curl",
-            "wget",
-            "ping",
-            "which",
-            "echo",
-            "env",
-            "printenv",
-        }
-
-        # COMANDOS PROHIBIDOS (nunca permitir)
-        # Nota: incluimos tokens típicos de redirección/escalado.
-        self.forbidden_tokens = {
-            "rm",
-            "rmdir",
-            "dd",
-            "mkfs",
-            "fdisk",
-            "format",
-            "kill",
-            "killall",
-            "shutdown",
-            "reboot",
-            "halt",
-            ">",
-            ">>",
-            "sudo",
-            "su",
-            "chmod",
-            "chown",
+        # Resuelto una sola vez (symlinks incluidos): base de todas las comprobaciones de ruta
+        self.work_dir = Path(work_dir or os.getcwd()).resolve()
+        self._work_dir_str = str(self.work_dir)
+
+        # Alias de las constantes de módulo (inmutables: se comparten entre instancias)
+        self.allowed_commands = _ALLOWED_COMMANDS
+        self.forbidden_tokens = _FORBIDDEN_TOKENS
+        self._allowed_commands_str = _ALLOWED_COMMANDS_STR
+
+        # Sesión HTTP reutilizable: keep-alive entre llamadas a http_request al mismo host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Pool para batch_shell (comandos independientes en paralelo); se crea en el primer uso
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        # Tabla de despacho nombre -> handler
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "shell": self._shell,
+            "batch_shell": self._batch_shell,
+            "read_file": self._read_file,
+            "write_file": self._write_file,
+            "list_directory": self._list_directory,
+            "http_request": self._http_request,
+            "git": self._git,
+            "docker": self._docker,
         }
 
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Ejecuta una herramienta y devuelve el resultado."""
-        if tool_name == "shell":
-            return self._shell(arguments)
-        if tool_name == "read_file":
-            return self._read_file(arguments)
-        if tool_name == "write_file":
-            return self._write_file(arguments)
-        if tool_name == "list_directory":
-            return self._list_directory(arguments)
-        if tool_name == "http_request":
-            return self._http_request(arguments)
-        if tool_name == "git":
-            return self._git(arguments)
-        if tool_name == "docker":
-            return self._docker(arguments)
-        return {"error": f"Herramienta desconocida: {tool_name}"}
-
-    def _shell(self, args: Dict[str, Any]) -> Dict[str, Any]:
-        """Ejecuta comandos shell con allowlist."""
-        cmd = str(args.get("cmd", "")).strip()
+        handler = self._dispatch.get(tool_name)
+        if handler is None:
+            return {"error": f"Herramienta desconocida: {tool_name}"}
+        return handler(arguments)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Pool de hilos reutilizado entre llamadas (sin crear hilos por comando)."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=BATCH_SHELL_WORKERS, thread_name_prefix="batch_shell")
+            atexit.register(self._pool.shutdown, wait=False)
+        return self._pool
+
+    def _parse_cmd(self, cmd: str) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """Tokeniza y valida (allowlist, tokens prohibidos); devuelve ``(argv, error)``."""
         if not cmd:
-            return {"error": "Comando vacío"}
+            return [], {"error": "Comando vacío"}
 
-        lowered = cmd.lower()
-        if any(tok in lowered for tok in self.forbidden_tokens):
-            return {"error": f"Comando prohibido detectado en: {cmd}"}
-
-        # Extraer el comando base (antes de pipes)
-        base_cmd = cmd.split()[0].split("|")[0].strip()
+        try:
+            tokens = _shell_tokens(cmd)
+        except ValueError as e:
+            return [], {"error": f"Comando inválido ({e}): {cmd}"}
+        if not tokens:
+            return [], {"error": "Comando vacío"}
+
+        # Comparación por token (no por subcadena: "format" o "inform" no son "rm").
+        # Primero la coincidencia exacta (``isdisjoint``, en C); solo se normalizan los
+        # tokens que pueden esconder uno prohibido: con mayúsculas o con ruta ("/bin/rm").
+        forbidden = self.forbidden_tokens
+        if not forbidden.isdisjoint(tokens) or any(
+            os.path.basename(tok.lower()) in forbidden for tok in tokens if "/" in tok or not tok.islower()
+        ):
+            return [], {"error": f"Comando prohibido detectado en: {cmd}"}
+
+        base_cmd = tokens[0]
         if base_cmd not in self.allowed_commands:
-            allowed = ", ".join(sorted(self.allowed_commands))
-            return {"error": f"Comando no permitido: {base_cmd}. Usa solo: {allowed}"}
-
+            return [], {"error": f"Comando no permitido: {base_cmd}. Usa solo: {self._allowed_commands_str}"}
+        if _inline_code_flag(tokens) is not None:
+            return [], {"error": f"Código en línea (python -c / node -e) prohibido en: {cmd}"}
+
+        # Se ejecuta sin shell: pipes, ``;``, ``&&`` o ``$(...)`` no tendrían efecto.
+        # Entre comillas sí se admiten (``echo "a > b"``): por eso se confirma por token.
+        if _SHELL_META_RE.search(cmd) and any(tok.strip(_SHELL_PUNCTUATION) == "" for tok in tokens):
+            return [], {"error": f"Operadores de shell no soportados (un solo comando por llamada): {cmd}"}
+        return tokens, None
+
+    def _run_shell(self, argv: List[str]) -> Dict[str, Any]:
+        fast = _SHELL_FASTPATH.get(argv[0])
+        done = fast(argv, self._work_dir_str) if fast is not None else None
+        if done is not None:
+            stdout, stderr, returncode = done
+            return {"stdout": stdout, "stderr": stderr, "returncode": returncode, "success": returncode == 0}
         try:
             result = subprocess.run(
-                cmd,
-                shell=True,
+                argv,
                 cwd=self.work_dir,
                 capture_output=True,
                 text=True,
@@ -145,16 +327,41 @@ class ToolExecutor:
         except OSError as e:
             return {"error": f"Error del sistema ejecutando comando: {e}"}
 
+    def _shell(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Ejecuta comandos shell con allowlist."""
+        cmd = str(args.get("cmd", "")).strip()
+        argv, error = self._parse_cmd(cmd)
+        if error is not None:
+            return error
+        return self._run_shell(argv)
+
+    def _batch_shell(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Ejecuta varios comandos independientes en paralelo (mismas reglas que ``shell``)."""
+        cmds = args.get("cmds")
+        if not isinstance(cmds, list) or not cmds:
+            return {"error": "batch_shell requiere 'cmds' (lista no vacía de comandos)"}
+        if len(cmds) > MAX_BATCH_COMMANDS:
+            return {"error": f"Demasiados comandos ({len(cmds)}); máximo {MAX_BATCH_COMMANDS}"}
+
+        cmd_list = [str(c).strip() for c in cmds]
+        parsed = [self._parse_cmd(cmd) for cmd in cmd_list]
+        results: List[Optional[Dict[str, Any]]] = [error for _, error in parsed]
+        pool = self._get_pool()
+        futures = {
+            pool.submit(self._run_shell, argv): i for i, (argv, error) in enumerate(parsed) if error is None
+        }
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+
+        out = [{"cmd": cmd, **(res or {})} for cmd, res in zip(cmd_list, results)]
+        return {"results": out, "success": all(r.get("success") for r in out)}
+
     def _safe_resolve_under_workdir(self, rel_path: str) -> Optional[Path]:
         """Resuelve una ruta relativa y bloquea traversal fuera del work_dir."""
         if not rel_path:
             return None
-        full_path = (self.work_dir / rel_path)
-        try:
-            full_path.resolve().relative_to(self.work_dir.resolve())
-        except ValueError:
-            return None
-        return full_path
+        full_str = _resolve_under(self._work_dir_str, rel_path)
+        return Path(full_str) if full_str is not None else None
 
     def _read_file(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Lee el contenido de un archivo de texto."""
@@ -168,8 +375,14 @@ class ToolExecutor:
             return {"error": f"No es un archivo: {filepath}"}
 
         try:
-            content = full_path.read_text(encoding="utf-8")
-            return {"content": content, "size": len(content), "lines": len(content.splitlines())}
+            with full_path.open("rb") as f:
+                raw = f.read(MAX_READ_BYTES + 1)
+            if len(raw) > MAX_READ_BYTES:
+                return {"error": f"Archivo demasiado grande (máximo {MAX_READ_BYTES} bytes): {filepath}"}
+            # Líneas contadas sobre los bytes: sin la lista temporal de ``splitlines()``
+            lines = raw.count(b"\n") + (1 if raw and not raw.endswith(b"\n") else 0)
+            content = raw.decode("utf-8")
+            return {"content": content, "size": len(content), "lines": lines}
         except UnicodeDecodeError:
             return {"error": "Archivo no es texto UTF-8 (¿es binario?)"}
         except OSError as e:
@@ -184,10 +397,18 @@ class ToolExecutor:
         if full_path is None:
             return {"error": f"Path fuera del directorio de trabajo: {filepath}"}
 
+        # Se codifica una sola vez: los bytes sirven para escribir y para el tamaño
+        data = content.encode("utf-8")
         try:
             full_path.parent.mkdir(parents=True, exist_ok=True)
-            full_path.write_text(content, encoding="utf-8")
-            return {"success": True, "path": filepath, "bytes_written": len(content.encode("utf-8"))}
+            fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            return {"success": True, "path": filepath, "bytes_written": len(data)}
         except OSError as e:
             return {"error": f"Error escribiendo archivo: {e}"}
 
@@ -203,13 +424,17 @@ class ToolExecutor:
             return {"error": f"No es un directorio: {dirpath}"}
 
         try:
+            # scandir trae el tipo con la lectura del directorio; ``DirEntry.stat`` se cachea
+            with os.scandir(full_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
             items: List[Dict[str, Any]] = []
-            for item in sorted(full_path.iterdir()):
+            for entry in entries:
+                is_dir = entry.is_dir()
                 items.append(
                     {
-                        "name": item.name,
-                        "type": "dir" if item.is_dir() else "file",
-                        "size": item.stat().st_size if item.is_file() else None,
+                        "name": entry.name,
+                        "type": "dir" if is_dir else "file",
+                        "size": entry.stat().st_size if not is_dir and entry.is_file() else None,
                     }
                 )
             return {"path": dirpath, "items": items, "count": len(items)}
@@ -229,21 +454,33 @@ class ToolExecutor:
             return {"error": f"Método no soportado: {method}"}
 
         try:
-            resp = requests.request(
+            resp = self.session.request(
                 method=method,
                 url=url,
                 headers=headers,
                 json=body if isinstance(body, dict) else None,
                 data=body if isinstance(body, str) else None,
                 timeout=30,
+                stream=True,
             )
+            with resp:
+                raw = bytearray()
+                for chunk in resp.iter_content(65536):
+                    raw += chunk
+                    if len(raw) > MAX_RESPONSE_BYTES:
+                        return {"error": f"Respuesta demasiado grande (máximo {MAX_RESPONSE_BYTES} bytes)"}
+            # JSON directo sobre los bytes (sin la detección de charset de ``resp.json()``)
             try:
-                resp_body: Any = resp.json()
-            except ValueError:
-                resp_body = resp.text
+                resp_body: Any = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                resp_body = raw.decode("utf-8", errors="replace")
+            if args.get("return_headers"):
+                headers_out = dict(resp.headers)
+            else:
+                headers_out = {h: resp.headers[h] for h in _RESPONSE_HEADERS if h in resp.headers}
             return {
                 "status_code": resp.status_code,
-                "headers": dict(resp.headers),
+                "headers": headers_out,
                 "body": resp_body,
                 "success": 200 <= resp.status_code < 300,
             }
@@ -258,38 +495,38 @@ class ToolExecutor:
         message = str(args.get("message", ""))
         branch = str(args.get("branch", ""))
 
-        allowed_actions = {"status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout"}
-        if action not in allowed_actions:
-            return {"error": f"Acción git no permitida: {action}. Usa: {', '.join(sorted(allowed_actions))}"}
+        if action not in _GIT_ALLOWED:
+            return {"error": f"Acción git no permitida: {action}. Usa: {_GIT_ALLOWED_STR}"}
 
+        # argv directo (sin shell): ``message`` o ``branch`` no se interpretan
         if action == "status":
-            cmd = "git status"
+            argv = ["git", "status"]
         elif action == "log":
-            cmd = "git log --oneline -10"
+            argv = ["git", "log", "--oneline", "-10"]
         elif action == "diff":
-            cmd = "git diff"
+            argv = ["git", "diff"]
         elif action == "branch":
-            cmd = "git branch"
+            argv = ["git", "branch"]
         elif action == "add":
-            files = str(args.get("files", "."))
-            cmd = f"git add {files}"
+            try:
+                files = shlex.split(str(args.get("files", ".")))
+            except ValueError as e:
+                return {"error": f"'files' inválido: {e}"}
+            argv = ["git", "add", "--", *(files or ["."])]
         elif action == "commit":
             if not message:
                 return {"error": "commit requiere 'message'"}
-            cmd = f'git commit -m "{message}"'
-        elif action == "push":
-            cmd = f"git push{(' ' + branch) if branch else ''}"
-        elif action == "pull":
-            cmd = f"git pull{(' ' + branch) if branch else ''}"
+            argv = ["git", "commit", "-m", message]
+        elif action in ("push", "pull"):
+            argv = ["git", action, *([branch] if branch else [])]
         else:  # checkout
             if not branch:
                 return {"error": "checkout requiere 'branch'"}
-            cmd = f"git checkout {branch}"
+            argv = ["git", "checkout", branch]
 
         try:
             result = subprocess.run(
-                cmd,
-                shell=True,
+                argv,
                 cwd=self.work_dir,
                 capture_output=True,
                 text=True,
@@ -306,30 +543,28 @@ class ToolExecutor:
         action = str(args.get("action", ""))
         service = str(args.get("service", ""))
 
-        allowed_actions = {"ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs"}
-        if action not in allowed_actions:
-            return {"error": f"Acción docker no permitida: {action}. Usa: {', '.join(sorted(allowed_actions))}"}
+        if action not in _DOCKER_ALLOWED:
+            return {"error": f"Acción docker no permitida: {action}. Usa: {_DOCKER_ALLOWED_STR}"}
 
         if action == "ps":
-            cmd = "docker ps"
+            argv = ["docker", "ps"]
         elif action == "logs":
             if not service:
                 return {"error": "logs requiere 'service'"}
-            cmd = f"docker logs {service} --tail 100"
+            argv = ["docker", "logs", service, "--tail", "100"]
         elif action == "compose_up":
             detach = bool(args.get("detach", True))
-            cmd = f"docker-compose up{(' -d' if detach else '')}"
+            argv = ["docker-compose", "up", *(["-d"] if detach else [])]
         elif action == "compose_down":
-            cmd = "docker-compose down"
+            argv = ["docker-compose", "down"]
         elif action == "compose_ps":
-            cmd = "docker-compose ps"
+            argv = ["docker-compose", "ps"]
         else:  # compose_logs
-            cmd = f"docker-compose logs{(' ' + service) if service else ''} --tail 100"
+            argv = ["docker-compose", "logs", *([service] if service else []), "--tail", "100"]
 
         try:
             result = subprocess.run(
-                cmd,
-                shell=True,
+                argv,
                 cwd=self.work_dir,
                 capture_output=True,
                 text=True,
@@ -342,121 +577,139 @@ class ToolExecutor:
             return {"error": f"Error docker: {e}"}
 
 
-# Definición de herramientas para Ollama (JSON Schema)
-TOOLS_SCHEMA: List[Dict[str, Any]] = [
-    {
-        "type": "function",
-        "function": {
-            "name": "shell",
-            "description": "Ejecuta comandos shell seguros (ls, cat, grep, find, python, npm, etc). NO permite rm, sudo, ni comandos destructivos.",
-            "parameters": {
-                "type": "object",
-                "required": ["cmd"],
-                "properties": {
-                    "cmd": {"type": "string", "description": "El comando a ejecutar (ej: 'ls -la', 'cat file.txt')"}
-                },
-            },
-        },
-    },
-    {
+# Semántica de cada herramienta (admisión en caché, ver agentlow.cache):
+# "informational" solo lee estado; "command" lo modifica o tiene efectos externos.
+TOOL_SEMANTICS: Dict[str, str] = {
+    "shell": "command",
+    "batch_shell": "command",
+    "read_file": "informational",
+    "write_file": "command",
+    "list_directory": "informational",
+    "http_request": "command",
+    "git": "command",
+    "docker": "command",
+}
+
+
+def _tool(name: str, description: str, required: Tuple[str, ...], properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada de ``TOOLS_SCHEMA``: solo varían nombre, descripción y parámetros."""
+    return {
         "type": "function",
         "function": {
-            "name": "read_file",
-            "description": "Lee el contenido de un archivo de texto.",
-            "parameters": {
-                "type": "object",
-                "required": ["path"],
-                "properties": {"path": {"type": "string", "description": "Ruta relativa del archivo a leer"}},
-            },
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "required": list(required), "properties": properties},
         },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "write_file",
-            "description": "Escribe contenido en un archivo (crea o sobreescribe).",
-            "parameters": {
-                "type": "object",
-                "required": ["path", "content"],
-                "properties": {
-                    "path": {"type": "string", "description": "Ruta relativa del archivo a escribir"},
-                    "content": {"type": "string", "description": "Contenido a escribir en el archivo"},
-                },
+    }
+
+
+def _param(type_: Optional[str], description: str, **extra: Any) -> Dict[str, Any]:
+    """Parámetro JSON Schema; ``type_=None`` acepta cualquier tipo."""
+    spec: Dict[str, Any] = {} if type_ is None else {"type": type_}
+    spec.update(extra)
+    spec["description"] = description
+    return spec
+
+
+def _build_tools_schema() -> List[Dict[str, Any]]:
+    """Definición de herramientas para Ollama (JSON Schema)."""
+    return [
+        _tool(
+            "shell",
+            "Ejecuta comandos shell seguros (ls, cat, grep, find, python, npm, etc). NO permite rm, sudo, ni comandos destructivos. Un solo comando por llamada (sin pipes, ; ni &&).",
+            ("cmd",),
+            {"cmd": _param("string", "El comando a ejecutar (ej: 'ls -la', 'cat file.txt')")},
+        ),
+        _tool(
+            "batch_shell",
+            "Ejecuta en paralelo varios comandos shell independientes (mismas reglas que shell). Devuelve un resultado por comando, en el mismo orden.",
+            ("cmds",),
+            {
+                "cmds": _param(
+                    "array", "Lista de comandos (ej: ['ls -la', 'cat README.md'])", items={"type": "string"}
+                )
             },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "list_directory",
-            "description": "Lista archivos y directorios en una ruta.",
-            "parameters": {
-                "type": "object",
-                "required": ["path"],
-                "properties": {"path": {"type": "string", "description": "Ruta del directorio a listar (usa '.' para el actual)"}},
+        ),
+        _tool(
+            "read_file",
+            "Lee el contenido de un archivo de texto.",
+            ("path",),
+            {"path": _param("string", "Ruta relativa del archivo a leer")},
+        ),
+        _tool(
+            "write_file",
+            "Escribe contenido en un archivo (crea o sobreescribe).",
+            ("path", "content"),
+            {
+                "path": _param("string", "Ruta relativa del archivo a escribir"),
+                "content": _param("string", "Contenido a escribir en el archivo"),
             },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "http_request",
-            "description": "Realiza peticiones HTTP (GET, POST, etc).",
-            "parameters": {
-                "type": "object",
-                "required": ["method", "url"],
-                "properties": {
-                    "method": {
-                        "type": "string",
-                        "enum": ["GET", "POST", "PUT", "DELETE", "PATCH"],
-                        "description": "Método HTTP",
-                    },
-                    "url": {"type": "string", "description": "URL completa (https://...)"},
-                    "headers": {"type": "object", "description": "Headers HTTP opcionales"},
-                    "body": {"description": "Body de la petición (objeto JSON o string)"},
-                },
+        ),
+        _tool(
+            "list_directory",
+            "Lista archivos y directorios en una ruta.",
+            ("path",),
+            {"path": _param("string", "Ruta del directorio a listar (usa '.' para el actual)")},
+        ),
+        _tool(
+            "http_request",
+            "Realiza peticiones HTTP (GET, POST, etc).",
+            ("method", "url"),
+            {
+                "method": _param("string", "Método HTTP", enum=["GET", "POST", "PUT", "DELETE", "PATCH"]),
+                "url": _param("string", "URL completa (https://...)"),
+                "headers": _param("object", "Headers HTTP opcionales"),
+                "body": _param(None, "Body de la petición (objeto JSON o string)"),
+                "return_headers": _param(
+                    "boolean",
+                    "Devolver todas las cabeceras de la respuesta (por defecto solo content-type, content-length, etag y location)",
+                ),
             },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "git",
-            "description": "Ejecuta operaciones git (status, log, diff, add, commit, push, pull, checkout, branch).",
-            "parameters": {
-                "type": "object",
-                "required": ["action"],
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout"],
-                        "description": "Operación git a realizar",
-                    },
-                    "message": {"type": "string", "description": "Mensaje de commit (requerido para action='commit')"},
-                    "branch": {"type": "string", "description": "Nombre de rama (para push, pull, checkout)"},
-                    "files": {"type": "string", "description": "Archivos a agregar (para action='add', default='.')"},
-                },
+        ),
+        _tool(
+            "git",
+            "Ejecuta operaciones git (status, log, diff, add, commit, push, pull, checkout, branch).",
+            ("action",),
+            {
+                "action": _param(
+                    "string",
+                    "Operación git a realizar",
+                    enum=["status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout"],
+                ),
+                "message": _param("string", "Mensaje de commit (requerido para action='commit')"),
+                "branch": _param("string", "Nombre de rama (para push, pull, checkout)"),
+                "files": _param("string", "Archivos a agregar (para action='add', default='.')"),
             },
-        },
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "docker",
-            "description": "Ejecuta operaciones docker y docker-compose (ps, logs, compose_up, compose_down, etc).",
-            "parameters": {
-                "type": "object",
-                "required": ["action"],
-                "properties": {
-                    "action": {
-                        "type": "string",
-                        "enum": ["ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs"],
-                        "description": "Operación docker a realizar",
-                    },
-                    "service": {"type": "string", "description": "Nombre del servicio/contenedor (para logs)"},
-                    "detach": {"type": "boolean", "description": "Ejecutar en background (para compose_up, default=true)"},
-                },
+        ),
+        _tool(
+            "docker",
+            "Ejecuta operaciones docker y docker-compose (ps, logs, compose_up, compose_down, etc).",
+            ("action",),
+            {
+                "action": _param(
+                    "string",
+                    "Operación docker a realizar",
+                    enum=["ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs"],
+                ),
+                "service": _param("string", "Nombre del servicio/contenedor (para logs)"),
+                "detach": _param("boolean", "Ejecutar en background (para compose_up, default=true)"),
             },
-        },
-    },
-]
+        ),
+    ]
+
+
+def __getattr__(name: str) -> Any:
+    """``TOOLS_SCHEMA`` / ``TOOLS_SCHEMA_JSON`` se construyen en el primer acceso (PEP 562).
+
+    Importar ``ToolExecutor`` o ``TOOL_SEMANTICS`` no paga el esquema. Tras el primer
+    acceso quedan como globales del módulo: siempre el mismo objeto (el agente compara
+    por identidad) y sin volver a pasar por aquí.
+    """
+    if name in ("TOOLS_SCHEMA", "TOOLS_SCHEMA_JSON"):
+        schema = _build_tools_schema()
+        g = globals()
+        g.setdefault("TOOLS_SCHEMA", schema)
+        # El esquema es estático: se serializa una vez y se inserta tal cual en cada petición.
+        g.setdefault("TOOLS_SCHEMA_JSON", orjson.dumps(g["TOOLS_SCHEMA"]))
+        return g[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
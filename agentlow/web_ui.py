@@ -11,21 +11,16 @@ En el proyecto completo puedes reemplazarla por tu UI terminal vía WebSocket.
 from __future__ import annotations
 
 import argparse
+import hashlib
 from typing import Any, Dict
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 
 from .agent import OllamaAgent
 
-
-def build_app(agent: OllamaAgent) -> FastAPI:
-    app = FastAPI(title="🥜 AgentLow Web")
-
-    @app.get("/", response_class=HTMLResponse)
-    def index() -> str:
-        return """<!doctype html>
+_INDEX_HTML = """<!doctype html>
 <html lang=\"es\"><head><meta charset=\"utf-8\"/>
 <title>🥜 AgentLow Web</title>
 <style>body{font-family:system-ui;margin:24px}textarea{width:100%;height:120px}pre{background:#111;color:#eee;padding:12px;border-radius:8px;white-space:pre-wrap}</style>
@@ -34,8 +29,24 @@ def build_app(agent: OllamaAgent) -> FastAPI:
 <p>UI mínima. POST /chat con JSON: {"message": "..."}</p>
 </body></html>"""
 
+# Página estática: bytes y ETag calculados una vez al importar
+_INDEX_BYTES = _INDEX_HTML.encode("utf-8")
+_INDEX_ETAG = '"' + hashlib.sha1(_INDEX_BYTES).hexdigest() + '"'
+_INDEX_HEADERS = {"ETag": _INDEX_ETAG, "Cache-Control": "public, max-age=3600"}
+
+
+def build_app(agent: OllamaAgent) -> FastAPI:
+    app = FastAPI(title="🥜 AgentLow Web")
+
+    @app.get("/")
+    async def index(request: Request) -> Response:
+        if request.headers.get("if-none-match") == _INDEX_ETAG:
+            return Response(status_code=304, headers=_INDEX_HEADERS)
+        return Response(content=_INDEX_BYTES, media_type="text/html; charset=utf-8", headers=_INDEX_HEADERS)
+
     @app.post("/chat")
     def chat(payload: Dict[str, Any]) -> JSONResponse:
+        # Síncrono: FastAPI lo ejecuta en su threadpool y usa el camino ``run`` (tools en serie)
         msg = str(payload.get("message", "")).strip()
         if not msg:
             return JSONResponse({"error": "message vacío"}, status_code=400)
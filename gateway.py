@@ -19,13 +19,14 @@ Nota importante (Windows):
 
 from __future__ import annotations
 
+import bisect
 import os
 import shlex
 import sys
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.table import Table
@@ -60,29 +61,35 @@ def _in_venv() -> bool:
     return sys.prefix != getattr(sys, "base_prefix", sys.prefix)
 
 
-def _help(console: Console) -> None:
-    console.print(
-        Panel(
-            "[bold]/help[/bold] ayuda\n"
-            "[bold]/new <name>[/bold] crear sesión\n"
-            "[bold]/switch <name>[/bold] cambiar sesión\n"
-            "[bold]/list[/bold] listar sesiones\n"
-            "[bold]/reset[/bold] reset historial sesión actual\n"
-            "[bold]/peanuts[/bold] ver contador\n"
-            "[bold]/model <name>[/bold] cambiar modelo sesión actual\n"
-            "[bold]/exit[/bold] salir\n",
-            title="Comandos",
-            border_style="yellow",
-        )
+def _help_panel() -> Panel:
+    return Panel(
+        "[bold]/help[/bold] ayuda\n"
+        "[bold]/new <name>[/bold] crear sesión\n"
+        "[bold]/switch <name>[/bold] cambiar sesión\n"
+        "[bold]/list[/bold] listar sesiones\n"
+        "[bold]/reset[/bold] reset historial sesión actual\n"
+        "[bold]/peanuts[/bold] ver contador\n"
+        "[bold]/model <name>[/bold] cambiar modelo sesión actual\n"
+        "[bold]/exit[/bold] salir\n",
+        title="Comandos",
+        border_style="yellow",
     )
 
 
-def _list_sessions(console: Console, sessions: Dict[str, Session], current: str) -> None:
+def _help(console: Console) -> None:
+    console.print(_help_panel())
+
+
+def _list_sessions(
+    console: Console, sessions: Dict[str, Session], order: List[Tuple[str, str]], current: str
+) -> None:
+    """``order``: ``(nombre.lower(), nombre)`` ya ordenado (se mantiene con ``bisect.insort``)."""
     t = Table(show_header=True, header_style="bold")
     t.add_column("Sesión")
     t.add_column("Modelo")
     t.add_column("Peanuts")
-    for name, sess in sorted(sessions.items(), key=lambda kv: kv[0].lower()):
+    for _, name in order:
+        sess = sessions[name]
         mark = "✅" if name == current else ""
         t.add_row(f"{name} {mark}", sess.agent.model, str(sess.agent.peanuts))
     console.print(t)
@@ -91,9 +98,12 @@ def _list_sessions(console: Console, sessions: Dict[str, Session], current: str)
 def main() -> None:
     console = Console()
 
+    # Pantalla inicial en un único print (Rich renderiza y escribe una sola vez)
+    intro: List[Panel] = []
+
     # Aviso si no estamos en venv (esto evita el fallo típico de "no module named fastapi/rich").
     if os.name == "nt" and not _in_venv():
-        console.print(
+        intro.append(
             Panel(
                 "[yellow]Estás ejecutando fuera del entorno virtual (.venv).[/yellow]\n\n"
                 "En Windows usa:\n"
@@ -103,9 +113,11 @@ def main() -> None:
             )
         )
 
-    console.print(Panel.fit(ASCII_TITLE, border_style="yellow", padding=(1, 2)))
+    intro.append(Panel.fit(ASCII_TITLE, border_style="yellow", padding=(1, 2)))
+    intro.append(_help_panel())
 
     sessions: Dict[str, Session] = {}
+    session_order: List[Tuple[str, str]] = []
     current: str = "main"
 
     def ensure_session(name: str) -> Session:
@@ -118,11 +130,12 @@ def main() -> None:
                     temperature=float(os.getenv("PEANUT_TEMP", "0.0")),
                 ),
             )
+            bisect.insort(session_order, (name.lower(), name))
         current = name
         return sessions[name]
 
     ensure_session(current)
-    _help(console)
+    console.print(Group(*intro))
 
     while True:
         sess = ensure_session(current)
@@ -149,7 +162,7 @@ def main() -> None:
                 continue
 
             if cmd == "/list":
-                _list_sessions(console, sessions, current)
+                _list_sessions(console, sessions, session_order, current)
                 continue
 
             if cmd == "/new" and len(parts) >= 2:
@@ -37,7 +37,7 @@ class MemoryEntry(BaseModel):
     embedding: List[float]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OllamaClient:
     ollama_url: str = "http://localhost:11434"
     timeout_s: int = 60
@@ -19,8 +19,6 @@ from __future__ import annotations
 import argparse
 import sys
 
-from agent import OllamaAgent
-
 
 def cmd_wizard(_: argparse.Namespace) -> None:
     from wizard import run_wizard
@@ -38,6 +36,7 @@ def cmd_web(_: argparse.Namespace) -> None:
 
 
 def cmd_run(args: argparse.Namespace) -> None:
+    from agent import OllamaAgent
     agent = OllamaAgent(model=args.model, temperature=args.temperature, max_iterations=args.max_iterations)
     agent.reset()
     out = agent.run(args.task, verbose=args.verbose)
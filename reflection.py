@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import os
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Literal, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
 
+import httpx
+import orjson
 import requests
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    from agentlow.persistent_cache import CacheStore
 
 
 class PeanutReflection(BaseModel):
@@ -20,152 +31,390 @@ class PeanutReflection(BaseModel):
     improved_input: Optional[str] = None
 
 
-@dataclass(frozen=True)
+# Validador construido una vez y reutilizado en cada reflexión
+_ADAPTER: TypeAdapter[PeanutReflection] = TypeAdapter(PeanutReflection)
+
+
+@dataclass(frozen=True, slots=True)
 class _OllamaCfg:
     host: str
     model: str
     timeout_s: int
+    keep_alive: str
 
 
+@functools.lru_cache(maxsize=1)
 def _cfg() -> _OllamaCfg:
+    """Configuración desde el entorno (se lee una vez; ``_cfg.cache_clear()`` para releer)."""
     host = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
     model = os.environ.get("PEANUT_REFLECTION_MODEL", os.environ.get("PEANUT_MODEL", "qwen2.5:7b"))
     timeout_s = int(os.environ.get("PEANUT_OLLAMA_TIMEOUT", "30"))
-    return _OllamaCfg(host=host, model=model, timeout_s=timeout_s)
+    keep_alive = os.environ.get("PEANUT_OLLAMA_KEEP_ALIVE", "30m")
+    return _OllamaCfg(host=host, model=model, timeout_s=timeout_s, keep_alive=keep_alive)
+
+
+# Prompt de sistema fijo: prefijo idéntico en cada reflexión (Ollama reutiliza su KV cache
+# mientras el modelo siga cargado, ver ``keep_alive``).
+_SYSTEM_PROMPT = (
+    "Eres un auditor de calidad extremadamente estricto.\n"
+    "Tu tarea: evaluar si la ejecución de una herramienta fue exitosa.\n"
+    "Responde SIEMPRE en JSON válido que cumpla EXACTAMENTE este esquema:\n"
+    "{\n"
+    '  "success": true|false,\n'
+    '  "analysis": "string (breve)",\n'
+    '  "peanuts_earned": 0|1,\n'
+    '  "next_action": "retry"|"finalize",\n'
+    '  "improved_input": "string opcional"\n'
+    "}\n"
+    "Reglas:\n"
+    "- Si el output contiene error, está vacío o es inútil => success=false, peanuts_earned=0, next_action=retry.\n"
+    '- improved_input debe sugerir un ajuste concreto (idealmente parámetros JSON) para reintentar.\n'
+    "- Si es correcto => success=true, peanuts_earned=1, next_action=finalize.\n"
+    "NO incluyas texto fuera del JSON."
+)
+
+
+# Tras un fallo de conexión se asume Ollama caído durante unos segundos: las
+# reflexiones siguientes devuelven el fallback sin esperar otro timeout.
+OLLAMA_DOWN_TTL_S = 5.0
+_OLLAMA_DOWN_UNTIL = 0.0
+
+# Ollama >= 0.5 acepta un JSON Schema en ``format`` (decodificación con gramática): el
+# esquema ya no hace falta describirlo en el prompt y la salida siempre es JSON válido.
+_SCHEMA: Dict[str, Any] = PeanutReflection.model_json_schema()
+_SCHEMA_MIN_VERSION = (0, 5, 0)
+# En inglés: con el esquema forzado por ``format`` basta una regla corta, y los
+# modelos pequeños la siguen mejor (y con menos tokens) que la versión en español
+_SHORT_SYSTEM_PROMPT = (
+    "You are a strict auditor: judge whether the tool call succeeded.\n"
+    "Error, empty or useless output => success=false, peanuts_earned=0, next_action=retry and "
+    "improved_input with one concrete fix. Correct => success=true, peanuts_earned=1, next_action=finalize."
+)
+_SCHEMA_SUPPORT: Dict[str, bool] = {}  # host -> ¿acepta ``format`` con esquema?
+_SCHEMA_PROBE_RETRY_AT: Dict[str, float] = {}  # host -> monotonic tras un sondeo fallido
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _session() -> requests.Session:
+    """Sesión HTTP de proceso (keep-alive): una conexión TCP reutilizada por reflexión."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(total=0))
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                s.headers.update({"Connection": "keep-alive"})
+                _SESSION = s
+    return _SESSION
+
+
+_STORE: Optional["CacheStore"] = None
+_STORE_LOCK = threading.Lock()
+
+
+def _store() -> Optional["CacheStore"]:
+    """``CacheStore`` persistente de reflexiones, o ``None`` si está desactivada.
+
+    Opt-in con ``PEANUT_REFLECTION_CACHE=1``; directorio en ``PEANUT_CACHE_DIR``
+    (``~/.peanut/reflect``) y caducidad opcional en ``PEANUT_REFLECTION_CACHE_TTL`` (s).
+    Con temperatura 0 la misma petición produce la misma reflexión.
+    """
+    global _STORE
+    if os.environ.get("PEANUT_REFLECTION_CACHE") != "1":
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                from agentlow.persistent_cache import CacheStore  # import perezoso: solo si se activa
+
+                ttl = os.environ.get("PEANUT_REFLECTION_CACHE_TTL")
+                _STORE = CacheStore(
+                    os.environ.get("PEANUT_CACHE_DIR", "~/.peanut/reflect"),
+                    ttl_seconds=float(ttl) if ttl else None,
+                )
+    return _STORE
+
 
+def _parse_version(text: str) -> Tuple[int, ...]:
+    parts = []
+    for piece in text.split("-")[0].split(".")[:3]:
+        digits = "".join(ch for ch in piece if ch.isdigit())
+        parts.append(int(digits) if digits else 0)
+    return tuple(parts)
 
-def _ollama_chat(messages: list[dict[str, Any]], *, model: str, host: str, timeout_s: int) -> str:
-    """Llama a Ollama /api/chat y devuelve el contenido de la respuesta (string)."""
-    url = f"{host}/api/chat"
-    payload: Dict[str, Any] = {
+
+def _schema_format_supported(host: str) -> bool:
+    """``GET /api/version`` una vez por host.
+
+    Si falla se usa el prompt completo y no se vuelve a sondear durante
+    ``OLLAMA_DOWN_TTL_S`` (el mismo margen que ``_OLLAMA_DOWN_UNTIL``).
+    """
+    cached = _SCHEMA_SUPPORT.get(host)
+    if cached is not None:
+        return cached
+    if time.monotonic() < _SCHEMA_PROBE_RETRY_AT.get(host, 0.0):
+        return False
+    try:
+        r = _session().get(f"{host}/api/version", timeout=2)
+        r.raise_for_status()
+        version = str(r.json().get("version", ""))
+    except (requests.RequestException, ValueError):
+        _SCHEMA_PROBE_RETRY_AT[host] = time.monotonic() + OLLAMA_DOWN_TTL_S
+        return False
+    supported = _parse_version(version) >= _SCHEMA_MIN_VERSION
+    _SCHEMA_SUPPORT[host] = supported
+    return supported
+
+
+def _chat_payload(messages: list[dict[str, Any]], model: str, keep_alive: str, format: Any) -> Dict[str, Any]:
+    return {
         "model": model,
         "messages": messages,
-        "stream": False,
-        # Si tu Ollama soporta format=json ayuda a forzar JSON limpio.
-        "format": "json",
+        "stream": True,
+        # "json" fuerza JSON limpio; un JSON Schema (Ollama >= 0.5) fuerza además su forma
+        "format": format,
         "options": {"temperature": 0.0},
+        # Mantiene el modelo cargado entre reflexiones (sin recarga ni prefill del sistema)
+        "keep_alive": keep_alive,
     }
 
-    r = requests.post(url, json=payload, timeout=timeout_s)
-    r.raise_for_status()
-    data = r.json()
-    msg = data.get("message") or {}
-    return str(msg.get("content", "")).strip()
 
+def _chunk_content(line: Any) -> Tuple[str, bool]:
+    """``(texto, done)`` de una línea NDJSON de /api/chat; ``("", False)`` si no es JSON."""
+    try:
+        chunk = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return "", False
+    if "error" in chunk:
+        raise requests.RequestException(f"Ollama: {chunk['error']}")
+    return str((chunk.get("message") or {}).get("content", "")), bool(chunk.get("done"))
+
+
+def _ollama_chat(
+    messages: list[dict[str, Any]],
+    *,
+    model: str,
+    host: str,
+    timeout_s: int,
+    keep_alive: str = "30m",
+    format: Any = "json",
+) -> str:
+    """Llama a Ollama /api/chat y devuelve el contenido de la respuesta (string).
+
+    En streaming: en cuanto el texto recibido contiene un objeto JSON completo que
+    valida como ``PeanutReflection`` se devuelve y se corta la respuesta (no se esperan
+    los tokens de cola). Si ninguno valida se lee todo y se devuelve el texto completo.
+    """
+    payload = _chat_payload(messages, model, keep_alive, format)
+    scanner = _JsonObjectScanner()
+    with _session().post(f"{host}/api/chat", json=payload, timeout=timeout_s, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            piece, done = _chunk_content(line)
+            if piece:
+                found = _next_valid_object(scanner, piece)
+                if found is not None:
+                    return found
+            if done:
+                break
+    return scanner.text.strip()
+
+
+async def _ollama_chat_async(
+    messages: list[dict[str, Any]],
+    *,
+    model: str,
+    host: str,
+    timeout_s: int,
+    keep_alive: str = "30m",
+    format: Any = "json",
+) -> str:
+    """Versión asíncrona de ``_ollama_chat`` sobre el ``httpx.AsyncClient`` compartido.
+
+    El cliente (uno por host y event loop) es el de ``agentlow._http``, el mismo que
+    usa el agente. Lanza ``httpx.HTTPError`` (red/HTTP) o ``requests.RequestException``
+    (error de Ollama).
+    """
+    from agentlow._http import get_async_client  # import perezoso, como ``CacheStore``
+
+    payload = _chat_payload(messages, model, keep_alive, format)
+    scanner = _JsonObjectScanner()
+    async with get_async_client(host).stream("POST", "/api/chat", json=payload, timeout=timeout_s) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            piece, done = _chunk_content(line)
+            if piece:
+                found = _next_valid_object(scanner, piece)
+                if found is not None:
+                    return found
+            if done:
+                break
+    return scanner.text.strip()
 
-def _extract_first_json_object(text: str) -> Optional[str]:
-    """Extrae el primer objeto JSON {...} con llaves balanceadas, ignorando strings.
 
-    Evita regex recursiva (Python re NO soporta (?R)).
-    """
-    if not text:
-        return None
+# Caracteres estructurales: el bucle salta entre ellos (búsqueda en C) en vez de
+# recorrer el texto carácter a carácter en Python.
+_SCAN = re.compile(r'[{}"\\]')
 
-    start = text.find("{")
-    if start == -1:
-        return None
 
-    in_str = False
-    esc = False
-    depth = 0
-    begin = None
+class _JsonObjectScanner:
+    """Estado de ``_extract_first_json_object`` para texto que llega por trozos (streaming).
 
-    for i in range(start, len(text)):
-        ch = text[i]
+    ``feed`` añade texto y continúa el escaneo donde lo dejó; devuelve el siguiente
+    objeto con llaves balanceadas en cuanto se cierra, o ``None`` si aún no hay ninguno.
+    No se parsea aquí: la validación (una sola) la hace quien lo usa, y ``feed("")``
+    continúa con el siguiente objeto si el candidato no le sirve.
+    """
 
-        if in_str:
-            if esc:
-                esc = False
-                continue
-            if ch == "\\":
-                esc = True
+    __slots__ = ("text", "pos", "started", "in_str", "depth", "begin")
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.pos = 0
+        self.started = False
+        self.in_str = False
+        self.depth = 0
+        self.begin: Optional[int] = None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        self.text += chunk
+        text = self.text
+
+        if not self.started:
+            start = text.find("{", self.pos)
+            if start == -1:
+                self.pos = len(text)
+                return None
+            self.started = True
+            self.pos = start
+
+        while True:
+            m = _SCAN.search(text, self.pos)
+            if m is None:
+                self.pos = max(self.pos, len(text))
+                return None
+            i = m.start()
+            ch = text[i]
+            self.pos = i + 1
+
+            if self.in_str:
+                if ch == "\\":
+                    self.pos = i + 2  # salta el carácter escapado (aunque llegue en el siguiente trozo)
+                elif ch == '"':
+                    self.in_str = False
                 continue
+
+            # fuera de string
             if ch == '"':
-                in_str = False
-            continue
-
-        # fuera de string
-        if ch == '"':
-            in_str = True
-            continue
-
-        if ch == "{":
-            if depth == 0:
-                begin = i
-            depth += 1
-            continue
-
-        if ch == "}":
-            if depth > 0:
-                depth -= 1
-                if depth == 0 and begin is not None:
-                    candidate = text[begin : i + 1].strip()
-                    # Validación rápida: ¿es JSON parseable?
-                    try:
-                        json.loads(candidate)
+                self.in_str = True
+                continue
+
+            if ch == "{":
+                if self.depth == 0:
+                    self.begin = i
+                self.depth += 1
+                continue
+
+            if ch == "}":
+                if self.depth > 0:
+                    self.depth -= 1
+                    if self.depth == 0 and self.begin is not None:
+                        candidate = text[self.begin : i + 1].strip()
+                        self.begin = None
                         return candidate
-                    except json.JSONDecodeError:
-                        # seguimos buscando otro objeto posible
-                        begin = None
-                        continue
 
+
+def _next_valid_object(scanner: _JsonObjectScanner, piece: str) -> Optional[str]:
+    """Añade ``piece`` al escáner y devuelve el primer objeto cerrado que valida, si lo hay."""
+    candidate = scanner.feed(piece)
+    while candidate is not None:
+        if _validate_json_text(candidate) is not None:
+            return candidate
+        candidate = scanner.feed("")
     return None
 
 
+def _iter_json_objects(text: str) -> Iterator[str]:
+    """Objetos {...} con llaves balanceadas de ``text`` (ignorando strings), en orden.
+
+    Evita regex recursiva (Python re NO soporta (?R)).
+    """
+    if not text:
+        return
+    scanner = _JsonObjectScanner()
+    candidate = scanner.feed(text)
+    while candidate is not None:
+        yield candidate
+        candidate = scanner.feed("")
+
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """Primer objeto {...} con llaves balanceadas (sin validar que sea JSON)."""
+    return next(_iter_json_objects(text), None)
+
+
 def _parse_reflection_json(raw: str) -> Optional[PeanutReflection]:
-    """Intenta parsear el JSON estricto o extraído de un texto sucio."""
-    raw = (raw or "").strip()
+    """Intenta parsear el JSON estricto o extraído de un texto sucio.
+
+    ``raw`` llega ya sin espacios en los extremos (``_ollama_chat``).
+    """
     if not raw:
         return None
 
     # 1) intento directo
-    try:
-        return PeanutReflection.model_validate_json(raw)
-    except Exception:
-        pass
-
-    # 2) extraer primer objeto JSON
-    candidate = _extract_first_json_object(raw)
-    if not candidate:
+    parsed = _validate_json_text(raw)
+    if parsed is not None:
+        return parsed
+
+    # 2) caso típico con texto alrededor: un único objeto entre el primer "{" y el
+    #    último "}" (un find/rfind y una decodificación en C, sin escanear)
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start == -1 or end < start:
         return None
+    parsed = _validate_json_text(raw[start : end + 1])
+    if parsed is not None:
+        return parsed
+
+    # 3) objetos {...} incrustados en el texto: el primero que valida (una sola
+    #    validación por candidato, sin ``json.loads`` previo)
+    for candidate in _iter_json_objects(raw):
+        parsed = _validate_json_text(candidate)
+        if parsed is not None:
+            return parsed
+    return None
+
 
+def _validate_json_text(text: str) -> Optional[PeanutReflection]:
+    """Decodifica con orjson (C) y valida el dict ya decodificado."""
     try:
-        return PeanutReflection.model_validate_json(candidate)
-    except ValidationError:
-        return None
-    except Exception:
+        return _ADAPTER.validate_python(orjson.loads(text))
+    except (orjson.JSONDecodeError, ValidationError):
         return None
 
 
-def reflect_on_result(tool_name: str, user_input: str, tool_output: str) -> PeanutReflection:
-    """Genera una reflexión (audit) sobre el resultado de una herramienta.
+def _coerce(value: Any) -> str:
+    # ``str()`` solo si hace falta (el agente pasa el resultado de la herramienta como dict)
+    return value if isinstance(value, str) else str(value or "")
 
-    - Si Ollama está disponible: pide JSON estricto y lo valida con Pydantic.
-    - Si Ollama NO está disponible: devuelve un fallback útil (no rompe el gateway).
-    """
-    tool_name = str(tool_name or "").strip() or "unknown_tool"
-    user_input = str(user_input or "")
-    tool_output = str(tool_output or "")
 
-    cfg = _cfg()
+def _prepare(
+    tool_name: Any, user_input: Any, tool_output: Any
+) -> Tuple[_OllamaCfg, str, List[Dict[str, str]], Optional["CacheStore"], Optional[str]]:
+    """Normaliza la entrada y construye mensajes y clave de caché (común sync/async)."""
+    tool_name = _coerce(tool_name).strip() or "unknown_tool"
+    user_input = _coerce(user_input)
+    tool_output = _coerce(tool_output)
 
-    system = (
-        "Eres un auditor de calidad extremadamente estricto.\n"
-        "Tu tarea: evaluar si la ejecución de una herramienta fue exitosa.\n"
-        "Responde SIEMPRE en JSON válido que cumpla EXACTAMENTE este esquema:\n"
-        "{\n"
-        '  "success": true|false,\n'
-        '  "analysis": "string (breve)",\n'
-        '  "peanuts_earned": 0|1,\n'
-        '  "next_action": "retry"|"finalize",\n'
-        '  "improved_input": "string opcional"\n'
-        "}\n"
-        "Reglas:\n"
-        "- Si el output contiene error, está vacío o es inútil => success=false, peanuts_earned=0, next_action=retry.\n"
-        '- improved_input debe sugerir un ajuste concreto (idealmente parámetros JSON) para reintentar.\n'
-        "- Si es correcto => success=true, peanuts_earned=1, next_action=finalize.\n"
-        "NO incluyas texto fuera del JSON."
-    )
+    cfg = _cfg()
 
     user = (
         f"Herramienta: {tool_name}\n\n"
@@ -174,41 +423,186 @@ def reflect_on_result(tool_name: str, user_input: str, tool_output: str) -> Pean
     )
 
     messages = [
-        {"role": "system", "content": system},
+        {"role": "system", "content": _SYSTEM_PROMPT},
         {"role": "user", "content": user},
     ]
 
+    store = _store()
+    cache_key = store.make_key(cfg.model, messages) if store is not None else None
+    return cfg, user_input, messages, store, cache_key
+
+
+def _cached(store: Optional["CacheStore"], cache_key: Optional[str]) -> Optional[PeanutReflection]:
+    if store is None or cache_key is None:
+        return None
+    cached = store.get(cache_key)
+    return PeanutReflection(**cached) if cached is not None else None
+
+
+def _request_format(messages: List[Dict[str, str]], schema: bool) -> Tuple[List[Dict[str, str]], Any]:
+    """Mensajes y ``format`` a enviar según si Ollama acepta un JSON Schema."""
+    if not schema:
+        return messages, "json"
+    # La clave de caché sigue siendo la del prompt completo: no depende de la versión
+    return [{"role": "system", "content": _SHORT_SYSTEM_PROMPT}, messages[1]], _SCHEMA
+
+
+def _finish(
+    raw: str, user_input: str, store: Optional["CacheStore"], cache_key: Optional[str]
+) -> PeanutReflection:
+    """Valida y normaliza la respuesta de Ollama (y la guarda en caché si procede)."""
+    parsed = _parse_reflection_json(raw)
+    if parsed:
+        # Normalización mínima
+        if parsed.success:
+            parsed.peanuts_earned = 1
+            parsed.next_action = "finalize"
+            parsed.improved_input = None
+        else:
+            parsed.peanuts_earned = 0
+            if not parsed.improved_input:
+                parsed.improved_input = user_input
+        if cache_key is not None:
+            store.put(cache_key, parsed.model_dump())
+        return parsed
+
+    # Si Ollama respondió algo no parseable, fallback
+    return PeanutReflection(
+        success=False,
+        analysis="Respuesta de reflexión no fue JSON válido. Se sugiere reintentar con input más simple.",
+        peanuts_earned=0,
+        next_action="retry",
+        improved_input=user_input,
+    )
+
+
+def _ollama_down() -> Optional[PeanutReflection]:
+    if time.monotonic() < _OLLAMA_DOWN_UNTIL:
+        return _ollama_unavailable(f"sin conexión en los últimos {OLLAMA_DOWN_TTL_S:g}s")
+    return None
+
+
+def _mark_down() -> None:
+    global _OLLAMA_DOWN_UNTIL
+    _OLLAMA_DOWN_UNTIL = time.monotonic() + OLLAMA_DOWN_TTL_S
+
+
+def reflect_on_result(tool_name: str, user_input: str, tool_output: str) -> PeanutReflection:
+    """Genera una reflexión (audit) sobre el resultado de una herramienta.
+
+    - Si Ollama está disponible: pide JSON estricto y lo valida con Pydantic.
+    - Si Ollama NO está disponible: devuelve un fallback útil (no rompe el gateway).
+    """
+    cfg, user_input, messages, store, cache_key = _prepare(tool_name, user_input, tool_output)
+    hit = _cached(store, cache_key) or _ollama_down()
+    if hit is not None:
+        return hit
+
     # Intento con Ollama
     try:
-        raw = _ollama_chat(messages, model=cfg.model, host=cfg.host, timeout_s=cfg.timeout_s)
-        parsed = _parse_reflection_json(raw)
-        if parsed:
-            # Normalización mínima
-            if parsed.success:
-                parsed.peanuts_earned = 1
-                parsed.next_action = "finalize"
-                parsed.improved_input = None
-            else:
-                parsed.peanuts_earned = 0
-                if not parsed.improved_input:
-                    parsed.improved_input = user_input
-            return parsed
-
-        # Si Ollama respondió algo no parseable, fallback
-        return PeanutReflection(
-            success=False,
-            analysis="Respuesta de reflexión no fue JSON válido. Se sugiere reintentar con input más simple.",
-            peanuts_earned=0,
-            next_action="retry",
-            improved_input=user_input,
+        messages, fmt = _request_format(messages, _schema_format_supported(cfg.host))
+        raw = _ollama_chat(
+            messages,
+            model=cfg.model,
+            host=cfg.host,
+            timeout_s=cfg.timeout_s,
+            keep_alive=cfg.keep_alive,
+            format=fmt,
         )
+        return _finish(raw, user_input, store, cache_key)
 
     except requests.RequestException as e:
         # Ollama no disponible / conexión rechazada
-        return PeanutReflection(
-            success=False,
-            analysis=f"Ollama no disponible para reflexión ({e.__class__.__name__}). El gateway puede iniciar igualmente.",
-            peanuts_earned=0,
-            next_action="finalize",
-            improved_input=None,
+        if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+            _mark_down()
+        return _ollama_unavailable(e.__class__.__name__)
+
+
+async def reflect_on_result_async(tool_name: str, user_input: str, tool_output: str) -> PeanutReflection:
+    """Como ``reflect_on_result`` pero sin bloquear el event loop.
+
+    Varias reflexiones concurrentes comparten el ``httpx.AsyncClient`` keep-alive.
+    """
+    cfg, user_input, messages, store, cache_key = _prepare(tool_name, user_input, tool_output)
+    hit = _cached(store, cache_key) or _ollama_down()
+    if hit is not None:
+        return hit
+
+    try:
+        schema = _SCHEMA_SUPPORT.get(cfg.host)
+        if schema is None:
+            schema = await asyncio.to_thread(_schema_format_supported, cfg.host)
+        messages, fmt = _request_format(messages, schema)
+        raw = await _ollama_chat_async(
+            messages,
+            model=cfg.model,
+            host=cfg.host,
+            timeout_s=cfg.timeout_s,
+            keep_alive=cfg.keep_alive,
+            format=fmt,
         )
+        return _finish(raw, user_input, store, cache_key)
+
+    except (httpx.HTTPError, requests.RequestException) as e:
+        if isinstance(e, (httpx.TransportError, requests.ConnectionError, requests.Timeout)):
+            _mark_down()
+        return _ollama_unavailable(e.__class__.__name__)
+
+
+def _ollama_unavailable(reason: str) -> PeanutReflection:
+    return PeanutReflection(
+        success=False,
+        analysis=f"Ollama no disponible para reflexión ({reason}). El gateway puede iniciar igualmente.",
+        peanuts_earned=0,
+        next_action="finalize",
+        improved_input=None,
+    )
+
+
+def _default_batch_size() -> int:
+    """Peticiones simultáneas que Ollama atiende (``OLLAMA_NUM_PARALLEL``, 1 por defecto).
+
+    Mismo valor por defecto que ``agentlow.reflection._ollama_num_parallel`` (y que Ollama).
+    """
+    try:
+        return max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+    except ValueError:
+        return 1
+
+
+def reflect_on_results_batch(
+    items: Sequence[Tuple[str, str, str]], *, max_batch_size: Optional[int] = None
+) -> List[PeanutReflection]:
+    """Reflexiona sobre varios ``(tool_name, user_input, tool_output)`` a la vez.
+
+    Ollama no tiene chat por lotes, pero atiende peticiones concurrentes (y las agrupa
+    en la GPU): se lanzan en paralelo sobre la sesión keep-alive compartida. El prompt
+    de sistema es idéntico en todas, así que comparten el prefijo cacheado.
+    Devuelve las reflexiones en el mismo orden que ``items``.
+    """
+    if not items:
+        return []
+    workers = min(len(items), max_batch_size or _default_batch_size())
+    if workers == 1:
+        return [reflect_on_result(*item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reflection") as pool:
+        return list(pool.map(lambda item: reflect_on_result(*item), items))
+
+
+async def reflect_on_results_batch_async(
+    items: Sequence[Tuple[str, str, str]], *, max_batch_size: Optional[int] = None
+) -> List[PeanutReflection]:
+    """Versión asíncrona de ``reflect_on_results_batch`` (``asyncio.gather`` acotado).
+
+    Como mucho ``max_batch_size`` (``OLLAMA_NUM_PARALLEL``) peticiones en vuelo;
+    el orden del resultado es el de ``items``.
+    """
+    if not items:
+        return []
+    sem = asyncio.Semaphore(max_batch_size or _default_batch_size())
+
+    async def _one(item: Tuple[str, str, str]) -> PeanutReflection:
+        async with sem:
+            return await reflect_on_result_async(*item)
+
+    return list(await asyncio.gather(*(_one(item) for item in items)))
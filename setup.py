@@ -23,12 +23,22 @@ setup(
     python_requires=">=3.10",
     install_requires=[
         "requests>=2.31.0",
+        "urllib3>=1.26.0",
+        "httpx>=0.25.0",
+        "orjson>=3.9.0",
+        "msgspec>=0.18.0",
         "pydantic>=2.4.0",
         "rich>=13.6.0",
         "fastapi>=0.104.0",
         "uvicorn>=0.24.0",
         "websockets>=12.0",
     ],
+    extras_require={
+        "fast": [
+            'uvloop>=0.19.0; sys_platform != "win32"',
+            "httptools>=0.6.0",
+        ],
+    },
     py_modules=[
         "agent",
         "tools",
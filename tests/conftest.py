@@ -0,0 +1,29 @@
+"""Presupuesto de tiempo por test.
+
+Un test que no esté marcado ``@pytest.mark.slow`` y cuya fase ``call`` supere
+``SLOW_TEST_BUDGET_S`` hace fallar la sesión (p.ej. un timeout de red real que se
+coló en la suite).
+"""
+
+import pytest
+
+SLOW_TEST_BUDGET_S = 0.5
+
+_over_budget = []
+
+
+def pytest_runtest_logreport(report):
+    if report.when == "call" and report.duration > SLOW_TEST_BUDGET_S and "slow" not in report.keywords:
+        _over_budget.append((report.nodeid, report.duration))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if _over_budget and exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _over_budget:
+        terminalreporter.section("tests por encima del presupuesto")
+        for nodeid, duration in _over_budget:
+            terminalreporter.write_line(f"{duration:.2f}s > {SLOW_TEST_BUDGET_S}s  {nodeid}")
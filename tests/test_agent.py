@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import pytest
 
 from agentlow.agent import OllamaAgent
@@ -57,3 +60,181 @@ def test_cache(agent):
     first = agent.run("Lista archivos", verbose=False)
     second = agent.run("Lista archivos", verbose=False)
     assert first == second
+
+
+def test_arun_parallel_tool_calls(agent, tmp_path):
+    calls = []
+
+    async def _fake_acall_ollama(messages, tools=None):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            return {
+                "message": {
+                    "content": "",
+                    "tool_calls": [
+                        {"function": {"name": "write_file", "arguments": '{"path": "a.txt", "content": "A"}'}},
+                        {"function": {"name": "write_file", "arguments": '{"path": "b.txt", "content": "B"}'}},
+                    ],
+                }
+            }
+        return {"message": {"content": "hecho"}}
+
+    agent._acall_ollama = _fake_acall_ollama
+    reply = asyncio.run(agent.arun("Escribe dos archivos", verbose=False))
+
+    assert reply == "hecho"
+    assert (tmp_path / "a.txt").read_text() == "A"
+    assert (tmp_path / "b.txt").read_text() == "B"
+    tool_msgs = [m for m in agent.messages if m["role"] == "tool"]
+    assert [json.loads(m["content"])["path"] for m in tool_msgs] == ["a.txt", "b.txt"]
+
+
+def test_arun_dependent_tool_calls_keep_order(agent, tmp_path):
+    turns = [
+        [
+            {"function": {"name": "write_file", "arguments": '{"path": "f.txt", "content": "v1"}'}},
+            {"function": {"name": "read_file", "arguments": '{"path": "f.txt"}'}},
+            {"function": {"name": "write_file", "arguments": '{"path": "f.txt", "content": "v2"}'}},
+            {"function": {"name": "read_file", "arguments": '{"path": "f.txt"}'}},
+            {"function": {"name": "list_directory", "arguments": '{"path": "."}'}},
+        ]
+    ]
+
+    async def _fake_acall_ollama(messages, tools=None):
+        if turns:
+            return {"message": {"content": "", "tool_calls": turns.pop()}}
+        return {"message": {"content": "hecho"}}
+
+    agent._acall_ollama = _fake_acall_ollama
+    assert asyncio.run(agent.arun("Escribe y lee", verbose=False)) == "hecho"
+
+    results = [json.loads(m["content"]) for m in agent.messages if m["role"] == "tool"]
+    assert [r.get("content") for r in results[:4]] == [None, "v1", None, "v2"]
+    assert "error" not in results[4]
+
+
+def test_messages_buffer_matches_history(agent):
+    agent.run("Hola", verbose=False)
+    agent.run("Otra vez", verbose=False)
+    assert json.loads(agent._messages_json(agent.messages)) == agent.messages
+
+    # Modificación externa: el buffer se re-sincroniza
+    agent.messages.pop()
+    assert json.loads(agent._messages_json(agent.messages)) == agent.messages
+
+    agent.reset()
+    payload = json.loads(agent._chat_payload(agent.messages, None))
+    assert payload["messages"] == [] and payload["stream"] is False
+
+
+def test_enriched_context_is_cached(agent, tmp_path, monkeypatch):
+    import agentlow.agent as agent_mod
+
+    runs = []
+    real_run = agent_mod.subprocess.run
+
+    def _counting_run(*args, **kwargs):
+        runs.append(args[0])
+        return real_run(*args, **kwargs)
+
+    monkeypatch.setattr(agent_mod.subprocess, "run", _counting_run)
+    first = agent._get_enriched_context()
+    assert agent._get_enriched_context() == first
+    assert len(runs) == 1
+    assert isinstance(runs[0], list)
+
+    # Un archivo nuevo cambia el mtime del directorio e invalida la caché
+    (tmp_path / "nuevo.txt").write_text("x")
+    assert "nuevo.txt" in agent._get_enriched_context()
+    assert len(runs) == 2
+
+
+def test_warm_connection_skipped_while_fresh(agent, monkeypatch):
+    import agentlow.agent as agent_mod
+
+    gets = []
+
+    def _warm_pool(url, timeout):
+        gets.append(url)
+        return True
+
+    now = [100.0]
+    monkeypatch.setattr(agent_mod, "warm_pool", _warm_pool)
+    monkeypatch.setattr(agent_mod.time, "monotonic", lambda: now[0])
+
+    asyncio.run(agent._awarm_connection())
+    asyncio.run(agent._awarm_connection())
+    assert gets == [f"{agent.ollama_url}/api/tags"]
+
+    now[0] += agent_mod.WARM_CONNECTION_TTL_S
+    asyncio.run(agent._awarm_connection())
+    assert len(gets) == 2
+
+    # Un turno síncrono reutiliza el mismo pool: cuenta como conexión caliente
+    now[0] += agent_mod.WARM_CONNECTION_TTL_S
+    monkeypatch.setattr(agent_mod, "post_json", lambda url, body, timeout: {"message": {"content": "ok"}})
+    OllamaAgent._call_ollama(agent, [{"role": "user", "content": "hola"}])
+    asyncio.run(agent._awarm_connection())
+    assert len(gets) == 2
+
+
+def test_chat_payload_matches_plain_json(agent):
+    from agentlow.tools import TOOLS_SCHEMA
+
+    agent.run("Hola", verbose=False)
+    payload = json.loads(agent._chat_payload(agent.messages, TOOLS_SCHEMA))
+    assert payload == {
+        "model": agent.model,
+        "messages": agent.messages,
+        "stream": False,
+        "options": {"temperature": agent.temperature},
+        "tools": TOOLS_SCHEMA,
+    }
+
+
+def test_preview_truncates_utf8_safely():
+    from agentlow.agent import _preview
+
+    assert _preview({"a": 1}, 100) == '{"a":1}'
+    out = _preview({"texto": "ñ" * 500}, 20)
+    assert out.endswith("...") and len(out.encode()) <= 23
+
+
+def test_chat_payload_prefix_follows_model_and_temperature(agent):
+    from agentlow.tools import TOOLS_SCHEMA
+
+    agent._chat_payload(agent.messages, TOOLS_SCHEMA)
+    agent.model = "otro:1b"
+    agent.temperature = 0.7
+    payload = json.loads(agent._chat_payload(agent.messages, TOOLS_SCHEMA))
+    assert payload["model"] == "otro:1b"
+    assert payload["options"] == {"temperature": 0.7}
+    assert "tools" not in json.loads(agent._chat_payload(agent.messages, None))
+
+
+def test_git_status_short_matches_git_cli(tmp_path):
+    import shutil
+    import subprocess
+
+    if shutil.which("git") is None:
+        pytest.skip("git no disponible")
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    subprocess.run(["git", "-C", str(tmp_path), "add", "a.txt"], check=True)
+
+    a = OllamaAgent(work_dir=str(tmp_path))
+    expected = subprocess.run(["git", "status", "-s"], cwd=tmp_path, capture_output=True, text=True).stdout.strip()
+    assert a._git_status_short() == expected
+
+
+def test_parse_tool_arguments_batch_and_errors():
+    calls = [
+        {"function": {"name": "read_file", "arguments": '{"path": "a.txt"}'}},
+        {"function": {"name": "read_file", "arguments": {"path": "b.txt"}}},
+        {"function": {"name": "read_file", "arguments": '{"path": '}},
+    ]
+    parsed = OllamaAgent._parse_tool_arguments(calls)
+    assert parsed[:2] == [{"path": "a.txt"}, {"path": "b.txt"}]
+    assert isinstance(parsed[2], ValueError)
+    assert OllamaAgent._parse_tool_arguments(calls[:2]) == parsed[:2]
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import agent as agent_pro
+
+
+class _StreamResponse:
+    def __init__(self, chunks):
+        self._lines = [json.dumps(c).encode() for c in chunks]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        yield from self._lines
+
+
+@pytest.fixture
+def pro_agent(tmp_path, monkeypatch):
+    a = agent_pro.OllamaAgent(work_dir=str(tmp_path / "work"), peanut_home=str(tmp_path / "home"), enable_memory=False)
+
+    def _serve(chunks):
+        posts = []
+
+        def _fake_post(url, data=None, headers=None, timeout=None, stream=False):
+            posts.append(json.loads(data))
+            return _StreamResponse(chunks)
+
+        monkeypatch.setattr(agent_pro.requests, "post", _fake_post)
+        return posts
+
+    return a, _serve
+
+
+def test_stream_accumulates_content_deltas(pro_agent):
+    a, serve = pro_agent
+    posts = serve(
+        [
+            {"message": {"role": "assistant", "content": "Ho"}, "done": False},
+            {"message": {"role": "assistant", "content": ""}, "done": False},
+            {"message": {"role": "assistant", "content": "la"}, "done": False},
+            {"message": {"role": "assistant", "content": "!"}, "done": True},
+            {"message": {"role": "assistant", "content": "tras done"}, "done": False},
+        ]
+    )
+    deltas = []
+    resp = a._call_ollama_stream([{"role": "user", "content": "hi"}], None, deltas.append)
+
+    assert deltas == ["Ho", "la", "!"]
+    assert resp == {"message": {"role": "assistant", "content": "Hola!"}}
+    assert posts[0]["stream"] is True and "tools" not in posts[0]
+
+
+def test_stream_aggregates_tool_calls_across_chunks(pro_agent):
+    a, serve = pro_agent
+    first = {"function": {"name": "read_file", "arguments": {"path": "a"}}}
+    second = {"function": {"name": "list_directory", "arguments": {"path": "."}}}
+    serve(
+        [
+            {"message": {"content": "Voy", "tool_calls": [first]}, "done": False},
+            {"message": {"content": "", "tool_calls": [second]}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ]
+    )
+    resp = a._call_ollama_stream([], agent_pro.TOOLS_SCHEMA, lambda d: None)
+    assert resp["message"]["content"] == "Voy"
+    assert resp["message"]["tool_calls"] == [first, second]
+
+
+def test_stream_error_chunk_returns_error(pro_agent):
+    a, serve = pro_agent
+    serve([{"message": {"content": "par"}, "done": False}, {"error": "model not found"}])
+    deltas = []
+    resp = a._call_ollama_stream([], None, deltas.append)
+    assert resp == {"error": "Error llamando a Ollama: model not found"}
+    assert deltas == ["par"]
+
+    assert a.run("hola", verbose=False, on_delta=deltas.append) == "❌ Error: Error llamando a Ollama: model not found"
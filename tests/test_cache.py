@@ -0,0 +1,349 @@
+import pytest
+
+from agentlow.agent import OllamaAgent
+from agentlow.cache import ExactCache, SemanticCache, is_cacheable_response, make_key
+
+
+def _tool_response(name):
+    return {"message": {"content": "", "tool_calls": [{"function": {"name": name, "arguments": {}}}]}}
+
+
+def test_make_key_is_stable_and_sensitive():
+    msgs = [{"role": "user", "content": "hola"}]
+    assert make_key("m", 0.0, msgs) == make_key("m", 0, [dict(msgs[0])])
+    assert make_key("m", 0.0, msgs) != make_key("m", 0.5, msgs)
+    assert make_key("m", 0.0, msgs) != make_key("otro", 0.0, msgs)
+    # Mismo orden de claves irrelevante: forma canónica compartida con CacheStore
+    assert make_key("m", 0.0, [{"content": "hola", "role": "user"}]) == make_key("m", 0.0, msgs)
+
+
+def test_make_key_shares_canonical_helper_with_cache_store():
+    from agentlow.cache import make_key_canonical
+    from agentlow.persistent_cache import CacheStore
+
+    msgs = [{"role": "user", "content": "ñandú"}]
+    assert make_key("m", 0, msgs) == make_key_canonical(["m", 0.0, msgs, []])
+    assert CacheStore.make_key("m", msgs) == make_key_canonical({"model": "m", "messages": msgs, "tools": []})
+
+
+def test_admission_only_informational():
+    assert is_cacheable_response({"message": {"content": "ok"}})
+    assert is_cacheable_response(_tool_response("read_file"))
+    assert not is_cacheable_response(_tool_response("shell"))
+    assert not is_cacheable_response({"error": "boom"})
+
+
+def test_exact_cache_lru_eviction():
+    c = ExactCache(max_entries=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1
+    c.put("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+
+
+def test_agent_call_ollama_uses_cache(tmp_path, monkeypatch):
+    a = OllamaAgent(work_dir=str(tmp_path))
+    calls = []
+
+    def _fake_post_json(url, body, timeout):
+        calls.append(url)
+        return {"message": {"content": "respuesta"}}
+
+    monkeypatch.setattr("agentlow.agent.post_json", _fake_post_json)
+    msgs = [{"role": "user", "content": "hola"}]
+    assert a._call_ollama(msgs) == a._call_ollama(msgs)
+    assert len(calls) == 1
+    assert a.cache_stats()["exact"]["hits"] == 1
+
+
+def test_semantic_cache_threshold_and_scope():
+    pytest.importorskip("numpy")
+    vectors = {"a": [1.0, 0.0], "a2": [0.99, 0.05], "b": [0.0, 1.0]}
+    c = SemanticCache(lambda t: vectors[t], threshold=0.95, max_entries=4)
+    c.put("a", "A", scope="s1")
+    assert c.get("a2", scope="s1") == "A"
+    assert c.get("a2", scope="s2") is None
+    assert c.get("b", scope="s1") is None
+
+
+def test_cache_store_persists_across_instances(tmp_path):
+    from agentlow.persistent_cache import CacheStore
+
+    key = CacheStore.make_key("m", [{"role": "user", "content": "hola"}])
+    store = CacheStore(tmp_path)
+    store.put(key, {"message": {"content": "ok"}})
+    store.close()
+
+    reopened = CacheStore(tmp_path)
+    assert reopened.get(key) == {"message": {"content": "ok"}}
+    assert reopened.get("otra") is None
+    reopened.close()
+
+
+def test_cache_store_ttl_and_eviction(tmp_path, monkeypatch):
+    from agentlow import persistent_cache
+    from agentlow.persistent_cache import CacheStore
+
+    now = [1000.0]
+    monkeypatch.setattr(persistent_cache.time, "time", lambda: now[0])
+    store = CacheStore(tmp_path, ttl_seconds=10, max_entries=2)
+    for i, k in enumerate("abc"):
+        now[0] += 1
+        store.put(k, i)
+    assert store.get("a") is None and store.get("c") == 2
+
+    now[0] += 60
+    assert store.prune_expired() == 2
+    assert store.stats()["entries"] == 0
+    store.close()
+
+
+def test_cache_store_tracks_rows_without_recounting(tmp_path):
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path, max_entries=3)
+    store.put("a", 1)
+    store.put("a", 2)  # reemplazo: no suma
+    store.put_many([("b", 1), ("c", 1), ("b", 2)])
+    assert store._rows == 3
+    store.put("d", 1)
+    assert store._rows == 3 and store.get("a") is None
+    assert store.stats()["entries"] == 3
+    store.close()
+
+
+def test_cache_store_close_is_idempotent_and_covers_other_threads(tmp_path):
+    import sqlite3
+    import threading
+
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put("k", 1)
+    worker = threading.Thread(target=lambda: store.get("k"))  # deja su conexión en ``_tls``
+    worker.start()
+    worker.join()
+    store.close()
+    store.close()
+
+    errors = []
+
+    def _late_get():
+        try:
+            store.get("otra")
+        except sqlite3.ProgrammingError as e:
+            errors.append(str(e))
+
+    worker = threading.Thread(target=_late_get)
+    worker.start()
+    worker.join()
+    assert errors == ["CacheStore cerrado"]
+
+
+def test_cache_store_failed_snapshot_keeps_matrix(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    from agentlow import persistent_cache
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put("k1", "uno", embedding=[1.0, 0.0])
+    store.flush()
+    assert store._emb_matrix is not None
+
+    def _locked(src, dst):
+        raise PermissionError("archivo mapeado")
+
+    monkeypatch.setattr(persistent_cache.os, "replace", _locked)
+    with store._lock, store._emb_lock():
+        assert store._write_snapshot_locked() is False
+    assert store._emb_matrix is not None and store._emb_matrix.shape == (1, 2)
+    assert store.get_similar([1.0, 0.0]) == "uno"
+    store.close()
+
+
+def test_cache_store_similar_survives_restart(tmp_path):
+    pytest.importorskip("numpy")
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put("k1", "uno", embedding=[1.0, 0.0], scope="s")
+    store.put("k2", "dos", embedding=[0.0, 1.0], scope="s")
+    assert store.get_similar([0.99, 0.05], scope="s") == "uno"
+    store.close()
+
+    reopened = CacheStore(tmp_path)
+    assert reopened._emb_matrix is not None
+    assert reopened.get_similar([0.05, 0.99], scope="s") == "dos"
+    assert reopened.get_similar([0.05, 0.99], scope="otro") is None
+    reopened.close()
+
+
+def test_agent_persistent_cache_reused_by_new_agent(tmp_path, monkeypatch):
+    calls = []
+
+    def _fake_post_json(url, body, timeout):
+        calls.append(url)
+        return {"message": {"content": "respuesta"}}
+
+    monkeypatch.setattr("agentlow.agent.post_json", _fake_post_json)
+    msgs = [{"role": "user", "content": "hola"}]
+    first = OllamaAgent(work_dir=str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    first._call_ollama(msgs)
+    first.close()
+
+    second = OllamaAgent(work_dir=str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    assert second._call_ollama(msgs) == {"message": {"content": "respuesta"}}
+    assert len(calls) == 1
+    second.close()
+
+
+def test_cache_store_appends_embeddings_across_flushes(tmp_path):
+    pytest.importorskip("numpy")
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put("k1", "uno", embedding=[3.0, 4.0])
+    store.flush()
+    store.put("k2", "dos", embedding=[0.0, 2.0])
+    store.close()
+
+    reopened = CacheStore(tmp_path)
+    assert reopened._emb_matrix.shape == (2, 2)
+    assert reopened._emb_matrix[0].tolist() == pytest.approx([0.6, 0.8])
+    assert reopened.get_similar([0.0, 1.0]) == "dos"
+    reopened.close()
+
+
+def test_cache_store_put_many_and_lazy_expiry(tmp_path, monkeypatch):
+    from agentlow import persistent_cache
+    from agentlow.persistent_cache import CacheStore
+
+    now = [1000.0]
+    monkeypatch.setattr(persistent_cache.time, "time", lambda: now[0])
+    store = CacheStore(tmp_path, ttl_seconds=10)
+    store.put_many([("a", 1), ("b", {"x": 2})])
+    assert store.get("b") == {"x": 2}
+
+    now[0] += 60
+    assert store.get("a") is None
+    assert store._pending_deletes == {"a"}
+    assert store.stats()["entries"] == 1 and not store._pending_deletes
+    store.close()
+
+
+def test_cache_store_concurrent_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path)
+
+    def _work(i):
+        store.put(f"k{i}", i)
+        return store.get(f"k{i}")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(_work, range(40))) == list(range(40))
+    assert store.stats()["entries"] == 40
+    store.close()
+
+
+def test_cache_store_memory_tier_is_lru(tmp_path):
+    from agentlow.persistent_cache import CacheStore
+
+    store = CacheStore(tmp_path, memory_entries=2)
+    store.put_many([("a", 1), ("b", 2), ("c", 3)])
+    assert list(store._mem) == ["b", "c"]
+
+    assert store.get("a") == 1  # desde SQLite; entra en memoria y expulsa a "b"
+    assert list(store._mem) == ["c", "a"]
+    assert store.stats()["memory"] == 2
+    store.close()
+
+
+def test_cache_store_checkpoint_truncates_wal(tmp_path):
+    from agentlow.persistent_cache import DB_NAME, CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put_many([(f"k{i}", {"v": "x" * 100}) for i in range(50)])
+    wal = tmp_path / (DB_NAME + "-wal")
+    assert wal.stat().st_size > 0
+    store.checkpoint()
+    assert wal.stat().st_size == 0
+    assert store.get("k7") == {"v": "x" * 100}
+    store.close()
+
+
+def test_cache_store_embeddings_two_writers_same_dir(tmp_path):
+    pytest.importorskip("numpy")
+    from agentlow.persistent_cache import CacheStore
+
+    a = CacheStore(tmp_path)
+    b = CacheStore(tmp_path)  # como otro proceso sobre el mismo directorio
+    a.put("ka", "de a", embedding=[1.0, 0.0, 0.0])
+    b.put("kb", "de b", embedding=[0.0, 1.0, 0.0])
+    a.flush()
+    b.flush()
+    a.put("ka2", "de a 2", embedding=[0.0, 0.0, 1.0])
+    a.close()
+    b.close()
+
+    reopened = CacheStore(tmp_path)
+    assert reopened._emb_matrix.shape == (3, 3)
+    assert reopened.get_similar([1.0, 0.0, 0.0]) == "de a"
+    assert reopened.get_similar([0.0, 1.0, 0.0]) == "de b"
+    assert reopened.get_similar([0.0, 0.0, 1.0]) == "de a 2"
+    reopened.close()
+
+
+def test_cache_store_reput_and_eviction_compact_embeddings(tmp_path, monkeypatch):
+    pytest.importorskip("numpy")
+    from agentlow import persistent_cache
+    from agentlow.persistent_cache import EMB_NAME, CacheStore
+
+    monkeypatch.setattr(persistent_cache, "COMPACT_MIN_DEAD", 2)
+    store = CacheStore(tmp_path, max_entries=3)
+    store.put("k", "viejo", embedding=[1.0, 0.0])
+    store.flush()
+    store.put("k", "nuevo", embedding=[0.0, 1.0])
+    assert store.get_similar([1.0, 0.0]) is None  # la fila antigua ya no cuenta
+    assert store.get_similar([0.0, 1.0]) == "nuevo"
+
+    for i in range(6):
+        store.put(f"e{i}", i, embedding=[1.0, float(i)])
+        store.flush()
+    assert store.stats()["embeddings"] == 3
+    assert (tmp_path / EMB_NAME).stat().st_size <= 2 * 3 * 4 * 2  # compactado: no crece sin límite
+    store.close()
+
+    reopened = CacheStore(tmp_path)
+    assert reopened.get_similar([1.0, 5.0]) == 5
+    assert reopened.get("k") is None and reopened.stats()["embeddings"] == 3
+    reopened.close()
+
+
+def test_cache_store_embeddings_rebuild_on_mismatch(tmp_path):
+    pytest.importorskip("numpy")
+    from agentlow.persistent_cache import EMB_NAME, CacheStore
+
+    store = CacheStore(tmp_path)
+    store.put("k1", "uno", embedding=[1.0, 0.0])
+    store.put("k2", "dos", embedding=[0.0, 1.0])
+    store.close()
+    emb = tmp_path / EMB_NAME
+
+    with open(emb, "ab") as f:  # cola de un volcado interrumpido: se ignora
+        f.write(b"\x00" * 12)
+    reopened = CacheStore(tmp_path)
+    assert reopened._emb_matrix.shape == (2, 2)
+    assert reopened.get_similar([0.0, 1.0]) == "dos"
+    reopened.close()
+
+    emb.write_bytes(emb.read_bytes()[:8])  # archivo corto: se reconstruye desde SQLite
+    rebuilt = CacheStore(tmp_path)
+    assert rebuilt._emb_matrix.shape == (2, 2)
+    assert rebuilt.get_similar([1.0, 0.0]) == "uno"
+    assert rebuilt.get_similar([0.0, 1.0]) == "dos"
+    rebuilt.close()
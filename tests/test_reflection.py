@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+import pytest
+
+from agentlow.reflection import _extract_first_json_object, _reflection_from_response
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1}', '{"a": 1}'),
+        ('```json\n{"a": 1}\n```', '{"a": 1}'),
+        ('Claro: {"a": {"b": 2}} y más {"c": 3}', '{"a": {"b": 2}}'),
+        ('x {"s": "llave } dentro", "t": "esc \\" }"} y', '{"s": "llave } dentro", "t": "esc \\" }"}'),
+        ('{"ñ": "año"} fin', '{"ñ": "año"}'),
+        ("sin json", None),
+        ('{"abierto": 1', None),
+    ],
+)
+def test_extract_first_json_object(text, expected):
+    assert _extract_first_json_object(text) == expected
+
+
+def test_reflection_from_response_smart_quotes():
+    content = "Resultado: {“success”: true, “analysis”: “ok”, “peanuts_earned”: 1, “next_action”: “finalize”}"
+    refl = _reflection_from_response({"message": {"content": content}}, {"content": "x"})
+    assert refl.success is True
+    assert refl.analysis == "ok"
+
+
+def test_reflection_from_response_invalid_schema_falls_back():
+    content = '{"success": true, "analysis": "", "peanuts_earned": 5, "next_action": "finalize"}'
+    refl = _reflection_from_response({"message": {"content": content}}, {"error": "boom"})
+    assert refl.success is False
+    assert refl.next_action == "retry"
+
+
+def test_areflect_on_results_bounded_and_ordered(monkeypatch):
+    from agentlow import reflection
+
+    state = {"active": 0, "peak": 0}
+
+    async def _fake(tool_name, user_input, tool_output, **kwargs):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return reflection._heuristic_reflection(tool_output)
+
+    monkeypatch.setattr(reflection, "areflect_on_result", _fake)
+    monkeypatch.setenv("OLLAMA_NUM_PARALLEL", "2")
+    items = [("read_file", "t", {"error": "x"} if i % 2 else {"content": "ok"}) for i in range(6)]
+
+    out = asyncio.run(reflection.areflect_on_results(items))
+    assert [r.success for r in out] == [True, False, True, False, True, False]
+    assert state["peak"] == 2
+
+
+def test_reflect_on_result_stream_stops_at_closing_brace(monkeypatch):
+    from agentlow import reflection
+
+    reply = ['{"success": true, ', '"analysis": "ok", "peanuts_earned": 1, ', '"next_action": "finalize"}', "\\n\\nNota: ", "relleno"]
+    consumed = []
+
+    def _fake_lines(url, body, timeout):
+        assert json.loads(body)["stream"] is True
+        for i, part in enumerate(reply):
+            consumed.append(i)
+            yield json.dumps({"message": {"content": part}, "done": i == len(reply) - 1}).encode()
+
+    monkeypatch.setattr(reflection, "post_json_lines", _fake_lines)
+    refl = reflection.reflect_on_result("shell", "t", {"content": "x"})
+    assert refl.success is True and refl.analysis == "ok"
+    assert consumed == [0, 1, 2]
+
+
+def test_reflect_on_result_stream_skips_invalid_braces(monkeypatch):
+    from agentlow import reflection
+
+    # Un {...} balanceado que no es una reflexión no debe cortar el stream
+    reply = ['Nota {"x": 1} ', '{"success": false, "analysis": "mal", ', '"peanuts_earned": 0, "next_action": "retry"}', "relleno"]
+    consumed = []
+
+    def _fake_lines(url, body, timeout):
+        for i, part in enumerate(reply):
+            consumed.append(i)
+            yield json.dumps({"message": {"content": part}, "done": i == len(reply) - 1}).encode()
+
+    monkeypatch.setattr(reflection, "post_json_lines", _fake_lines)
+    refl = reflection.reflect_on_result("shell", "t", {"content": "x"})
+    assert refl.success is False and refl.analysis == "mal"
+    assert consumed == [0, 1, 2]
+
+
+def test_truncate_for_audit_bounds_large_outputs():
+    from agentlow.reflection import _audit_text, _truncate_for_audit
+
+    big = {"success": True, "stdout": "x" * 100_000, "lines": ["y" * 50] * 10_000, "returncode": 0}
+    small = _truncate_for_audit(big, 1000)
+    assert small["success"] is True
+    assert len(small["stdout"]) < 1100 and small["stdout"].endswith("…(truncado)")
+    assert len(_audit_text(big, 1000)) <= 1000 + len("…(truncado)")
+
+    # Lo que cabe en el presupuesto no se toca
+    assert _truncate_for_audit({"a": [1, "b", None]}, 1000) == {"a": [1, "b", None]}
+
+
+@pytest.mark.parametrize(
+    "output, success",
+    [
+        ({"stdout": "Traceback (most recent call last)"}, False),
+        ({"stderr": "IndexError: list index out of range"}, False),
+        ({"content": "todo bien"}, True),
+        ({"stdout": "ok", "returncode": 2}, False),
+        ({"returncode": 0, "stdout": "x" * 7000 + "\nTraceback (most recent call last):"}, False),
+    ],
+)
+def test_heuristic_reflection(output, success):
+    from agentlow.reflection import _heuristic_reflection
+
+    assert _heuristic_reflection(output).success is success
+
+
+def test_json_scan_numba_matches_python():
+    pytest.importorskip("numba")
+    import numpy as np
+
+    from agentlow._json_scan import _find_span_nb, _find_span_py
+
+    text = ('ruido "con {llaves}" ' * 300 + '{"a": "x\\" }", "b": {"c": 1}} cola').encode()
+    start, end = _find_span_nb(np.frombuffer(text, dtype=np.uint8))
+    assert (start, end) == _find_span_py(text)
+
+
+def test_warmup_is_lazy_and_runs_once(monkeypatch):
+    from agentlow import reflection
+
+    monkeypatch.setattr(reflection, "_WARMED", False)  # importar el módulo no calienta nada
+    calls = []
+    monkeypatch.setattr(reflection, "_warmup_json_scan", lambda: calls.append(1))
+    monkeypatch.delenv("AGENTLOW_SKIP_WARMUP", raising=False)
+    reflection._warmup()
+    reflection._warmup()
+    assert calls == [1]
@@ -0,0 +1,215 @@
+import json
+
+import pytest
+
+import reflection
+
+_schema_probe = reflection._schema_format_supported  # el fixture lo sustituye en cada test
+
+VALID = {"success": True, "analysis": "ok", "peanuts_earned": 1, "next_action": "finalize"}
+
+
+def _ndjson(parts, done_at_end=True):
+    lines = [json.dumps({"message": {"content": p}, "done": False}).encode() for p in parts]
+    if done_at_end:
+        lines.append(json.dumps({"message": {"content": ""}, "done": True}).encode())
+    return lines
+
+
+class _FakeResponse:
+    def __init__(self, lines, consumed):
+        self._lines = lines
+        self._consumed = consumed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        for i, line in enumerate(self._lines):
+            self._consumed.append(i)
+            yield line
+
+
+class _FakeSession:
+    def __init__(self, lines):
+        self.lines = lines
+        self.consumed = []
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        self.posts.append(json)
+        return _FakeResponse(self.lines, self.consumed)
+
+
+@pytest.fixture(autouse=True)
+def _reset(monkeypatch):
+    monkeypatch.delenv("PEANUT_REFLECTION_CACHE", raising=False)
+    monkeypatch.setattr(reflection, "_OLLAMA_DOWN_UNTIL", 0.0)
+    monkeypatch.setattr(reflection, "_schema_format_supported", lambda host: False)
+
+
+def test_ollama_chat_skips_invalid_candidate_and_keeps_reading(monkeypatch):
+    parts = ['Borrador {"nota": 1} y luego ', json.dumps(VALID), " cola", " que no se lee"]
+    session = _FakeSession(_ndjson(parts))
+    monkeypatch.setattr(reflection, "_session", lambda: session)
+
+    raw = reflection._ollama_chat([], model="m", host="h", timeout_s=1)
+    assert json.loads(raw) == VALID
+    assert session.consumed == [0, 1]  # corta en cuanto un candidato valida
+
+
+@pytest.mark.parametrize(
+    "parts",
+    [
+        ['{"success": true, "analysis": "llave } y \\', '" dentro", ', '"peanuts_earned": 1, "next_action": "finalize"}'],
+        ["{", '"success": true, "analysis": "{{{"', ', "peanuts_earned": 1', ', "next_action": "finalize"', "}"],
+        ['texto {"success": true, "analysis": "a\\\\', '", "peanuts_earned": 1, "next_action": "finalize"} fin'],
+    ],
+)
+def test_scanner_handles_chunk_boundaries(parts):
+    scanner = reflection._JsonObjectScanner()
+    found = [reflection._next_valid_object(scanner, p) for p in parts]
+    assert found[:-1] == [None] * (len(parts) - 1)
+    assert reflection._validate_json_text(found[-1]) is not None
+    assert reflection._extract_first_json_object("".join(parts)) == found[-1]
+
+
+def test_connection_error_short_circuits_for_ttl(monkeypatch):
+    calls = []
+
+    class _DownSession:
+        def post(self, *a, **kw):
+            calls.append(1)
+            raise reflection.requests.ConnectionError("refused")
+
+    now = [100.0]
+    monkeypatch.setattr(reflection, "_session", lambda: _DownSession())
+    monkeypatch.setattr(reflection.time, "monotonic", lambda: now[0])
+
+    first = reflection.reflect_on_result("shell", "ls", "ok")
+    second = reflection.reflect_on_result("shell", "ls", "ok")
+    assert first.next_action == second.next_action == "finalize" and not first.success
+    assert len(calls) == 1
+
+    now[0] += reflection.OLLAMA_DOWN_TTL_S + 1
+    reflection.reflect_on_result("shell", "ls", "ok")
+    assert len(calls) == 2
+
+
+def test_schema_format_probe_failure_cached_for_ttl(monkeypatch):
+    monkeypatch.setattr(reflection, "_SCHEMA_SUPPORT", {})
+    monkeypatch.setattr(reflection, "_SCHEMA_PROBE_RETRY_AT", {})
+    now = [100.0]
+    monkeypatch.setattr(reflection.time, "monotonic", lambda: now[0])
+    gets = []
+
+    class _Resp:
+        def __init__(self, version):
+            self.version = version
+
+        def raise_for_status(self):
+            if self.version is None:
+                raise reflection.requests.HTTPError("404")
+
+        def json(self):
+            return {"version": self.version}
+
+    versions = [None, "0.5.4-rc1", "0.1.0"]
+
+    class _Session:
+        def get(self, url, timeout=None):
+            gets.append(url)
+            return _Resp(versions[len(gets) - 1])
+
+    monkeypatch.setattr(reflection, "_session", lambda: _Session())
+    assert _schema_probe("h") is False
+    assert _schema_probe("h") is False  # fallo reciente: sin otro GET
+    assert len(gets) == 1
+
+    now[0] += reflection.OLLAMA_DOWN_TTL_S + 1
+    assert _schema_probe("h") is True
+    assert _schema_probe("h") is True
+    assert len(gets) == 2
+
+    msgs = [{"role": "system", "content": "largo"}, {"role": "user", "content": "u"}]
+    assert reflection._request_format(msgs, False) == (msgs, "json")
+    short, fmt = reflection._request_format(msgs, True)
+    assert fmt is reflection._SCHEMA and short[0]["content"] == reflection._SHORT_SYSTEM_PROMPT and short[1] is msgs[1]
+
+
+def test_reflection_cache_is_opt_in_and_reused(monkeypatch, tmp_path):
+    session = _FakeSession(_ndjson([json.dumps(VALID)]))
+    monkeypatch.setattr(reflection, "_session", lambda: session)
+    monkeypatch.setattr(reflection, "_STORE", None)
+
+    reflection.reflect_on_result("read_file", "x", "contenido")
+    reflection.reflect_on_result("read_file", "x", "contenido")
+    assert len(session.posts) == 2  # sin PEANUT_REFLECTION_CACHE no hay caché
+
+    monkeypatch.setenv("PEANUT_REFLECTION_CACHE", "1")
+    monkeypatch.setenv("PEANUT_CACHE_DIR", str(tmp_path))
+    first = reflection.reflect_on_result("read_file", "x", "contenido")
+    second = reflection.reflect_on_result("read_file", "x", "contenido")
+    assert first == second and first.success
+    assert len(session.posts) == 3
+    reflection._STORE.close()
+
+
+def test_batch_keeps_item_order(monkeypatch):
+    def _fake(tool_name, user_input, tool_output):
+        return reflection._ollama_unavailable(tool_output)
+
+    monkeypatch.setattr(reflection, "reflect_on_result", _fake)
+    items = [("t", "u", f"r{i}") for i in range(7)]
+    out = reflection.reflect_on_results_batch(items, max_batch_size=3)
+    assert [r.analysis.split("(")[1].split(")")[0] for r in out] == [f"r{i}" for i in range(7)]
+    assert reflection.reflect_on_results_batch([]) == []
+
+
+def test_reflect_on_result_async_streams_over_shared_client(monkeypatch):
+    import asyncio
+
+    import httpx
+
+    bodies, hosts = [], []
+
+    def _handler(request):
+        bodies.append(json.loads(request.content))
+        assert request.url.path == "/api/chat"
+        fail = {"success": False, "analysis": "vacío", "peanuts_earned": 0, "next_action": "retry"}
+        return httpx.Response(200, content=b"\n".join(_ndjson(["ruido ", json.dumps(fail)])))
+
+    async def _run():
+        from agentlow import _http
+
+        client = httpx.AsyncClient(base_url="http://ollama.test", transport=httpx.MockTransport(_handler))
+        monkeypatch.setattr(_http, "get_async_client", lambda base_url: hosts.append(base_url) or client)
+        try:
+            return await reflection.reflect_on_results_batch_async(
+                [("shell", "ls -la", ""), ("shell", "pwd", "")], max_batch_size=2
+            )
+        finally:
+            await client.aclose()
+
+    out = asyncio.run(_run())
+    assert [r.improved_input for r in out] == ["ls -la", "pwd"]
+    assert all(not r.success and r.next_action == "retry" for r in out)
+    assert all(b["stream"] is True and b["format"] == "json" for b in bodies)
+    assert hosts == [reflection._cfg().host] * 2
+
+
+def test_default_batch_size_matches_agentlow(monkeypatch):
+    from agentlow.reflection import _ollama_num_parallel
+
+    for value in (None, "3", "x"):
+        if value is None:
+            monkeypatch.delenv("OLLAMA_NUM_PARALLEL", raising=False)
+        else:
+            monkeypatch.setenv("OLLAMA_NUM_PARALLEL", value)
+        assert reflection._default_batch_size() == _ollama_num_parallel()
@@ -0,0 +1,180 @@
+import pytest
+
+from agentlow.tools import ToolExecutor
+
+
+@pytest.fixture
+def executor(tmp_path):
+    return ToolExecutor(work_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
+        "rm -rf x",
+        "ls;rm x",
+        "ls && /bin/rm -rf /",
+        "echo `rm x`",
+        "ls $(rm x)",
+        "cat a >> b",
+        "ls | sudo tee x",
+        'r"m" x',
+    ],
+)
+def test_shell_blocks_forbidden_tokens(executor, cmd):
+    assert "prohibido" in executor.execute_tool("shell", {"cmd": cmd})["error"]
+
+
+@pytest.mark.parametrize("cmd", ["echo inform", "echo format_check", 'echo "a > b"'])
+def test_shell_allows_forbidden_words_as_substrings(executor, cmd):
+    assert executor.execute_tool("shell", {"cmd": cmd})["success"]
+
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
+        "python -c \"import os; os.system('rm -rf x')\"",
+        "python3 -Bc 'print(1)'",
+        "node -e 'require(\"fs\").rmSync(\"x\")'",
+        "node --eval=1",
+        "env FOO=1 python -c 'print(1)'",
+    ],
+)
+def test_shell_blocks_interpreter_inline_code(executor, cmd):
+    assert "prohibido" in executor.execute_tool("shell", {"cmd": cmd})["error"]
+
+
+@pytest.mark.parametrize("cmd", ["python script.py -c x", "python -m pytest -c setup.cfg", "node app.js -e", "python -V"])
+def test_shell_allows_interpreter_scripts(executor, cmd):
+    assert executor._parse_cmd(cmd)[1] is None
+
+
+def test_shell_rejects_unbalanced_quotes(executor):
+    assert "inválido" in executor.execute_tool("shell", {"cmd": 'echo "abc'})["error"]
+
+
+@pytest.mark.parametrize(
+    "tool, args",
+    [
+        ("read_file", {"path": "../fuera.txt"}),
+        ("read_file", {"path": "/etc/passwd"}),
+        ("read_file", {"path": "sub/../../fuera.txt"}),
+        ("write_file", {"path": "../../fuera.txt", "content": "x"}),
+        ("list_directory", {"path": "../.."}),
+    ],
+)
+def test_paths_outside_work_dir_are_rejected(executor, tool, args):
+    assert "fuera del directorio" in executor.execute_tool(tool, args)["error"]
+
+
+def test_symlink_escape_is_rejected(executor, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "secret.txt").write_text("x")
+    (executor.work_dir / "link").symlink_to(outside)
+    assert "fuera del directorio" in executor.execute_tool("read_file", {"path": "link/secret.txt"})["error"]
+
+
+def test_symlink_swapped_after_first_check_is_rejected(executor, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "secret.txt").write_text("fuera")
+    inside = executor.work_dir / "real"
+    inside.mkdir()
+    (inside / "secret.txt").write_text("dentro")
+    link = executor.work_dir / "link"
+    link.symlink_to(inside)
+    assert executor.execute_tool("read_file", {"path": "link/secret.txt"})["content"] == "dentro"
+
+    # Misma ruta relativa, destino distinto: la comprobación debe repetirse
+    link.unlink()
+    link.symlink_to(outside)
+    assert "fuera del directorio" in executor.execute_tool("read_file", {"path": "link/secret.txt"})["error"]
+
+
+def test_unknown_tool(executor):
+    assert executor.execute_tool("nope", {}) == {"error": "Herramienta desconocida: nope"}
+
+
+def test_batch_shell_preserves_order_and_validates_each(executor):
+    out = executor.execute_tool("batch_shell", {"cmds": ["echo uno", "rm -rf x", "echo dos"]})
+    results = out["results"]
+    assert [r["cmd"] for r in results] == ["echo uno", "rm -rf x", "echo dos"]
+    assert results[0]["stdout"].strip() == "uno" and results[2]["stdout"].strip() == "dos"
+    assert "prohibido" in results[1]["error"]
+    assert out["success"] is False
+
+
+def test_batch_shell_requires_list(executor):
+    assert "error" in executor.execute_tool("batch_shell", {"cmds": "ls"})
+
+
+def test_read_file_counts_lines_and_caps_size(executor, tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_text("uno\ndos\ntres", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("uno\n", encoding="utf-8")
+    assert executor.execute_tool("read_file", {"path": "a.txt"})["lines"] == 3
+    assert executor.execute_tool("read_file", {"path": "b.txt"})["lines"] == 1
+
+    monkeypatch.setattr("agentlow.tools.MAX_READ_BYTES", 8)
+    assert "error" in executor.execute_tool("read_file", {"path": "a.txt"})
+
+
+def test_shell_runs_without_shell(executor):
+    assert "no soportados" in executor.execute_tool("shell", {"cmd": "ls | grep x"})["error"]
+    assert executor.execute_tool("shell", {"cmd": "echo $HOME"})["stdout"] == "$HOME\n"
+
+
+def test_git_commit_message_is_not_interpreted(executor, tmp_path):
+    import shutil
+    import subprocess
+
+    if shutil.which("git") is None:
+        pytest.skip("git no disponible")
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / "f.txt").write_text("x", encoding="utf-8")
+    assert executor.execute_tool("git", {"action": "add", "files": "f.txt"})["success"]
+
+    # Con shell=True las comillas cerraban el argumento y $(...) se ejecutaba
+    executor.execute_tool("git", {"action": "commit", "message": 'msg "con comillas" $(touch pwned)'})
+    assert not (tmp_path / "pwned").exists()
+
+
+def test_http_request_caps_streamed_body(executor, monkeypatch):
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b'{"ok": true}' if self.path == "/json" else b"x" * 4096
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    # poll_interval corto: shutdown() no espera el sondeo de 0.5 s por defecto
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        monkeypatch.setattr("agentlow.tools.MAX_RESPONSE_BYTES", 1024)
+        out = executor.execute_tool("http_request", {"url": base + "/json"})
+        assert out["body"] == {"ok": True}
+        assert set(out["headers"]) == {"content-length"}
+        full = executor.execute_tool("http_request", {"url": base + "/json", "return_headers": True})
+        assert "Server" in full["headers"]
+        assert "demasiado grande" in executor.execute_tool("http_request", {"url": base + "/big"})["error"]
+    finally:
+        server.shutdown()
+
+
+def test_shell_fastpath_matches_subprocess(executor, tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_text("uno\ndos\n", encoding="utf-8")
+    cmds = ["pwd", "echo hola  mundo", "cat a.txt", "cat a.txt falta.txt"]
+    fast = [executor.execute_tool("shell", {"cmd": c}) for c in cmds]
+
+    monkeypatch.setattr("agentlow.tools._SHELL_FASTPATH", {})
+    slow = [executor.execute_tool("shell", {"cmd": c}) for c in cmds]
+    for f, s in zip(fast, slow):
+        assert (f["stdout"], f["success"]) == (s["stdout"], s["success"])
+    assert fast[3]["stderr"] and fast[3]["returncode"] == 1
@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+
+from agentlow.agent import OllamaAgent
+from agentlow.web_ui import build_app
+
+
+def test_index_etag_revalidation(tmp_path):
+    client = TestClient(build_app(OllamaAgent(work_dir=str(tmp_path))))
+    first = client.get("/")
+    assert first.status_code == 200 and "AgentLow" in first.text
+
+    again = client.get("/", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
@@ -0,0 +1,95 @@
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import web_ui
+
+
+class _FakeAgent:
+    def __init__(self, **kwargs):
+        self.peanuts = 7
+
+    def chat(self, msg, verbose=False, on_delta=None):
+        for piece in ("Ho", "la ", msg):
+            on_delta(piece)
+        return "Hola " + msg
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(web_ui, "OllamaAgent", _FakeAgent)
+    monkeypatch.setattr(web_ui, "sessions", {})
+    monkeypatch.setattr(web_ui, "_session_names", [])
+    monkeypatch.setattr(web_ui, "current_session", "main")
+    return TestClient(web_ui.app)
+
+
+def test_ws_frames_are_binary_json_in_order(client):
+    with client.websocket_connect("/ws/mi sesión") as ws:
+        assert orjson.loads(ws.receive_bytes()) == {"type": "sys", "message": "Sesión activa: mi-sesi-n"}
+
+        ws.send_text(orjson.dumps({"message": "mundo"}).decode())
+        frames = [orjson.loads(ws.receive_bytes()) for _ in range(4)]
+        assert frames == [
+            {"type": "chunk", "delta": "Ho"},
+            {"type": "chunk", "delta": "la "},
+            {"type": "chunk", "delta": "mundo"},
+            {"type": "reply", "reply": "Hola mundo", "peanuts": 7},
+        ]
+
+        ws.send_text("texto plano")  # no JSON: se usa tal cual
+        frames = [orjson.loads(ws.receive_bytes()) for _ in range(4)]
+        assert frames[-1] == {"type": "reply", "reply": "Hola texto plano", "peanuts": 7}
+
+    assert client.get("/api/sessions").json() == {"sessions": ["mi-sesi-n"], "current": "mi-sesi-n"}
+
+
+
+class _ScriptedSocket:
+    """WebSocket mínimo para ejecutar ``ws_chat`` en un solo event loop (como en uvicorn)."""
+
+    def __init__(self, messages):
+        self.incoming = list(messages)
+        self.frames = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        if not self.incoming:
+            raise web_ui.WebSocketDisconnect()
+        return self.incoming.pop(0)
+
+    async def send_bytes(self, data):
+        self.frames.append(orjson.loads(data))
+
+
+def test_ws_turns_on_one_session_are_serialized(client, monkeypatch):
+    import asyncio
+    import threading
+    import time
+
+    state = {"active": 0, "peak": 0}
+    guard = threading.Lock()
+
+    def _slow_chat(self, msg, verbose=False, on_delta=None):
+        with guard:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        on_delta(msg)
+        with guard:
+            state["active"] -= 1
+        return msg
+
+    monkeypatch.setattr(_FakeAgent, "chat", _slow_chat)
+    a = _ScriptedSocket(["uno", "tres"])
+    b = _ScriptedSocket(["dos"])
+
+    async def _both():
+        await asyncio.gather(web_ui.ws_chat(a, "s"), web_ui.ws_chat(b, "s"))
+
+    asyncio.run(_both())
+    assert [f["reply"] for f in a.frames if f["type"] == "reply"] == ["uno", "tres"]
+    assert [f["reply"] for f in b.frames if f["type"] == "reply"] == ["dos"]
+    assert state["peak"] == 1
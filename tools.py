@@ -2,6 +2,7 @@
 Herramientas para el agente con allowlist de seguridad
 """
 import os
+import re
 import subprocess
 import json
 import requests
@@ -9,35 +10,54 @@ from pathlib import Path
 from typing import Dict, Any, List
 
 
+# ALLOWLIST DE COMANDOS SHELL (seguridad)
+_ALLOWED_COMMANDS = frozenset({
+    # Lectura
+    'ls', 'cat', 'head', 'tail', 'grep', 'find', 'pwd', 'whoami',
+    'df', 'du', 'wc', 'file', 'stat', 'tree', 'less', 'more',
+    # Navegación
+    'cd',
+    # Python/Node
+    'python3', 'python', 'pip', 'node', 'npm', 'npx',
+    # Git (se valida aparte)
+    'git',
+    # Docker (se valida aparte)
+    'docker', 'docker-compose',
+    # Otros seguros
+    'curl', 'wget', 'ping', 'which', 'echo', 'env', 'printenv'
+})
+
+# COMANDOS PROHIBIDOS (nunca permitir)
+_FORBIDDEN_COMMANDS = frozenset({
+    'rm', 'rmdir', 'dd', 'mkfs', 'fdisk', 'format',
+    'kill', 'killall', 'shutdown', 'reboot', 'halt',
+    '>', '>>', 'sudo', 'su', 'chmod', 'chown'
+})
+
+
+def _forbidden_re(commands) -> "re.Pattern[str]":
+    """Alternancia compilada de las subcadenas prohibidas"""
+    # Una sola pasada en vez de un ``in`` por patrón; la más larga primero para que
+    # la alternancia sea determinista.
+    return re.compile("|".join(map(re.escape, sorted(commands, key=len, reverse=True))))
+
+
+_GIT_ACTIONS = ("status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout")
+_DOCKER_ACTIONS = ("ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs")
+
+
 class ToolExecutor:
     """Ejecuta herramientas con validación de seguridad"""
     
     def __init__(self, work_dir: str = None):
         self.work_dir = Path(work_dir or os.getcwd())
         
-        # ALLOWLIST DE COMANDOS SHELL (seguridad)
-        self.allowed_commands = {
-            # Lectura
-            'ls', 'cat', 'head', 'tail', 'grep', 'find', 'pwd', 'whoami',
-            'df', 'du', 'wc', 'file', 'stat', 'tree', 'less', 'more',
-            # Navegación
-            'cd',
-            # Python/Node
-            'python3', 'python', 'pip', 'node', 'npm', 'npx',
-            # Git (se valida aparte)
-            'git',
-            # Docker (se valida aparte)
-            'docker', 'docker-compose',
-            # Otros seguros
-            'curl', 'wget', 'ping', 'which', 'echo', 'env', 'printenv'
-        }
-        
-        # COMANDOS PROHIBIDOS (nunca permitir)
-        self.forbidden_commands = {
-            'rm', 'rmdir', 'dd', 'mkfs', 'fdisk', 'format',
-            'kill', 'killall', 'shutdown', 'reboot', 'halt',
-            '>', '>>', 'sudo', 'su', 'chmod', 'chown'
-        }
+        # Conjuntos inmutables compartidos por todas las instancias (ver módulo)
+        self.allowed_commands = _ALLOWED_COMMANDS
+        self.forbidden_commands = _FORBIDDEN_COMMANDS
+        # Derivados de los conjuntos de esta instancia, calculados una vez
+        self._forbidden_re = _forbidden_re(self.forbidden_commands)
+        self._allowed_commands_str = ', '.join(sorted(self.allowed_commands))
     
     def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Ejecuta una herramienta y devuelve el resultado"""
@@ -72,12 +92,12 @@ class ToolExecutor:
         base_cmd = cmd.split()[0].split('|')[0].strip()
         
         # Verificar si está prohibido
-        if any(forbidden in cmd.lower() for forbidden in self.forbidden_commands):
+        if self._forbidden_re.search(cmd.lower()) is not None:
             return {"error": f"Comando prohibido detectado en: {cmd}"}
         
         # Verificar allowlist
         if base_cmd not in self.allowed_commands:
-            return {"error": f"Comando no permitido: {base_cmd}. Usa solo: {', '.join(sorted(self.allowed_commands))}"}
+            return {"error": f"Comando no permitido: {base_cmd}. Usa solo: {self._allowed_commands_str}"}
         
         try:
             result = subprocess.run(
@@ -247,7 +267,7 @@ class ToolExecutor:
         message = args.get("message", "")
         branch = args.get("branch", "")
         
-        allowed_actions = ["status", "log", "diff", "branch", "add", "commit", "push", "pull", "checkout"]
+        allowed_actions = _GIT_ACTIONS
         
         if action not in allowed_actions:
             return {"error": f"Acción git no permitida: {action}. Usa: {', '.join(allowed_actions)}"}
@@ -300,7 +320,7 @@ class ToolExecutor:
         action = args.get("action", "")
         service = args.get("service", "")
         
-        allowed_actions = ["ps", "logs", "compose_up", "compose_down", "compose_ps", "compose_logs"]
+        allowed_actions = _DOCKER_ACTIONS
         
         if action not in allowed_actions:
             return {"error": f"Acción docker no permitida: {action}. Usa: {', '.join(allowed_actions)}"}
@@ -501,3 +521,6 @@ TOOLS_SCHEMA = [
         }
     }
 ]
+
+# El esquema es estático: se codifica una vez y se envía tal cual en cada petición
+TOOLS_SCHEMA_JSON: bytes = json.dumps(TOOLS_SCHEMA, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
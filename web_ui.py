@@ -20,15 +20,19 @@ Notas:
 from __future__ import annotations
 
 import argparse
-import json
+import asyncio
+import bisect
+import importlib.util
 import os
 import re
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+import orjson
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel, Field
 
 from agent import OllamaAgent
@@ -37,6 +41,8 @@ from agent import OllamaAgent
 DEFAULT_PORT = int(os.getenv("PEANUT_WEB_PORT", "18889"))
 DEFAULT_HOST = os.getenv("PEANUT_WEB_HOST", "127.0.0.1")
 STATIC_INDEX = Path(__file__).parent / "web" / "index.html"
+INDEX_MAX_AGE_S = 60
+_MISSING_INDEX = b"<h1>Peanut Gateway</h1><p>Falta web/index.html</p>"
 
 
 class NewSessionRequest(BaseModel):
@@ -47,9 +53,20 @@ class ResetRequest(BaseModel):
     name: str = Field(..., min_length=1, max_length=40)
 
 
+_SANITIZE_RE = re.compile(r"[^a-zA-Z0-9_\-.]")
+_SANITIZE_KEEP = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-."
+# Tabla de 256 bytes: los permitidos se quedan, el resto pasa a "-"
+_SANITIZE_TABLE = bytes(b if b in _SANITIZE_KEEP else 0x2D for b in range(256))
+
+
 def _sanitize_name(name: str) -> str:
     name = name.strip()
-    name = re.sub(r"[^a-zA-Z0-9_\-\.]", "-", name)
+    if name.isascii():
+        # bytes.translate recorre en C sin motor de regex (caso habitual)
+        name = name.encode("ascii").translate(_SANITIZE_TABLE).decode("ascii")
+    else:
+        # Un carácter no ASCII ocupa varios bytes en UTF-8: se sustituye por un solo "-"
+        name = _SANITIZE_RE.sub("-", name)
     return name[:40] or "main"
 
 
@@ -57,12 +74,18 @@ def _sanitize_name(name: str) -> str:
 class Session:
     name: str
     agent: OllamaAgent
+    # Un turno a la vez por sesión: ``chat`` corre en un hilo y modifica ``agent.messages``
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
 
 
 app = FastAPI(title="Peanut Gateway PRO", version="0.1")
 
 sessions: Dict[str, Session] = {}
+# Nombres ya ordenados (inserción con bisect): /api/sessions no reordena en cada petición
+_session_names: List[str] = []
 current_session: str = "main"
+# (mtime_ns, etag, html) de web/index.html; se relee solo si cambia el mtime
+_index_cache: Optional[tuple] = None
 
 
 def get_or_create(name: str) -> Session:
@@ -76,22 +99,30 @@ def get_or_create(name: str) -> Session:
                 temperature=float(os.getenv("PEANUT_TEMP", "0.0")),
             ),
         )
+        bisect.insort(_session_names, name)
     current_session = name
     return sessions[name]
 
 
 @app.get("/")
-async def index() -> HTMLResponse:
-    if STATIC_INDEX.exists():
-        html = STATIC_INDEX.read_text(encoding="utf-8")
-    else:
-        html = "<h1>Peanut Gateway</h1><p>Falta web/index.html</p>"
-    return HTMLResponse(html)
+async def index(request: Request) -> Response:
+    global _index_cache
+    try:
+        mtime_ns = STATIC_INDEX.stat().st_mtime_ns
+    except FileNotFoundError:
+        return HTMLResponse(_MISSING_INDEX)
+    if _index_cache is None or _index_cache[0] != mtime_ns:
+        _index_cache = (mtime_ns, f'"{mtime_ns:x}"', STATIC_INDEX.read_bytes())
+    _, etag, html = _index_cache
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={INDEX_MAX_AGE_S}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(html, headers=headers)
 
 
 @app.get("/api/sessions")
 async def list_sessions() -> dict:
-    return {"sessions": sorted(sessions.keys()), "current": current_session}
+    return {"sessions": list(_session_names), "current": current_session}
 
 
 @app.post("/api/new")
@@ -104,7 +135,8 @@ async def new_session(req: NewSessionRequest) -> dict:
 async def reset_session(req: ResetRequest) -> dict:
     name = _sanitize_name(req.name)
     if name in sessions:
-        sessions[name].agent.reset()
+        async with sessions[name].lock:
+            sessions[name].agent.reset()
         return {"ok": True}
     return {"ok": False, "error": "Sesión no encontrada"}
 
@@ -114,13 +146,14 @@ async def ws_chat(websocket: WebSocket, session_name: str) -> None:
     await websocket.accept()
     sess = get_or_create(session_name)
 
-    await websocket.send_text(json.dumps({"type": "sys", "message": f"Sesión activa: {sess.name}"}, ensure_ascii=False))
+    # Frames binarios con el JSON UTF-8 que ya produce orjson (sin pasar por ``str``)
+    await websocket.send_bytes(orjson.dumps({"type": "sys", "message": f"Sesión activa: {sess.name}"}))
 
     try:
         while True:
             raw = await websocket.receive_text()
             try:
-                data = json.loads(raw)
+                data = orjson.loads(raw)
                 msg = str(data.get("message", "")).strip()
             except Exception:
                 msg = raw.strip()
@@ -128,13 +161,25 @@ async def ws_chat(websocket: WebSocket, session_name: str) -> None:
             if not msg:
                 continue
 
-            reply = sess.agent.chat(msg, verbose=False)
-            await websocket.send_text(
-                json.dumps(
-                    {"type": "reply", "reply": reply, "peanuts": sess.agent.peanuts},
-                    ensure_ascii=False,
-                )
-            )
+            # El agente hace HTTP bloqueante a Ollama: en un hilo, para no congelar el event loop.
+            # Los trozos de texto llegan por una cola y se reenvían en cuanto se generan.
+            # El lock de la sesión serializa turnos de varios sockets (o mensajes seguidos).
+            loop = asyncio.get_running_loop()
+            deltas: asyncio.Queue[Optional[str]] = asyncio.Queue()
+
+            def _on_delta(delta: str) -> None:
+                loop.call_soon_threadsafe(deltas.put_nowait, delta)
+
+            async with sess.lock:
+                task = asyncio.ensure_future(asyncio.to_thread(sess.agent.chat, msg, verbose=False, on_delta=_on_delta))
+                task.add_done_callback(lambda _: deltas.put_nowait(None))
+                try:
+                    while (delta := await deltas.get()) is not None:
+                        await websocket.send_bytes(orjson.dumps({"type": "chunk", "delta": delta}))
+                finally:
+                    # Si el cliente se va a mitad, el lock se mantiene hasta que el hilo acabe
+                    reply = await task
+            await websocket.send_bytes(orjson.dumps({"type": "reply", "reply": reply, "peanuts": sess.agent.peanuts}))
 
     except WebSocketDisconnect:
         return
@@ -144,11 +189,25 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="🥜 Peanut Gateway Web")
     parser.add_argument("--host", default=DEFAULT_HOST, help="Host a bindear (default: 127.0.0.1)")
     parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto (default: 18889)")
+    parser.add_argument("--no-access-log", action="store_true", help="No registrar cada petición HTTP")
     args = parser.parse_args()
 
     import uvicorn
 
-    uvicorn.run(app, host=str(args.host), port=int(args.port), reload=False, log_level="info")
+    # uvloop/httptools (extra ``fast``) son opcionales y no existen en todas las plataformas:
+    # si faltan, asyncio + h11
+    has_uvloop = sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None
+    has_httptools = importlib.util.find_spec("httptools") is not None
+    uvicorn.run(
+        app,
+        host=str(args.host),
+        port=int(args.port),
+        reload=False,
+        log_level="info",
+        loop="uvloop" if has_uvloop else "asyncio",
+        http="httptools" if has_httptools else "h11",
+        access_log=not args.no_access_log,
+    )
 
 
 if __name__ == "__main__":
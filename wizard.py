@@ -24,9 +24,12 @@ import argparse
 import os
 import platform
 import shutil
+import site
 import subprocess
 import sys
+import sysconfig
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Optional, Tuple
 
@@ -34,6 +37,8 @@ from typing import List, Optional, Tuple
 DEFAULT_OLLAMA_URL = "http://localhost:11434"
 STATE_DIR = Path.home() / ".peanut-agent"
 DEFAULT_WEB_PORT = 18889  # evita conflicto con OpenClaw (18789)
+RUN_OUTPUT_MAX_BYTES = 64 * 1024  # cola de salida que guarda _run
+MAX_PARALLEL_PULLS = 3  # descargas de modelos simultáneas como mucho
 
 ASCII_TITLE = r"""
  ____  _____    _    _   _ _   _ _____ 
@@ -57,8 +62,13 @@ def _force_utf8_console() -> None:
     if os.name != "nt":
         return
     try:
-        # Cambia codepage a UTF-8 (mejor para emojis y acentos)
-        os.system("chcp 65001 >NUL")
+        # Cambia codepage a UTF-8 (mejor para emojis y acentos): llamada directa a
+        # kernel32, sin lanzar cmd.exe para un ``chcp 65001``
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+        kernel32.SetConsoleOutputCP(65001)
+        kernel32.SetConsoleCP(65001)
     except Exception:
         pass
     try:
@@ -68,18 +78,31 @@ def _force_utf8_console() -> None:
         pass
 
 
-def _run(cmd: List[str], *, cwd: Optional[Path] = None) -> Tuple[int, str]:
-    """Ejecuta un comando y devuelve (returncode, stdout+stderr)."""
-    p = subprocess.run(
+def _run(cmd: List[str], *, cwd: Optional[Path] = None, max_bytes: int = RUN_OUTPUT_MAX_BYTES) -> Tuple[int, str]:
+    """Ejecuta un comando y devuelve (returncode, stdout+stderr).
+
+    La salida se lee como bytes y solo se conservan los últimos ``max_bytes``
+    (el progreso de ``ollama pull`` o pip puede ocupar MB); se decodifica una vez al final.
+    """
+    tail = bytearray()
+    truncated = False
+    with subprocess.Popen(
         cmd,
         cwd=str(cwd) if cwd else None,
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-    )
-    out = (p.stdout or "") + (p.stderr or "")
-    return p.returncode, out.strip()
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    ) as p:
+        assert p.stdout is not None
+        for chunk in iter(lambda: p.stdout.read1(65536), b""):
+            tail += chunk
+            if len(tail) > max_bytes:
+                del tail[:-max_bytes]
+                truncated = True
+        returncode = p.wait()
+    out = tail.decode("utf-8", errors="replace").strip()
+    if truncated:
+        out = "...[truncado]...\n" + out
+    return returncode, out
 
 
 def _is_venv() -> bool:
@@ -107,15 +130,51 @@ def _create_or_update_venv(project_root: Path, venv_dir: Path, requirements_path
         raise SystemExit(f"No encuentro el Python del venv: {vpy}")
 
     print("\n📦 Instalando dependencias… (pip)")
-    rc, out = _run([str(vpy), "-m", "pip", "install", "--upgrade", "pip"], cwd=project_root)
+    pip = [str(vpy), "-m", "pip", "install", "--disable-pip-version-check", "--no-input"]
+    # -U solo para pip: junto a ``-r`` actualizaría también cada requirement ya satisfecho
+    rc, out = _run(pip + ["--upgrade", "pip"], cwd=project_root)
     if rc != 0:
         raise SystemExit(f"Falló actualizar pip:\n{out}")
 
-    rc, out = _run([str(vpy), "-m", "pip", "install", "-r", str(requirements_path)], cwd=project_root)
+    rc, out = _run(pip + ["-r", str(requirements_path)], cwd=project_root)
     if rc != 0:
         raise SystemExit(f"Falló instalar dependencias:\n{out}")
 
 
+def _venv_python_version(venv_dir: Path) -> Optional[Tuple[int, int]]:
+    """(major, minor) declarado en ``pyvenv.cfg`` (clave ``version`` o ``version_info`` en uv)."""
+    try:
+        lines = (venv_dir / "pyvenv.cfg").read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep and key.strip() in ("version", "version_info"):
+            parts = value.strip().split(".")
+            if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+                return int(parts[0]), int(parts[1])
+    return None
+
+
+def _activate_venv_in_process(venv_dir: Path) -> bool:
+    """Añade el ``site-packages`` del venv a ``sys.path`` sin relanzar el intérprete.
+
+    Solo si el venv es de la misma versión de Python (misma ABI para extensiones C);
+    si no, devuelve False y el llamador recurre a ``_reexec_in_venv``.
+    """
+    if _venv_python_version(venv_dir) != sys.version_info[:2]:
+        return False
+    paths = sysconfig.get_paths(vars={"base": str(venv_dir), "platbase": str(venv_dir)})
+    dirs = [d for d in dict.fromkeys((paths["purelib"], paths["platlib"])) if Path(d).is_dir()]
+    if not dirs:
+        return False
+    for d in reversed(dirs):
+        site.addsitedir(d)  # procesa también los .pth (instalaciones editables)
+        sys.path.remove(d)
+        sys.path.insert(0, d)
+    return True
+
+
 def _reexec_in_venv(project_root: Path, venv_dir: Path, argv: List[str]) -> None:
     vpy = _venv_python(venv_dir)
     if not vpy.exists():
@@ -126,17 +185,32 @@ def _reexec_in_venv(project_root: Path, venv_dir: Path, argv: List[str]) -> None
     raise SystemExit(rc)
 
 
-def _ollama_reachable(requests_mod, url: str) -> bool:
+def _ollama_reachable(http, url: str) -> bool:
+    """``http``: ``requests.Session`` compartida (o el módulo ``requests``)."""
     try:
-        r = requests_mod.get(f"{url}/api/tags", timeout=2)
+        r = http.get(f"{url}/api/tags", timeout=2)
         return r.status_code == 200
     except Exception:
         return False
 
 
-def _try_start_ollama_server() -> Tuple[bool, str]:
-    """Intenta arrancar `ollama serve` en segundo plano (best-effort)."""
-    if shutil.which("ollama") is None:
+def _wait_for_ollama(http, url: str, timeout_s: float = 5.0, interval_s: float = 0.25) -> bool:
+    """Sondea hasta que el servidor responde (o se agota ``timeout_s``)."""
+    deadline = time.monotonic() + timeout_s
+    while True:
+        if _ollama_reachable(http, url):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval_s)
+
+
+def _try_start_ollama_server(ollama_bin: Optional[str]) -> Tuple[bool, str]:
+    """Intenta arrancar `ollama serve` en segundo plano (best-effort).
+
+    ``ollama_bin`` es la ruta ya resuelta con ``shutil.which`` (no se vuelve a buscar en PATH).
+    """
+    if ollama_bin is None:
         return False, "No encuentro `ollama` en PATH."
 
     try:
@@ -150,7 +224,7 @@ def _try_start_ollama_server() -> Tuple[bool, str]:
             CREATE_NEW_PROCESS_GROUP = 0x00000200
             kwargs["creationflags"] = DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
 
-        subprocess.Popen(["ollama", "serve"], **kwargs)  # noqa: S603,S607
+        subprocess.Popen([ollama_bin, "serve"], **kwargs)  # noqa: S603,S607
         return True, "Intento de arranque lanzado (ollama serve)."
     except FileNotFoundError:
         return False, "No encuentro el binario `ollama`."
@@ -174,8 +248,9 @@ def main() -> None:
     venv_dir = project_root / ".venv"
     requirements_path = project_root / "requirements.txt"
 
-    # Bootstrap: crear venv y re-ejecutar dentro
-    if not args._in_venv and not args.no_venv and not _is_venv():
+    # Bootstrap: crear venv y usarlo en este mismo proceso (re-ejecutar solo si cambia la versión de Python)
+    in_venv = _is_venv()
+    if not args._in_venv and not args.no_venv and not in_venv:
         if args.yes:
             create = True
         else:
@@ -184,8 +259,10 @@ def main() -> None:
 
         if create:
             _create_or_update_venv(project_root, venv_dir, requirements_path)
-            passthrough = [a for a in sys.argv[1:] if a != "--_in-venv"]
-            _reexec_in_venv(project_root, venv_dir, passthrough)
+            in_venv = _activate_venv_in_process(venv_dir)
+            if not in_venv:
+                passthrough = [a for a in sys.argv[1:] if a != "--_in-venv"]
+                _reexec_in_venv(project_root, venv_dir, passthrough)
 
     # UI completa (requiere deps)
     try:
@@ -210,7 +287,7 @@ def main() -> None:
     info.add_row("OS", f"{platform.system()} {platform.release()}")
     info.add_row("Python", sys.version.split()[0])
     info.add_row("Root", str(project_root))
-    info.add_row("Venv", "✅ .venv" if _is_venv() else "⚠️ sistema")
+    info.add_row("Venv", "✅ .venv" if in_venv or args._in_venv else "⚠️ sistema")
     info.add_row("State", str(STATE_DIR))
     info.add_row("Web Port", str(DEFAULT_WEB_PORT))
     console.print(info)
@@ -235,8 +312,15 @@ def main() -> None:
     # Ollama
     console.print("\n[bold]🧠 Ollama[/bold]")
     ollama_url = str(args.ollama_url).strip()
-    has_bin = shutil.which("ollama") is not None
-    reachable = _ollama_reachable(requests, ollama_url) if has_bin else False
+    # Una sesión para todos los sondeos: reutiliza la conexión (keep-alive)
+    http = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    http.headers.update({"User-Agent": "peanut-wizard"})
+    ollama_bin = shutil.which("ollama")
+    has_bin = ollama_bin is not None
+    reachable = _ollama_reachable(http, ollama_url) if has_bin else False
 
     t = Table(box=box.SIMPLE, show_header=True, header_style="bold")
     t.add_column("Chequeo")
@@ -262,10 +346,10 @@ def main() -> None:
                 try_start = True
 
             if try_start:
-                ok, msg = _try_start_ollama_server()
+                ok, msg = _try_start_ollama_server(ollama_bin)
                 console.print(f"[cyan]{msg}[/cyan]")
-                time.sleep(1.2)
-                reachable = _ollama_reachable(requests, ollama_url)
+                # En vez de una espera fija y un único intento: listo en cuanto responde
+                reachable = ok and _wait_for_ollama(http, ollama_url)
 
             if not reachable:
                 console.print("\nSugerencias:")
@@ -280,15 +364,21 @@ def main() -> None:
             console.print(f"Lista: {', '.join(models)}")
             do_pull = True if args.yes else Confirm.ask("¿Hacer `ollama pull` ahora?", default=False)
             if do_pull:
-                for m in models:
-                    console.print(f"\n⬇️  [bold]ollama pull {m}[/bold]")
-                    rc, out = _run(["ollama", "pull", m], cwd=project_root)
-                    if rc == 0:
-                        console.print("[green]✅ OK[/green]")
-                    else:
-                        console.print("[red]❌ Falló pull[/red]")
-                        if out:
-                            console.print(out)
+                # Descargas independientes y limitadas por red: en paralelo (el tiempo
+                # total es el de la más lenta); cada resultado se informa al terminar.
+                workers = min(len(models), MAX_PARALLEL_PULLS)
+                console.print(f"\n⬇️  [bold]ollama pull[/bold] ({len(models)} modelos, {workers} en paralelo)")
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    futures = {ex.submit(_run, [ollama_bin, "pull", m], cwd=project_root): m for m in models}
+                    for fut in as_completed(futures):
+                        m = futures[fut]
+                        rc, out = fut.result()
+                        if rc == 0:
+                            console.print(f"[green]✅ {m} OK[/green]")
+                        else:
+                            console.print(f"[red]❌ Falló pull de {m}[/red]")
+                            if out:
+                                console.print(out)
 
     # Siguiente pasos
     console.print("\n[bold green]✅ Wizard completado.[/bold green]")